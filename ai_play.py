@@ -3,6 +3,7 @@ import pygame
 from nnm.main import NineMenMorris, Phase
 from nnm.ai.minimax import MinimaxAI
 from nnm.ai.ga import GA
+from nnm.ai.brain_store import BrainStore, RESULT_NAMES
 import json
 from pathlib import Path
 import time
@@ -22,18 +23,16 @@ eva = ai.evaluator
 
 ga = GA(n_pops=6)
 
-storage = Path("brain.json")
+storage = BrainStore("brains", brain_size=len(eva.get_brain()))
+if len(storage) == 0 and Path("brain.json").is_file():
+    storage.import_json("brain.json")
 
 eva.randomize_brain()
-if storage.is_file():
-    with storage.open() as fd:
-        brains = json.load(fd)
-else:
-    brains = {"brains": [], "result": [], "turns": [], "generation": [], "score": []}
 
 scores = {"draw": 0, "win": 0, "loss": 0}
-for r in brains["result"]:
-    scores[r] += 1
+results, counts = np.unique(storage.load_records()["result"], return_counts=True)
+for r, count in zip(results, counts):
+    scores[RESULT_NAMES[r]] += int(count)
 
 running = True
 other_player = game.board.players[1]
@@ -41,7 +40,6 @@ other_player = game.board.players[1]
 was_win = False
 
 def get_score(result, turns):
-    global brains
     if result == "draw":
         return 0
     # s = math.exp(-(turns/100)**2)
@@ -85,11 +83,7 @@ def play():
                     result = "loss"
             scores[result] += 1
             score = get_score(result, game.board.ply)
-            brains["brains"].append(eva.get_brain())
-            brains["result"].append(result)
-            brains["turns"].append(game.board.ply)
-            brains["score"].append(score)
-            brains["generation"].append(ga.generation)
+            storage.append(eva.get_brain(), score, result, game.board.ply, ga.generation)
             print(f"Result: {result}. Current score: {scores}. Game over in {dt:.2f} s")
             return
     
@@ -97,13 +91,9 @@ def play():
         game.draw()
         pygame.display.flip()
 
-best_score = float("-inf")
-for i, brain in enumerate(brains["brains"]):
-    score = brains["score"][i]
-    if score > best_score:
-        # print("Setting brain with score", brains["result"][i], brains["turns"][i], score)
-        best_score = score
-        eva.set_brain(brain)
+best = storage.best()
+if best is not None:
+    eva.set_brain(best[0])
 
 t0 = time.perf_counter()
 idx = 0
@@ -114,8 +104,7 @@ best_brain = None
 best_score = float("-inf")
 while running:
     # if idx == 0:
-    #     with open(storage, "w") as fd:
-    #         json.dump(brains, fd, indent=4)
+    #     storage.checkpoint()
     #     if best_score > 0:
     #         other_player.ai.evaluator.load_brain()
     #     if pops:
@@ -140,7 +129,8 @@ while running:
     play()
     # other_player.ai.clear()
     ai.reset()
-    pop_scores.append(brains["score"][-1])
+    pop_scores.append(storage.get_record(len(storage) - 1).score)
     idx = (idx + 1) % ga.n_pops
 
+storage.checkpoint()
 pygame.quit()
\ No newline at end of file
@@ -0,0 +1,133 @@
+#pragma once
+#include <array>
+#include <cstdint>
+
+/* Bitboard helpers. Every player owns a 24-bit mask, bit i set means the player has a piece on
+ * spot i. The tables below are derived from the same line/connection layout as connections.hpp,
+ * but in a form which can be evaluated with a couple of bitwise operations. */
+
+typedef uint32_t Bitboard;
+
+const int N_SPOTS = 24;
+const int N_LINES = 16;
+const Bitboard ALL_SPOTS_MASK = (1u << N_SPOTS) - 1;
+
+inline constexpr Bitboard spot_mask(int pos) {
+    return 1u << pos;
+}
+
+inline int popcount(Bitboard bb) {
+    return __builtin_popcount(bb);
+}
+
+/* Index of the lowest set bit, bb must be non-zero. */
+inline int lowest_spot(Bitboard bb) {
+    return __builtin_ctz(bb);
+}
+
+/* Iterate over set bits, e.g. for (Bitboard b = mask; b; b &= b - 1) { int pos = lowest_spot(b);} */
+inline Bitboard pop_lowest(Bitboard bb) {
+    return bb & (bb - 1);
+}
+
+/* The 16 lines, ordered by their lowest index. Same order as ALL_LINE_CONNECTIONS. */
+constexpr std::array<std::array<int, 3>, N_LINES> LINE_SPOTS = {{
+    {0, 1, 2},
+    {0, 9, 21},
+    {1, 4, 7},
+    {2, 14, 23},
+    {3, 4, 5},
+    {3, 10, 18},
+    {5, 13, 20},
+    {6, 7, 8},
+    {6, 11, 15},
+    {8, 12, 17},
+    {9, 10, 11},
+    {12, 13, 14},
+    {15, 16, 17},
+    {16, 19, 22},
+    {18, 19, 20},
+    {21, 22, 23},
+}};
+
+constexpr std::array<std::array<int, 4>, N_SPOTS> NEIGHBOURS = {{
+    {1, 9, -1, -1},    {0, 2, 4, -1},     {1, 14, -1, -1},  {4, 10, -1, -1},
+    {1, 3, 5, 7},      {4, 13, -1, -1},   {7, 11, -1, -1},  {4, 6, 8, -1},
+    {7, 12, -1, -1},   {0, 10, 21, -1},   {3, 9, 11, 18},   {6, 10, 15, -1},
+    {8, 13, 17, -1},   {5, 12, 14, 20},   {2, 13, 23, -1},  {11, 16, -1, -1},
+    {15, 17, 19, -1},  {12, 16, -1, -1},  {10, 19, -1, -1}, {16, 18, 20, 22},
+    {13, 19, -1, -1},  {9, 22, -1, -1},   {19, 21, 23, -1}, {14, 22, -1, -1},
+}};
+
+inline constexpr Bitboard line_mask(int line) {
+    return spot_mask(LINE_SPOTS[line][0]) | spot_mask(LINE_SPOTS[line][1]) |
+           spot_mask(LINE_SPOTS[line][2]);
+}
+
+/* Every spot is part of exactly two lines, a horizontal and a vertical one. */
+inline constexpr std::array<std::array<int, 2>, N_SPOTS> make_spot_lines() {
+    std::array<std::array<int, 2>, N_SPOTS> spot_lines{};
+    std::array<int, N_SPOTS> found{};
+    for (int line = 0; line < N_LINES; line++) {
+        for (int pos : LINE_SPOTS[line]) {
+            spot_lines[pos][found[pos]++] = line;
+        }
+    }
+    return spot_lines;
+}
+
+inline constexpr std::array<std::array<Bitboard, 2>, N_SPOTS> make_mill_masks() {
+    std::array<std::array<Bitboard, 2>, N_SPOTS> masks{};
+    auto spot_lines = make_spot_lines();
+    for (int pos = 0; pos < N_SPOTS; pos++) {
+        masks[pos][0] = line_mask(spot_lines[pos][0]);
+        masks[pos][1] = line_mask(spot_lines[pos][1]);
+    }
+    return masks;
+}
+
+inline constexpr std::array<Bitboard, N_SPOTS> make_neighbour_masks() {
+    std::array<Bitboard, N_SPOTS> masks{};
+    for (int pos = 0; pos < N_SPOTS; pos++) {
+        for (int other : NEIGHBOURS[pos]) {
+            if (other >= 0) masks[pos] |= spot_mask(other);
+        }
+    }
+    return masks;
+}
+
+inline constexpr Bitboard make_central_mask() {
+    Bitboard mask = 0;
+    for (int pos = 0; pos < N_SPOTS; pos++) {
+        if (NEIGHBOURS[pos][3] >= 0) mask |= spot_mask(pos);
+    }
+    return mask;
+}
+
+constexpr std::array<std::array<int, 2>, N_SPOTS> SPOT_LINES = make_spot_lines();
+constexpr std::array<std::array<Bitboard, 2>, N_SPOTS> MILL_MASKS = make_mill_masks();
+constexpr std::array<Bitboard, N_SPOTS> NEIGHBOUR_MASKS = make_neighbour_masks();
+/* Spots with 4 neighbours */
+constexpr Bitboard CENTRAL_MASK = make_central_mask();
+
+/* Would a piece on pos be part of a mill, given the pieces in bb? pos must be set in bb. */
+inline bool is_mill_at(Bitboard bb, int pos) {
+    const auto &masks = MILL_MASKS[pos];
+    return (bb & masks[0]) == masks[0] || (bb & masks[1]) == masks[1];
+}
+
+/* All pieces in bb which are part of a mill */
+inline Bitboard mill_pieces(Bitboard bb) {
+    Bitboard in_mill = 0;
+    for (int line = 0; line < N_LINES; line++) {
+        Bitboard mask = line_mask(line);
+        if ((bb & mask) == mask) in_mill |= mask;
+    }
+    return in_mill;
+}
+
+/* The pieces of bb which may be captured: anything not in a mill, unless everything is. */
+inline Bitboard deletable_pieces(Bitboard bb) {
+    Bitboard free_pieces = bb & ~mill_pieces(bb);
+    return free_pieces ? free_pieces : bb;
+}
@@ -3,12 +3,30 @@
 #include <string>
 #include <vector>
 
+#include "bitboard.hpp"
 #include "connections.hpp"
 #include "config.hpp"
+#include "features.hpp"
+#include "zobrist.hpp"
 
 const int EMPTY = -1;
 const int FIELDS = 24;
 
+/* A move packed into 16 bits, 5 bits each for the from, to and delete positions. EMPTY is stored
+ * as 31, so a placement is a move from EMPTY. */
+typedef uint16_t PackedMove;
+
+inline constexpr PackedMove pack_move(int from_pos, int to_pos, int delete_pos) {
+    return (from_pos & 31) | ((to_pos & 31) << 5) | ((delete_pos & 31) << 10);
+}
+
+inline constexpr int unpack_pos(PackedMove move, int shift) {
+    int pos = (move >> shift) & 31;
+    return pos == 31 ? EMPTY : pos;
+}
+
+const PackedMove NO_MOVE = pack_move(EMPTY, EMPTY, EMPTY);
+
 struct CandidateMove {
     int from_pos;
     int to_pos;
@@ -19,6 +37,10 @@ struct CandidateMove {
     }
     CandidateMove(int from_pos, int to_pos) : from_pos(from_pos), to_pos(to_pos) {
     }
+
+    PackedMove pack() const {
+        return pack_move(from_pos, to_pos, delete_pos);
+    }
 };
 
 struct CandidatePlacement {
@@ -29,7 +51,18 @@ struct CandidatePlacement {
     }
     CandidatePlacement(int pos) : pos(pos) {
     }
+
+    PackedMove pack() const {
+        return pack_move(EMPTY, pos, delete_pos);
+    }
+};
+
+/* A position of the game history, see Board::is_repetition */
+struct HistoryEntry {
+    uint64_t key;          // Position key
+    int reversible_plies;  // Plies since the last capture or placement
 };
+
 class Board {
    public:
     Board() {
@@ -38,7 +71,9 @@ class Board {
 
     void reset();
 
-    int pieces_on_board(int player) const;
+    inline int pieces_on_board(int player) const {
+        return popcount(m_pieces[player]);
+    };
 
     void place_piece(int position) {
         this->place_piece(position, this->turn_index);
@@ -58,9 +93,9 @@ class Board {
 
     void give_piece() {
         if (this->turn_index == 0) {
-            playerOnePieces++;
+            set_hand(0, playerOnePieces + 1);
         } else {
-            playerTwoPieces++;
+            set_hand(1, playerTwoPieces + 1);
         }
     };
 
@@ -92,39 +127,116 @@ class Board {
 
     int get_player_pieces_on_hand(int player) const;
 
-    inline std::vector<int> &getBoard() {
-        return board;
-    };
+    std::vector<int> getBoard() const;
 
     inline bool is_available(int pos) const {
-    #ifdef DEBUG_MODE
-        return board.at(pos) == EMPTY;
-    #else
-        return board[pos] == EMPTY;
-    #endif
+#ifdef DEBUG_MODE
+        check_position(pos);
+#endif
+        return !(get_occupied() & spot_mask(pos));
     };
 
-    inline int get_owner(int pos) {
+    inline int get_owner(int pos) const {
         // Used frequently, so we don't do a bounds check
-        return board[pos];
+        Bitboard mask = spot_mask(pos);
+        if (m_pieces[0] & mask) return 0;
+        if (m_pieces[1] & mask) return 1;
+        return EMPTY;
     };
 
-    std::size_t get_board_hash() const;
+    inline Bitboard get_pieces(int player) const {
+        return m_pieces[player];
+    };
+
+    inline Bitboard get_occupied() const {
+        return m_pieces[0] | m_pieces[1];
+    };
+
+    inline Bitboard get_empty() const {
+        return ~get_occupied() & ALL_SPOTS_MASK;
+    };
+
+    std::size_t get_board_hash() const {
+        return m_key;
+    };
+
+    /* Zobrist key of the position, maintained incrementally */
+    inline uint64_t get_key() const {
+        return m_key;
+    };
+
+    /* The whole position packed into 57 bits: the pieces of both players, the pieces on hand
+     * and the player to move. Unlike the Zobrist key, this never collides. */
+    inline uint64_t get_position_key() const {
+        return m_pieces[0] | ((uint64_t)m_pieces[1] << 24) | ((uint64_t)playerOnePieces << 48) |
+               ((uint64_t)playerTwoPieces << 52) | ((uint64_t)turn_index << 56);
+    };
+
+    /* Recompute the Zobrist key from scratch, should always equal get_key() */
+    uint64_t compute_key() const;
+
+    /* Keep the evaluation features up to date on every change of the board */
+    void track_features(bool enable) {
+        if (enable && !m_track_features) m_features.compute(m_pieces);
+        m_track_features = enable;
+    };
+
+    bool is_tracking_features() const {
+        return m_track_features;
+    };
+
+    inline const BoardFeatures &get_features() const {
+        return m_features;
+    };
+
+    /* Set up an arbitrary position, the move counter is kept */
+    void set_state(Bitboard pieces_0, Bitboard pieces_1, int hand_0, int hand_1, int turn);
 
     void toggle_turn() {
         this->turn_index ^= 1;
         this->ply += 1;
+        m_key ^= ZOBRIST.turn;
     };
 
     void reverse_turn() {
         this->turn_index ^= 1;
         this->ply -= 1;
+        m_key ^= ZOBRIST.turn;
     };
 
     void execute_move(CandidateMove move);
     void execute_move(CandidatePlacement move);
     void undo_move(CandidateMove move);
     void undo_move(CandidatePlacement move);
+    void execute_packed(PackedMove move);
+    void undo_packed(PackedMove move);
+
+    /* Whether the current position has occurred n times in the game, counting this time. Only
+     * positions since the last capture or placement can repeat, so only those are compared. */
+    bool is_repetition(int n) const;
+
+    /* Record the current position in the history if it isn't the last entry already. Moves
+     * executed by execute_move are recorded automatically, this is for positions set up piece by
+     * piece, e.g. by a human player. */
+    void commit_position() {
+        if (m_history.empty() || m_history.back().key != get_position_key()) push_history();
+    };
+
+    /* Whether no earlier position can occur again, as the last move was a capture or placement
+     * (or there is no earlier position) */
+    bool is_irreversible() const {
+        return m_history.back().reversible_plies == 0;
+    };
+
+    /* Whether the current position is the last one in the history */
+    bool is_last_in_history() const {
+        return m_history.back().key == get_position_key();
+    };
+
+    /* Number of positions in the history, including the current one */
+    size_t get_history_size() const {
+        return m_history.size();
+    };
 
     int get_turn_index() const {
         return turn_index;
@@ -134,11 +246,57 @@ class Board {
     };
 
    private:
-    std::vector<int> board;
+    // One mask per player, see bitboard.hpp
+    Bitboard m_pieces[2] = {0, 0};
     int playerOnePieces;
     int playerTwoPieces;
     int turn_index = 0;
     unsigned int ply = 0;
+    uint64_t m_key = 0;
+    bool m_track_features = false;
+    BoardFeatures m_features;
+    // Positions of the game, the current one last. Pushed and popped by execute and undo.
+    std::vector<HistoryEntry> m_history;
+
+    void push_history();
+
+    void pop_history() {
+        // The first position is kept, it isn't reached by a move
+        if (m_history.size() > 1) m_history.pop_back();
+    };
+
+    /* All changes to the pieces go through these, so the key and features stay up to date. */
+    inline void set_spot(int pos, int player) {
+        if (m_track_features) m_features.update_blocked(m_pieces, pos, -1);
+        m_pieces[player] |= spot_mask(pos);
+        m_key ^= ZOBRIST.pieces[player][pos];
+        if (m_track_features) {
+            m_features.update_blocked(m_pieces, pos, 1);
+            m_features.update_lines(pos, player, 1);
+        }
+    };
+
+    inline void clear_spot(int pos, int player) {
+        if (m_track_features) m_features.update_blocked(m_pieces, pos, -1);
+        m_pieces[player] &= ~spot_mask(pos);
+        m_key ^= ZOBRIST.pieces[player][pos];
+        if (m_track_features) {
+            m_features.update_blocked(m_pieces, pos, 1);
+            m_features.update_lines(pos, player, -1);
+        }
+    };
+
+    inline void set_hand(int player, int n_pieces) {
+        int &hand = player == 0 ? playerOnePieces : playerTwoPieces;
+        m_key ^= zobrist_hand(player, hand) ^ zobrist_hand(player, n_pieces);
+        hand = n_pieces;
+    };
+
+    void check_position(int pos) const {
+        if (pos >= FIELDS || pos < 0) {
+            throw std::out_of_range("Invalid position!");
+        }
+    };
 };
 
 class MoveFinder {
@@ -148,55 +306,90 @@ class MoveFinder {
 
     std::vector<CandidatePlacement> get_phase_one_moves(int player) const {
         std::vector<CandidatePlacement> moves;
-
-        for (int pos = 0; pos < FIELDS; pos++) {
-            int owner = this->m_board_ptr->get_owner(pos);
-            if (owner != EMPTY) continue;
-            m_board_ptr->temp_place_piece(pos, player);
-            if (m_board_ptr->check_mill(pos, player)) {
-                // We can delete
-                int other_player = player ^ 1;
-                for (int to_delete = 0; to_delete < FIELDS; to_delete++) {
-                    if (m_board_ptr->get_owner(to_delete) == other_player) {
-                        moves.emplace_back(pos, to_delete);
-                    }
+        Bitboard own = m_board_ptr->get_pieces(player);
+        Bitboard other = m_board_ptr->get_pieces(player ^ 1);
+
+        for (Bitboard to = m_board_ptr->get_empty(); to; to = pop_lowest(to)) {
+            int pos = lowest_spot(to);
+            if (is_mill_at(own | spot_mask(pos), pos)) {
+                // We can delete any of the other players pieces
+                for (Bitboard del = other; del; del = pop_lowest(del)) {
+                    moves.emplace_back(pos, lowest_spot(del));
                 }
             } else {
                 moves.emplace_back(pos, EMPTY);
             }
-            m_board_ptr->remove_piece(pos, EMPTY);  // Trick, we are removing our own piece.
         }
         return moves;
     }
 
     std::vector<CandidateMove> get_movement_phase_moves(int player, bool is_flying) const {
         std::vector<CandidateMove> moves;
-
-        for (int from_pos = 0; from_pos < FIELDS; from_pos++) {
-            if (m_board_ptr->get_owner(from_pos) != player) continue;
-            for (int to_pos = 0; to_pos < FIELDS; to_pos++) {
-                // Either not empty, or unconnected phase 2
-                if (m_board_ptr->get_owner(to_pos) != EMPTY ||
-                    (!is_flying && !m_board_ptr->is_connected(from_pos, to_pos)))
-                    continue;
-                // No need to check for connections at this stage anymore.
-                m_board_ptr->move_piece_flying(from_pos, to_pos, player);
-                if (m_board_ptr->check_mill(to_pos, player)) {
-                    // Check deletion
-                    for (int to_delete = 0; to_delete < FIELDS; to_delete++) {
-                        if (m_board_ptr->can_delete(to_delete, player)) {
-                            moves.emplace_back(from_pos, to_pos, to_delete);
-                        }
+        Bitboard own = m_board_ptr->get_pieces(player);
+        Bitboard empty = m_board_ptr->get_empty();
+        // Mills of the other player doesn't change by our move.
+        Bitboard deletable = deletable_pieces(m_board_ptr->get_pieces(player ^ 1));
+
+        for (Bitboard from = own; from; from = pop_lowest(from)) {
+            int from_pos = lowest_spot(from);
+            Bitboard targets = is_flying ? empty : empty & NEIGHBOUR_MASKS[from_pos];
+            Bitboard moved = own ^ spot_mask(from_pos);
+            for (Bitboard to = targets; to; to = pop_lowest(to)) {
+                int to_pos = lowest_spot(to);
+                if (is_mill_at(moved | spot_mask(to_pos), to_pos)) {
+                    for (Bitboard del = deletable; del; del = pop_lowest(del)) {
+                        moves.emplace_back(from_pos, to_pos, lowest_spot(del));
                     }
                 } else {
                     moves.emplace_back(from_pos, to_pos);
                 }
-                m_board_ptr->move_piece_flying(to_pos, from_pos, player);  // Undo movement
             }
         }
         return moves;
     }
 
+    /* All moves of the current phase of the player, in the same order as the functions above.
+     * With captures_only, only the moves closing a mill. */
+    void get_packed_moves(int player, std::vector<PackedMove> &moves,
+                          bool captures_only = false) const {
+        moves.clear();
+        Bitboard own = m_board_ptr->get_pieces(player);
+        Bitboard other = m_board_ptr->get_pieces(player ^ 1);
+        Bitboard empty = m_board_ptr->get_empty();
+
+        if (m_board_ptr->get_player_pieces_on_hand(player) > 0) {
+            for (Bitboard to = empty; to; to = pop_lowest(to)) {
+                int pos = lowest_spot(to);
+                if (is_mill_at(own | spot_mask(pos), pos)) {
+                    for (Bitboard del = other; del; del = pop_lowest(del)) {
+                        moves.push_back(pack_move(EMPTY, pos, lowest_spot(del)));
+                    }
+                } else if (!captures_only) {
+                    moves.push_back(pack_move(EMPTY, pos, EMPTY));
+                }
+            }
+            return;
+        }
+
+        bool is_flying = popcount(own) == 3;
+        Bitboard deletable = deletable_pieces(other);
+        for (Bitboard from = own; from; from = pop_lowest(from)) {
+            int from_pos = lowest_spot(from);
+            Bitboard targets = is_flying ? empty : empty & NEIGHBOUR_MASKS[from_pos];
+            Bitboard moved = own ^ spot_mask(from_pos);
+            for (Bitboard to = targets; to; to = pop_lowest(to)) {
+                int to_pos = lowest_spot(to);
+                if (is_mill_at(moved | spot_mask(to_pos), to_pos)) {
+                    for (Bitboard del = deletable; del; del = pop_lowest(del)) {
+                        moves.push_back(pack_move(from_pos, to_pos, lowest_spot(del)));
+                    }
+                } else if (!captures_only) {
+                    moves.push_back(pack_move(from_pos, to_pos, EMPTY));
+                }
+            }
+        }
+    }
+
     int get_phase() const {
         // Cannot determine draws!
         int player = m_board_ptr->get_turn_index();
@@ -232,16 +425,12 @@ class MoveFinder {
         }
         // In phase 3, there is always a move!
         if (piece_cnt == 3) return true;
-        // Phase 2
-        for (int i = 0; i < FIELDS; i++) {
-            int owner = m_board_ptr->get_owner(i);
-            if (owner != player) continue;
-            // Check posslbe valid moves from i->j
-            for (int j : INDEX_CONNECTIONS[i]) {
-                if (m_board_ptr->get_owner(j) == EMPTY) {
-                    // Found a possible move for the player
-                    return true;
-                }
+        // Phase 2, look for any piece with an empty neighbour
+        Bitboard empty = m_board_ptr->get_empty();
+        for (Bitboard from = m_board_ptr->get_pieces(player); from; from = pop_lowest(from)) {
+            if (NEIGHBOUR_MASKS[lowest_spot(from)] & empty) {
+                // Found a possible move for the player
+                return true;
             }
         }
         return false;
@@ -0,0 +1,91 @@
+#pragma once
+#include <algorithm>
+#include <cstdint>
+#include <vector>
+
+#include "bitboard.hpp"
+
+/* Direct mapped cache of static evaluations. The evaluation only depends on the pieces on the
+ * board, so both masks together are an exact key and a hit can never be a collision. A new entry
+ * always replaces the one in its slot. */
+class EvalCache {
+   public:
+    EvalCache(size_t n_entries = DEFAULT_ENTRIES) {
+        resize(n_entries);
+    };
+
+    static const size_t DEFAULT_ENTRIES = 1 << 16;
+
+    /* Rounded down to a power of two, 0 disables the cache */
+    void resize(size_t n_entries) {
+        size_t size = n_entries > 0 ? 1 : 0;
+        while (size > 0 && 2 * size <= n_entries) {
+            size *= 2;
+        }
+        m_entries.assign(size, Entry());
+        m_shift = 64;
+        for (size_t n = size; n > 1; n /= 2) {
+            m_shift--;
+        }
+        clear();
+    };
+
+    void clear() {
+        std::fill(m_entries.begin(), m_entries.end(), Entry());
+        m_hits = 0;
+        m_misses = 0;
+    };
+
+    static inline uint64_t make_key(Bitboard pieces_0, Bitboard pieces_1) {
+        // Bit 63 marks a used entry, so the empty board is a valid key
+        return pieces_0 | ((uint64_t)pieces_1 << N_SPOTS) | (1ull << 63);
+    };
+
+    inline bool probe(uint64_t key, float &score) {
+        if (m_entries.empty()) return false;
+        const Entry &entry = m_entries[index(key)];
+        if (entry.key == key) {
+            m_hits++;
+            score = entry.score;
+            return true;
+        }
+        m_misses++;
+        return false;
+    };
+
+    inline void store(uint64_t key, float score) {
+        if (m_entries.empty()) return;
+        Entry &entry = m_entries[index(key)];
+        entry.key = key;
+        entry.score = score;
+    };
+
+    size_t size() const {
+        return m_entries.size();
+    };
+
+    uint64_t hits() const {
+        return m_hits;
+    };
+
+    uint64_t misses() const {
+        return m_misses;
+    };
+
+   private:
+    struct Entry {
+        uint64_t key = 0;
+        float score = 0.0;
+    };
+
+    std::vector<Entry> m_entries;
+    int m_shift = 64;
+    uint64_t m_hits = 0;
+    uint64_t m_misses = 0;
+
+    inline size_t index(uint64_t key) const {
+        // Fibonacci hashing, the high bits of the product are well mixed
+        if (m_shift == 64) return 0;
+        return (key * 0x9e3779b97f4a7c15ull) >> m_shift;
+    };
+};
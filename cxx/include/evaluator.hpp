@@ -1,18 +1,51 @@
+#pragma once
 #include <iostream>
 #include <vector>
 
 #include "board.hpp"
 #include "connections.hpp"
+#include "eval_cache.hpp"
 #include "unordered_map"
 
 class Evaluator {
    public:
-    Evaluator(Board *board, int me) : m_board_ptr(board), me(me) {
+    Evaluator(Board *board, int me, bool incremental = true) : m_board_ptr(board), me(me) {
         this->other = me ^ 1;
+        set_incremental(incremental);
     };
 
+    /* Copy of other, evaluating the position of another board */
+    Evaluator(const Evaluator &other, Board *board) : Evaluator(other) {
+        m_board_ptr = board;
+        set_incremental(m_incremental);
+    };
+
+    /* Cached, the cache is kept until the brain changes */
     float evaluate();
 
+    /* In incremental mode the features are read from the running totals kept by the board,
+     * otherwise they are recounted from scratch on every evaluation. */
+    void set_incremental(bool incremental) {
+        m_incremental = incremental;
+        if (incremental) m_board_ptr->track_features(true);
+    };
+
+    bool is_incremental() const {
+        return m_incremental;
+    };
+
+    /* Score n positions given by the owner of every spot (n x 24), the pieces on hand (n x 2)
+     * and the player to move, split over n_threads threads. Doesn't touch our board or cache. */
+    void evaluate_batch(const int8_t *owners, const int32_t *hands, const int32_t *turns,
+                        size_t n, float *scores, int n_threads = 1) const;
+
+    /* The features weighted by the brain, in the order of the coefficients */
+    std::vector<float> get_features() const;
+
+    int get_me() const {
+        return me;
+    };
+
     int brain_size() const {
         return this->m_coeffs.size();
     };
@@ -21,9 +54,12 @@ class Evaluator {
         if (brain.size() != m_coeffs.size()) {
             throw std::invalid_argument("Invalid size of brain!");
         }
+        if (brain == m_coeffs) return;
         for (size_t i=0; i<brain.size(); i++){
             m_coeffs[i] = brain[i];
         }
+        // The cached scores were computed with the old coefficients
+        m_cache.clear();
     };
 
     std::vector<float> get_brain() const {
@@ -31,13 +67,27 @@ class Evaluator {
     }
 
     void reset() {
+        m_cache.clear();
     }
 
+    /* Number of cached evaluations, 0 disables the cache */
+    void set_cache_size(size_t n_entries) {
+        m_cache.resize(n_entries);
+    };
+
+    const EvalCache &get_cache() const {
+        return m_cache;
+    };
+
    private:
     Board *m_board_ptr = nullptr;
     int me;
     int other;
     std::vector<float> m_coeffs = {9.0, 2.0, 2.0, 0.2, 1.0, 1.0};
+    bool m_incremental = true;
+    EvalCache m_cache;
+
+    float compute_score() const;
 
     inline float get_piece_diff() const {
         int p1 = m_board_ptr->pieces_on_board(me);
@@ -0,0 +1,84 @@
+#pragma once
+#include <array>
+#include <cstdint>
+
+#include "bitboard.hpp"
+
+/* Evaluation features kept as running totals by the board. A change of a single spot only touches
+ * the two lines through the spot, and the blocked status of the spot and its neighbours, so the
+ * totals can be updated in O(1) on every make/unmake instead of being recounted at every leaf. */
+
+/* The state of a line is a base-3 number with one digit per spot, 0 for empty and 1 + the owner
+ * otherwise, the first spot of the line being the least significant digit. */
+const int N_LINE_STATES = 27;
+const int LINE_DIGIT[3] = {1, 3, 9};
+
+/* Two connected pieces of the player in a line, i.e. the middle and one of the ends, where the
+ * owners of the line sum to one (empty counting as -1). */
+inline constexpr std::array<std::array<int8_t, 2>, N_LINE_STATES> make_two_piece_table() {
+    std::array<std::array<int8_t, 2>, N_LINE_STATES> table{};
+    for (int state = 0; state < N_LINE_STATES; state++) {
+        int owners[3] = {state % 3 - 1, state / 3 % 3 - 1, state / 9 - 1};
+        for (int player = 0; player < 2; player++) {
+            int n_pairs = (owners[0] == player && owners[1] == player) +
+                          (owners[1] == player && owners[2] == player);
+            if (owners[0] + owners[1] + owners[2] == 1) table[state][player] = n_pairs;
+        }
+    }
+    return table;
+}
+
+constexpr std::array<std::array<int8_t, 2>, N_LINE_STATES> TWO_PIECE_CONFIG = make_two_piece_table();
+
+/* Pieces of the player in mask which are surrounded by the other player */
+inline int count_blocked(const Bitboard pieces[2], int player, Bitboard mask) {
+    int n_blocked = 0;
+    Bitboard other = pieces[player ^ 1];
+    for (Bitboard own = pieces[player] & mask; own; own = pop_lowest(own)) {
+        Bitboard neighbours = NEIGHBOUR_MASKS[lowest_spot(own)];
+        if ((neighbours & other) == neighbours) ++n_blocked;
+    }
+    return n_blocked;
+}
+
+struct BoardFeatures {
+    uint8_t line_state[N_LINES];
+    int two_piece_config[2];
+    int blocked[2];
+
+    void compute(const Bitboard pieces[2]) {
+        two_piece_config[0] = two_piece_config[1] = 0;
+        for (int line = 0; line < N_LINES; line++) {
+            line_state[line] = 0;
+            for (int i = 0; i < 3; i++) {
+                int pos = LINE_SPOTS[line][i];
+                if (pieces[0] & spot_mask(pos)) line_state[line] += LINE_DIGIT[i];
+                if (pieces[1] & spot_mask(pos)) line_state[line] += 2 * LINE_DIGIT[i];
+            }
+            two_piece_config[0] += TWO_PIECE_CONFIG[line_state[line]][0];
+            two_piece_config[1] += TWO_PIECE_CONFIG[line_state[line]][1];
+        }
+        blocked[0] = count_blocked(pieces, 0, ALL_SPOTS_MASK);
+        blocked[1] = count_blocked(pieces, 1, ALL_SPOTS_MASK);
+    };
+
+    /* Must be called before and after changing a spot, with sign -1 and +1 respectively */
+    void update_blocked(const Bitboard pieces[2], int pos, int sign) {
+        Bitboard region = spot_mask(pos) | NEIGHBOUR_MASKS[pos];
+        blocked[0] += sign * count_blocked(pieces, 0, region);
+        blocked[1] += sign * count_blocked(pieces, 1, region);
+    };
+
+    /* The spot pos went from empty to player (sign 1) or from player to empty (sign -1) */
+    void update_lines(int pos, int player, int sign) {
+        for (int line : SPOT_LINES[pos]) {
+            int digit = LINE_SPOTS[line][0] == pos ? 0 : (LINE_SPOTS[line][1] == pos ? 1 : 2);
+            uint8_t &state = line_state[line];
+            two_piece_config[0] -= TWO_PIECE_CONFIG[state][0];
+            two_piece_config[1] -= TWO_PIECE_CONFIG[state][1];
+            state += sign * (player + 1) * LINE_DIGIT[digit];
+            two_piece_config[0] += TWO_PIECE_CONFIG[state][0];
+            two_piece_config[1] += TWO_PIECE_CONFIG[state][1];
+        }
+    };
+};
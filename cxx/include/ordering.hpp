@@ -0,0 +1,115 @@
+#pragma once
+#include <algorithm>
+#include <cstdint>
+#include <cstring>
+#include <vector>
+
+#include "board.hpp"
+
+const int MAX_PLY = 128;
+
+/* Orders moves so alpha-beta sees the likely best move first:
+ * the transposition table (or previous iteration) move, captures, moves blocking a mill of the
+ * other player, the killer moves of the ply and finally by the history heuristic. */
+class MoveOrderer {
+   public:
+    MoveOrderer(Board *board) : m_board_ptr(board) {
+        clear();
+    }
+
+    void clear() {
+        std::fill(&m_killers[0][0], &m_killers[0][0] + 2 * MAX_PLY, NO_MOVE);
+        std::memset(m_history, 0, sizeof(m_history));
+    };
+
+    /* Called between searches, old history counts matter less than new ones. */
+    void age() {
+        for (auto &player_history : m_history) {
+            for (auto &value : player_history) value /= 2;
+        }
+        std::fill(&m_killers[0][0], &m_killers[0][0] + 2 * MAX_PLY, NO_MOVE);
+    };
+
+    /* The killer moves of ply, NO_MOVE where there is none */
+    std::vector<PackedMove> get_killers(int ply) const {
+        if (ply < 0 || ply >= MAX_PLY) return {NO_MOVE, NO_MOVE};
+        return {m_killers[ply][0], m_killers[ply][1]};
+    };
+
+    int score_move(PackedMove move, int ply, PackedMove tt_move) const {
+        if (move == tt_move) return TT_SCORE;
+        if (unpack_pos(move, 10) != EMPTY) return CAPTURE_SCORE;
+
+        int player = m_board_ptr->get_turn_index();
+        int to_pos = unpack_pos(move, 5);
+        Bitboard other = m_board_ptr->get_pieces(player ^ 1);
+        for (Bitboard mill : MILL_MASKS[to_pos]) {
+            Bitboard rest = mill ^ spot_mask(to_pos);
+            if ((other & rest) == rest) return BLOCK_SCORE;
+        }
+
+        if (ply < MAX_PLY) {
+            if (move == m_killers[ply][0]) return KILLER_SCORE;
+            if (move == m_killers[ply][1]) return KILLER_SCORE - 1;
+        }
+        return m_history[player][history_index(move)];
+    };
+
+    void order(std::vector<PackedMove> &moves, int ply, PackedMove tt_move) {
+        m_scored.clear();
+        for (PackedMove move : moves) {
+            m_scored.emplace_back(score_move(move, ply, tt_move), move);
+        }
+        // Stable, so equally good moves keep the order of the move generator
+        std::stable_sort(m_scored.begin(), m_scored.end(),
+                         [](const auto &a, const auto &b) { return a.first > b.first; });
+        for (size_t i = 0; i < moves.size(); i++) {
+            moves[i] = m_scored[i].second;
+        }
+    };
+
+    /* Same ordering for the candidate types used from Python */
+    template <typename Candidate>
+    std::vector<Candidate> order_candidates(const std::vector<Candidate> &moves, int ply,
+                                            PackedMove tt_move) const {
+        std::vector<std::pair<int, size_t>> scored;
+        for (size_t i = 0; i < moves.size(); i++) {
+            scored.emplace_back(score_move(moves[i].pack(), ply, tt_move), i);
+        }
+        std::stable_sort(scored.begin(), scored.end(),
+                         [](const auto &a, const auto &b) { return a.first > b.first; });
+        std::vector<Candidate> ordered;
+        ordered.reserve(moves.size());
+        for (const auto &item : scored) {
+            ordered.push_back(moves[item.second]);
+        }
+        return ordered;
+    };
+
+    /* A move caused a cutoff at ply with depth plies remaining */
+    void update(PackedMove move, int ply, int depth) {
+        if (unpack_pos(move, 10) != EMPTY) return;  // Captures are searched early anyway
+        if (ply < MAX_PLY && m_killers[ply][0] != move) {
+            m_killers[ply][1] = m_killers[ply][0];
+            m_killers[ply][0] = move;
+        }
+        int &value = m_history[m_board_ptr->get_turn_index()][history_index(move)];
+        value = std::min(value + depth * depth, MAX_HISTORY);
+    };
+
+   private:
+    static const int TT_SCORE = 1 << 30;
+    static const int CAPTURE_SCORE = 1 << 29;
+    static const int BLOCK_SCORE = 1 << 28;
+    static const int KILLER_SCORE = 1 << 27;
+    static const int MAX_HISTORY = KILLER_SCORE - 2;
+
+    Board *m_board_ptr = nullptr;
+    PackedMove m_killers[MAX_PLY][2];
+    int m_history[2][32 * 32];
+    std::vector<std::pair<int, PackedMove>> m_scored;
+
+    static int history_index(PackedMove move) {
+        return move & 0x3ff;  // from and to
+    };
+};
@@ -0,0 +1,15 @@
+#pragma once
+#include <cstdint>
+#include <utility>
+#include <vector>
+
+#include "board.hpp"
+
+/* Move generator validation: the number of leaf positions depth plies from the position on the
+ * board. Moves are executed and undone on the board. A game which is over has no moves, so it
+ * only counts at depth 0. Repetitions aren't draws here, as they depend on the game history.
+ * With bulk, the moves at the last ply are counted instead of executed. */
+uint64_t perft(Board &board, int depth, bool bulk = true);
+
+/* perft(depth - 1) after each move of the position, in move generator order */
+std::vector<std::pair<PackedMove, uint64_t>> divide(Board &board, int depth, bool bulk = true);
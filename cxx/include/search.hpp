@@ -0,0 +1,229 @@
+#pragma once
+#include <algorithm>
+#include <atomic>
+#include <chrono>
+#include <cstdint>
+#include <limits>
+#include <memory>
+#include <vector>
+
+#include "board.hpp"
+#include "evaluator.hpp"
+#include "ordering.hpp"
+#include "tablebase.hpp"
+#include "transposition.hpp"
+#include "utils.hpp"
+
+const float MIN_FLOAT = -std::numeric_limits<float>::infinity();
+const float MAX_FLOAT = std::numeric_limits<float>::infinity();
+const int DEFAULT_QUIESCENCE_PLIES = 2;
+/* Half width of the aspiration windows, about a piece with the default brain. Scores often move
+ * by a piece from one iteration to the next, so narrower windows fail too often. */
+const float DEFAULT_ASPIRATION_WINDOW = 10.0;
+
+/* Bound of a fail-soft score searched with the window alpha, beta */
+inline Bound score_bound(float score, float alpha, float beta) {
+    if (score <= alpha) return Bound::UPPER;
+    if (score >= beta) return Bound::LOWER;
+    return Bound::EXACT;
+}
+
+struct SearchResult {
+    PackedMove move = NO_MOVE;
+    float score = MIN_FLOAT;
+    int depth = 0;
+    uint64_t nodes = 0;
+};
+
+/* State shared by the threads of a root split search */
+struct RootSplit {
+    const std::vector<PackedMove> *moves;
+    std::vector<float> scores;
+    std::atomic<size_t> next_move{0};
+    std::atomic<float> alpha{MIN_FLOAT};
+    float beta = MAX_FLOAT;
+};
+
+/* Selective pruning, each technique trades some accuracy for a smaller tree. All off by default,
+ * see nnm.ai.pruning to measure the trade-off. Margins are in evaluation units. */
+struct PruningParams {
+    // Late move reductions, for quiet moves after the first lmr_min_moves of a node with at
+    // least lmr_min_depth plies left. A reduced move which improves on the bound is searched
+    // again at full depth.
+    bool lmr = false;
+    int lmr_min_depth = 3;
+    int lmr_min_moves = 4;
+    int lmr_reduction = 1;
+    // Futility pruning, one ply from the horizon: quiet moves are skipped if the evaluation is
+    // futility_margin short of the window.
+    bool futility = false;
+    float futility_margin = 9.0;
+    // Razoring, two plies from the horizon: the node is searched one ply shallower if the
+    // evaluation is razor_margin short of the window.
+    bool razoring = false;
+    float razor_margin = 18.0;
+};
+
+enum class ParallelMode {
+    ROOT_SPLIT,  // Root moves are split between the threads
+    LAZY_SMP,    // All threads search the whole tree, sharing one transposition table
+};
+
+class Searcher;
+
+/* A search thread, with its own copy of the board and evaluator */
+struct SearchWorker {
+    Board board;
+    Evaluator evaluator;
+    std::unique_ptr<Searcher> searcher;
+
+    SearchWorker(const Board &board, const Evaluator &evaluator, size_t tt_size_mb);
+};
+
+/* Alpha-beta search running entirely in C++, the same algorithm as MinimaxAI.minimax.
+ * Scores are from the point of view of the evaluator's player, which must be the player to move
+ * when search() is called. */
+class Searcher {
+   public:
+    Searcher(Board *board, Evaluator *evaluator, size_t tt_size_mb = 16)
+        : m_board_ptr(board), m_evaluator_ptr(evaluator), m_move_finder(board),
+          m_orderer(board),
+          m_own_tt(tt_size_mb),
+          m_tt(&m_own_tt),
+          m_tt_size_mb(tt_size_mb) {
+    }
+
+    /* Search to max_depth. With a time limit, deepen iteratively from depth 1 until max_depth or
+     * until the time runs out, and return the result of the last completed iteration.
+     * With more than one worker, the search runs on that many threads, each with a copy of the
+     * board. With ROOT_SPLIT the best move doesn't depend on the number of workers or their
+     * timing: the workers only take table entries of the same depth, in positions reached by a
+     * capture or placement, and equal moves go to the one generated first. A single thread also
+     * takes deeper entries and scores through repetitions, so it can pick another move, usually
+     * of the same value. With pruning (see set_pruning) the windows the threads search with, and
+     * so the moves pruned, depend on the timing. With LAZY_SMP the result is
+     * that of this thread, which runs the iterative deepening, while the other threads fill the
+     * shared table. */
+    SearchResult search(int max_depth, int time_limit_ms = 0, int workers = 1,
+                        ParallelMode mode = ParallelMode::ROOT_SPLIT);
+
+    /* With a seed, the root moves are shuffled before ordering, so moves with equal scores are
+     * picked at random (but reproducibly). A seed of 0 turns the shuffling off. */
+    void set_seed(uint64_t seed) {
+        m_rng_state = seed;
+    };
+
+    /* Root moves left out of the next searches, e.g. to find the second best move */
+    void set_excluded_moves(const std::vector<PackedMove> &moves) {
+        m_excluded = moves;
+    };
+
+    /* Plies of captures searched beyond max_depth before evaluating, so a mill closed just past
+     * the horizon isn't missed. 0 evaluates at max_depth. */
+    void set_quiescence_plies(int plies) {
+        m_quiescence_plies = std::max(plies, 0);
+    };
+
+    /* Principal variation search: every move but the first is searched with a null window,
+     * and only searched again with the full window if it turns out better. */
+    void set_pvs(bool enable) {
+        m_pvs = enable;
+    };
+
+    /* With iterative deepening, each iteration first searches a window of this half width
+     * around the score of the previous one. 0 searches the full window. */
+    void set_aspiration_window(float window) {
+        m_aspiration_window = std::max(window, 0.0f);
+    };
+
+    void set_pruning(const PruningParams &params) {
+        m_pruning = params;
+    };
+
+    PruningParams get_pruning() const {
+        return m_pruning;
+    };
+
+    /* Positions in the tablebase are scored by it instead of searched, nullptr turns it off */
+    void set_tablebase(const Tablebase *tablebase) {
+        m_tablebase = tablebase;
+    };
+
+    /* The transposition table, shared with the threads in LAZY_SMP */
+    const TranspositionTable &get_table() const {
+        return *m_tt;
+    };
+
+    void reset() {
+        m_tt->clear();
+        m_orderer.clear();
+        m_workers.clear();
+    };
+
+   private:
+    Board *m_board_ptr = nullptr;
+    Evaluator *m_evaluator_ptr = nullptr;
+    MoveFinder m_move_finder;
+    MoveOrderer m_orderer;
+    TranspositionTable m_own_tt;
+    TranspositionTable *m_tt;  // Our own table, or the one shared by lazy SMP threads
+    size_t m_tt_size_mb;
+    std::vector<std::unique_ptr<SearchWorker>> m_workers;
+    ParallelMode m_worker_mode = ParallelMode::ROOT_SPLIT;
+    bool m_parallel_root = false;
+    bool m_independent_tt = false;  // Only cutoffs independent of the search order, see minimax
+    int m_root_rotation = 0;
+    uint64_t m_rng_state = 0;
+    int m_quiescence_plies = DEFAULT_QUIESCENCE_PLIES;
+    bool m_pvs = true;
+    float m_aspiration_window = DEFAULT_ASPIRATION_WINDOW;
+    PruningParams m_pruning;
+    const Tablebase *m_tablebase = nullptr;
+    std::vector<PackedMove> m_excluded;
+    const std::atomic<bool> *m_abort = nullptr;
+    int m_max_depth = 0;
+    uint64_t m_nodes = 0;
+    bool m_use_deadline = false;
+    bool m_stopped = false;
+    std::chrono::steady_clock::time_point m_deadline;
+    // One move buffer per ply, so the search doesn't allocate
+    std::vector<std::vector<PackedMove>> m_move_stack;
+    // Root moves in generation order (after shuffling), which breaks ties between equal moves
+    std::vector<PackedMove> m_root_moves;
+
+    void prepare(int max_depth);
+
+    void setup_workers(int workers, ParallelMode mode);
+
+    SearchResult iterate(int max_depth, int time_limit_ms, bool always_iterate);
+
+    SearchResult search_lazy_smp(int max_depth, int time_limit_ms);
+
+    /* Fail-soft: a score <= alpha is an upper bound and a score >= beta a lower bound */
+    SearchResult search_root(int max_depth, PackedMove first_move, float alpha, float beta);
+
+    SearchResult search_root_parallel(int max_depth, PackedMove first_move, float alpha,
+                                      float beta);
+
+    /* Search root moves handed out by split until they run out, on this worker's board */
+    void search_root_moves(RootSplit &split);
+
+    float minimax(int depth, float alpha, float beta, bool is_maximizing);
+
+    /* Search a child of the current node, with a null window first unless it's the first. With
+     * a reduction, a shallower null window search goes first. */
+    float search_child(int depth, float alpha, float beta, bool is_maximizing, bool is_first,
+                       int reduction = 0);
+
+    /* Leaf of the full width search: the static evaluation, unless a capture improves on it */
+    float quiesce(int depth, float alpha, float beta, bool is_maximizing);
+
+    /* Checked every few nodes, the search unwinds once it is set */
+    bool is_time_up();
+
+    /* Whether a was generated before b at the root */
+    bool is_generated_before(PackedMove a, PackedMove b) const;
+
+    /* Ordered moves of the position, first_move is searched first if there is no TT move */
+    std::vector<PackedMove> &generate_moves(int ply, PackedMove first_move = NO_MOVE);
+};
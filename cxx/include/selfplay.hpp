@@ -0,0 +1,24 @@
+#pragma once
+#include <array>
+#include <cstdint>
+#include <vector>
+
+#include "board.hpp"
+#include "search.hpp"
+
+struct GameResult {
+    int winner = EMPTY;  // EMPTY for a draw
+    bool is_draw = false;
+    int plies = 0;
+    std::array<int, 2> pieces = {0, 0};  // Pieces on the board at the end of the game
+    std::vector<PackedMove> moves;       // The moves of the game, in order
+};
+
+/* Play a whole game between two fixed depth searches, brain_a playing first. A position occurring
+ * for the third time is a draw, as in Rules.next_turn. The seed randomizes the choice between
+ * equally good moves, so different seeds give different games. Each side searches with its own
+ * pruning parameters. */
+GameResult play_game(const std::vector<float> &brain_a, const std::vector<float> &brain_b,
+                     int depth_a, int depth_b, uint64_t seed = 0, size_t tt_size_mb = 16,
+                     const PruningParams &pruning_a = PruningParams(),
+                     const PruningParams &pruning_b = PruningParams());
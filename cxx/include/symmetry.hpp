@@ -0,0 +1,131 @@
+#pragma once
+#include <array>
+#include <cstdint>
+
+#include "bitboard.hpp"
+#include "board.hpp"
+
+/* The 16 symmetries of the board: 4 rotations, a mirror and swapping the inner and outer rings.
+ * Transform t rotates by (t & 3) quarter turns, then mirrors if bit 2 is set and swaps the rings
+ * if bit 3 is set. Transform 0 is the identity. */
+
+const int N_SYMMETRIES = 16;
+
+/* Spots on a 7x7 grid, the middle of the board is (3, 3) */
+constexpr std::array<std::array<int, 2>, N_SPOTS> SPOT_COORDS = {{
+    {0, 0}, {3, 0}, {6, 0}, {1, 1}, {3, 1}, {5, 1}, {2, 2}, {3, 2}, {4, 2},
+    {0, 3}, {1, 3}, {2, 3}, {4, 3}, {5, 3}, {6, 3},
+    {2, 4}, {3, 4}, {4, 4}, {1, 5}, {3, 5}, {5, 5}, {0, 6}, {3, 6}, {6, 6},
+}};
+
+inline constexpr int abs_diff(int a, int b) {
+    return a > b ? a - b : b - a;
+}
+
+inline constexpr int spot_at(int x, int y) {
+    for (int pos = 0; pos < N_SPOTS; pos++) {
+        if (SPOT_COORDS[pos][0] == x && SPOT_COORDS[pos][1] == y) return pos;
+    }
+    return -1;
+}
+
+inline constexpr std::array<std::array<int8_t, N_SPOTS>, N_SYMMETRIES> make_spot_transforms() {
+    std::array<std::array<int8_t, N_SPOTS>, N_SYMMETRIES> transforms{};
+    for (int t = 0; t < N_SYMMETRIES; t++) {
+        for (int pos = 0; pos < N_SPOTS; pos++) {
+            int x = SPOT_COORDS[pos][0] - 3;
+            int y = SPOT_COORDS[pos][1] - 3;
+            for (int i = 0; i < (t & 3); i++) {
+                int rotated_x = -y;
+                y = x;
+                x = rotated_x;
+            }
+            if (t & 4) x = -x;
+            if (t & 8) {
+                // Distance 3 is the outer ring and 1 the inner ring
+                int ring = abs_diff(x, 0) > abs_diff(y, 0) ? abs_diff(x, 0) : abs_diff(y, 0);
+                x = x / ring * (4 - ring);
+                y = y / ring * (4 - ring);
+            }
+            transforms[t][pos] = spot_at(x + 3, y + 3);
+        }
+    }
+    return transforms;
+}
+
+constexpr std::array<std::array<int8_t, N_SPOTS>, N_SYMMETRIES> SPOT_TRANSFORMS =
+    make_spot_transforms();
+
+/* Bitboards are transformed a byte at a time, with a table per transform and byte */
+inline constexpr std::array<std::array<std::array<Bitboard, 256>, 3>, N_SYMMETRIES>
+make_byte_transforms() {
+    std::array<std::array<std::array<Bitboard, 256>, 3>, N_SYMMETRIES> tables{};
+    for (int t = 0; t < N_SYMMETRIES; t++) {
+        for (int byte = 0; byte < 3; byte++) {
+            for (int value = 0; value < 256; value++) {
+                Bitboard bb = 0;
+                for (int bit = 0; bit < 8; bit++) {
+                    if (value & (1 << bit)) bb |= spot_mask(SPOT_TRANSFORMS[t][8 * byte + bit]);
+                }
+                tables[t][byte][value] = bb;
+            }
+        }
+    }
+    return tables;
+}
+
+constexpr std::array<std::array<std::array<Bitboard, 256>, 3>, N_SYMMETRIES> BYTE_TRANSFORMS =
+    make_byte_transforms();
+
+inline constexpr std::array<int, N_SYMMETRIES> make_inverse_transforms() {
+    std::array<int, N_SYMMETRIES> inverse{};
+    for (int t = 0; t < N_SYMMETRIES; t++) {
+        for (int u = 0; u < N_SYMMETRIES; u++) {
+            bool is_inverse = true;
+            for (int pos = 0; pos < N_SPOTS; pos++) {
+                if (SPOT_TRANSFORMS[u][SPOT_TRANSFORMS[t][pos]] != pos) is_inverse = false;
+            }
+            if (is_inverse) inverse[t] = u;
+        }
+    }
+    return inverse;
+}
+
+constexpr std::array<int, N_SYMMETRIES> INVERSE_TRANSFORMS = make_inverse_transforms();
+
+inline int transform_spot(int pos, int t) {
+    return pos == EMPTY ? EMPTY : SPOT_TRANSFORMS[t][pos];
+}
+
+inline Bitboard transform_bitboard(Bitboard bb, int t) {
+    const auto &tables = BYTE_TRANSFORMS[t];
+    return tables[0][bb & 0xff] | tables[1][(bb >> 8) & 0xff] | tables[2][(bb >> 16) & 0xff];
+}
+
+inline PackedMove transform_move(PackedMove move, int t) {
+    if (move == NO_MOVE) return move;
+    return pack_move(transform_spot(unpack_pos(move, 0), t), transform_spot(unpack_pos(move, 5), t),
+                     transform_spot(unpack_pos(move, 10), t));
+}
+
+struct CanonicalKey {
+    uint64_t key;  // The smallest position key of all symmetric positions
+    int transform;  // The transform taking the board to the position of key
+};
+
+/* Symmetric positions have the same canonical key. A move on the board maps to the canonical
+ * position with transform_move(move, transform), and back with the inverse transform. */
+inline CanonicalKey canonicalize(const Board &board) {
+    uint64_t rest = board.get_position_key() & ~((1ull << 48) - 1);  // Hands and turn
+    CanonicalKey best = {board.get_position_key(), 0};
+    for (int t = 1; t < N_SYMMETRIES; t++) {
+        uint64_t key = rest | transform_bitboard(board.get_pieces(0), t) |
+                       ((uint64_t)transform_bitboard(board.get_pieces(1), t) << 24);
+        if (key < best.key) best = {key, t};
+    }
+    return best;
+}
+
+inline uint64_t canonical_key(const Board &board) {
+    return canonicalize(board).key;
+}
@@ -0,0 +1,83 @@
+#pragma once
+#include <cstdint>
+#include <string>
+#include <utility>
+#include <vector>
+
+#include "board.hpp"
+
+/* Endgame tablebases of the movement phases, i.e. positions where neither player has pieces left
+ * on hand. A partition holds every position with a given number of pieces of the player to move
+ * and of the other player. It is solved by retrograde analysis together with its mirror
+ * partition, as moves without a capture go back and forth between the two. Captures lead into
+ * partitions with one piece less, which must be solved first.
+ *
+ * A partition file is a TBHeader, the results packed in 2 bits per position and the distance to
+ * the end of the game in plies, one byte per position. Files are memory mapped when probed. */
+
+enum class TBResult : uint8_t {
+    DRAW = 0,
+    WIN = 1,  // For the player to move
+    LOSS = 2,
+};
+
+struct TBEntry {
+    TBResult result = TBResult::DRAW;
+    int distance = 0;  // Plies until the game ends with best play
+};
+
+const int TB_MIN_PIECES = 3;
+const int TB_MAX_PIECES = 9;
+/* Score of a won position, minus the distance so faster wins are preferred */
+const float TB_WIN_SCORE = 1e6;
+
+/* Number of positions in the partition */
+uint64_t tb_partition_size(int n_own, int n_other);
+
+/* Index of the position in its partition, own are the pieces of the player to move */
+uint64_t tb_index(Bitboard own, Bitboard other);
+
+std::string tb_file_name(const std::string &directory, int n_own, int n_other);
+
+class Tablebase {
+   public:
+    /* Maps every partition file found in directory */
+    Tablebase(const std::string &directory);
+    ~Tablebase();
+
+    Tablebase(const Tablebase &) = delete;
+    Tablebase &operator=(const Tablebase &) = delete;
+
+    bool has_partition(int n_own, int n_other) const;
+
+    std::vector<std::pair<int, int>> partitions() const;
+
+    bool probe(Bitboard own, Bitboard other, TBEntry &entry) const;
+
+    /* Probe the position on the board for the player to move. Only positions without pieces on
+     * hand are in the tablebase. */
+    bool probe(const Board &board, TBEntry &entry) const;
+
+    /* Search score of the position on the board from the point of view of player */
+    bool score(const Board &board, int player, float &score) const;
+
+   private:
+    struct Partition {
+        void *data = nullptr;
+        size_t n_bytes = 0;
+        uint64_t size = 0;
+        const uint8_t *results = nullptr;
+        const uint8_t *distances = nullptr;
+    };
+
+    Partition m_partitions[TB_MAX_PIECES + 1][TB_MAX_PIECES + 1];
+
+    void map_partition(const std::string &file_name, int n_own, int n_other);
+
+    void unmap();
+};
+
+/* Solve the partitions (n_a, n_b) and (n_b, n_a) and write them to directory. The partitions
+ * reached by a capture, (n_b - 1, n_a) and (n_a - 1, n_b), must be in directory already unless
+ * the capture leaves less than 3 pieces. */
+void solve_tablebase(int n_a, int n_b, const std::string &directory);
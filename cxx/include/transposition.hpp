@@ -0,0 +1,144 @@
+#pragma once
+#include <atomic>
+#include <cstdint>
+#include <cstring>
+#include <memory>
+
+#include "board.hpp"
+
+/* Fixed size transposition table. Entries live in buckets of two: the first slot keeps the deepest
+ * search of the bucket (unless it is from an older search), the second slot is always replaced.
+ * The score, move, depth and bound of an entry are packed into a single 64-bit word.
+ *
+ * The table can be shared by several search threads without locks. A slot stores the key XOR'ed
+ * with the data, so a slot torn by two threads writing at once no longer matches its key and
+ * reads as a miss.
+ *
+ * A table of size 0 is disabled: every probe misses and stores are dropped. */
+
+enum class Bound : uint8_t {
+    NONE = 0,   // Only the move is known, the score gives no cutoff
+    EXACT = 1,
+    LOWER = 2,  // The score is a lower bound, i.e. the search failed high
+    UPPER = 3,  // The score is an upper bound, i.e. the search failed low
+};
+
+struct TTEntry {
+    float score = 0.0;
+    PackedMove move = NO_MOVE;
+    int depth = 0;
+    Bound bound = Bound::NONE;
+};
+
+class TranspositionTable {
+   public:
+    TranspositionTable(size_t size_mb) {
+        resize(size_mb);
+    };
+
+    void resize(size_t size_mb) {
+        if (size_mb == 0) {
+            m_buckets.reset();
+            m_n_buckets = 0;
+            m_mask = 0;
+            return;
+        }
+        size_t n_buckets = 1;
+        while (2 * n_buckets * sizeof(Bucket) <= size_mb * 1024 * 1024) {
+            n_buckets *= 2;
+        }
+        m_buckets = std::make_unique<Bucket[]>(n_buckets);
+        m_n_buckets = n_buckets;
+        m_mask = n_buckets - 1;
+    };
+
+    void clear() {
+        for (size_t i = 0; i < m_n_buckets; i++) {
+            for (Slot &slot : m_buckets[i].slots) {
+                slot.key_xor_data.store(0, std::memory_order_relaxed);
+                slot.data.store(0, std::memory_order_relaxed);
+            }
+        }
+        m_age = 0;
+    };
+
+    /* Called at the start of every search, so old entries are the first to be replaced */
+    void new_search() {
+        m_age = (m_age + 1) & 0x3f;
+    };
+
+    bool probe(uint64_t key, TTEntry &entry) const {
+        if (m_n_buckets == 0) return false;
+        const Bucket &bucket = m_buckets[key & m_mask];
+        for (const Slot &slot : bucket.slots) {
+            uint64_t data = slot.data.load(std::memory_order_relaxed);
+            if (data != 0 && (slot.key_xor_data.load(std::memory_order_relaxed) ^ data) == key) {
+                entry = unpack(data);
+                return true;
+            }
+        }
+        return false;
+    };
+
+    void store(uint64_t key, int depth, float score, Bound bound, PackedMove move) {
+        if (m_n_buckets == 0) return;
+        Bucket &bucket = m_buckets[key & m_mask];
+        Slot &deep = bucket.slots[0];
+        uint64_t deep_data = deep.data.load(std::memory_order_relaxed);
+        int deep_depth = (deep_data >> 48) & 0xff;
+        uint64_t deep_age = (deep_data >> 58) & 0x3f;
+        bool same_key = (deep.key_xor_data.load(std::memory_order_relaxed) ^ deep_data) == key;
+        Slot &target = (same_key || depth >= deep_depth || deep_age != m_age) ? deep
+                                                                                : bucket.slots[1];
+        uint64_t old_data = target.data.load(std::memory_order_relaxed);
+        if (move == NO_MOVE && old_data != 0 &&
+            (target.key_xor_data.load(std::memory_order_relaxed) ^ old_data) == key) {
+            // Keep the best move from an earlier search of this position
+            move = unpack(old_data).move;
+        }
+        uint64_t data = pack(depth, score, bound, move);
+        target.key_xor_data.store(key ^ data, std::memory_order_relaxed);
+        target.data.store(data, std::memory_order_relaxed);
+    };
+
+    size_t size() const {
+        return 2 * m_n_buckets;
+    };
+
+    size_t size_bytes() const {
+        return m_n_buckets * sizeof(Bucket);
+    };
+
+   private:
+    struct Slot {
+        std::atomic<uint64_t> key_xor_data{0};
+        std::atomic<uint64_t> data{0};  // 0 means unused, as the depth is never 0
+    };
+
+    struct Bucket {
+        Slot slots[2];
+    };
+
+    std::unique_ptr<Bucket[]> m_buckets;
+    size_t m_n_buckets = 0;
+    uint64_t m_mask = 0;
+    uint64_t m_age = 0;
+
+    /* Bits 0-31: score, 32-47: move, 48-55: depth, 56-57: bound, 58-63: age */
+    uint64_t pack(int depth, float score, Bound bound, PackedMove move) const {
+        uint32_t score_bits;
+        std::memcpy(&score_bits, &score, sizeof(score_bits));
+        return score_bits | (uint64_t(move) << 32) | (uint64_t(depth & 0xff) << 48) |
+               (uint64_t(bound) << 56) | (m_age << 58);
+    };
+
+    static TTEntry unpack(uint64_t data) {
+        TTEntry entry;
+        uint32_t score_bits = data & 0xffffffff;
+        std::memcpy(&entry.score, &score_bits, sizeof(score_bits));
+        entry.move = (data >> 32) & 0xffff;
+        entry.depth = (data >> 48) & 0xff;
+        entry.bound = Bound((data >> 56) & 0x3);
+        return entry;
+    };
+};
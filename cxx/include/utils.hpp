@@ -1,5 +1,6 @@
 #pragma once
 
+#include <cstdint>
 #include <functional>
 #include <vector>
 
@@ -8,3 +9,12 @@ inline void hash_combine(std::size_t& seed, const int v)
     // Copied from https://stackoverflow.com/a/2595226
     seed ^= v + 0x9e3779b9 + (seed<<6) + (seed>>2);
 };
+
+inline constexpr uint64_t splitmix64(uint64_t& state)
+{
+    // https://prng.di.unimi.it/splitmix64.c
+    uint64_t z = (state += 0x9e3779b97f4a7c15ull);
+    z = (z ^ (z >> 30)) * 0xbf58476d1ce4e5b9ull;
+    z = (z ^ (z >> 27)) * 0x94d049bb133111ebull;
+    return z ^ (z >> 31);
+};
@@ -0,0 +1,41 @@
+#pragma once
+#include <array>
+#include <cstdint>
+
+#include "bitboard.hpp"
+#include "utils.hpp"
+
+/* Zobrist keys for the board. The key of a position is the XOR of the keys of every piece on the
+ * board, the number of pieces each player has on hand, and the turn. Every change to the board
+ * can then be applied to the key in O(1) by XOR'ing the changed parts in and out. */
+
+const int MAX_HAND_PIECES = 9;
+
+struct ZobristTable {
+    uint64_t pieces[2][N_SPOTS];
+    uint64_t hand[2][MAX_HAND_PIECES + 1];
+    uint64_t turn;
+};
+
+inline constexpr ZobristTable make_zobrist_table() {
+    ZobristTable table{};
+    uint64_t state = 0x6e696e656d656e73ull;  // Fixed seed, keys are stable between runs.
+    for (int player = 0; player < 2; player++) {
+        for (int pos = 0; pos < N_SPOTS; pos++) {
+            table.pieces[player][pos] = splitmix64(state);
+        }
+        for (int n = 0; n <= MAX_HAND_PIECES; n++) {
+            table.hand[player][n] = splitmix64(state);
+        }
+    }
+    table.turn = splitmix64(state);
+    return table;
+}
+
+constexpr ZobristTable ZOBRIST = make_zobrist_table();
+
+inline uint64_t zobrist_hand(int player, int n_pieces) {
+    // Only a broken board holds more pieces than this, don't read out of bounds.
+    if (n_pieces < 0 || n_pieces > MAX_HAND_PIECES) return 0;
+    return ZOBRIST.hand[player][n_pieces];
+}
@@ -1,36 +1,34 @@
 #include "board.hpp"
-#include "utils.hpp"
 
 
 #include <sstream>
 
 void Board::reset() {
-    this->board.resize(FIELDS);
-    for (int i = 0; i < FIELDS; i++) {
-        this->board[i] = EMPTY;
-    }
+    m_pieces[0] = 0;
+    m_pieces[1] = 0;
     playerOnePieces = 9;
     playerTwoPieces = 9;
     this->ply = 0;
     this->turn_index = 0;
+    m_key = compute_key();
+    if (m_track_features) m_features.compute(m_pieces);
+    m_history.clear();
+    push_history();
 }
 
-int Board::pieces_on_board(int player) const {
-    int sum = 0;
-    for (size_t i = 0; i < FIELDS; i++) {
-        if (board[i] == player) ++sum;
+std::vector<int> Board::getBoard() const {
+    std::vector<int> board(FIELDS);
+    for (int i = 0; i < FIELDS; i++) {
+        board[i] = get_owner(i);
     }
-    return sum;
+    return board;
 }
 
 void Board::place_piece(int position, int player) {
     if (is_available(position)) {
-        board[position] = player;
-        if (player == 0) {
-            playerOnePieces--;
-        } else {
-            playerTwoPieces--;
-        }
+        int on_hand = get_player_pieces_on_hand(player);
+        set_spot(position, player);
+        set_hand(player, on_hand - 1);
     } else {
         throw std::invalid_argument("Position already occupied!");
     }
@@ -38,7 +36,7 @@ void Board::place_piece(int position, int player) {
 
 void Board::temp_place_piece(int position, int player) {
     if (is_available(position)) {
-        board[position] = player;
+        set_spot(position, player);
     } else {
         throw std::invalid_argument("Position already occupied!");
     }
@@ -46,17 +44,16 @@ void Board::temp_place_piece(int position, int player) {
 
 void Board::remove_piece(int position, int player) {
 #ifdef DEBUG_MODE
-    int owned_by = board.at(position);
-#else
-    int owned_by = board[position];
+    check_position(position);
 #endif
+    int owned_by = get_owner(position);
     if (owned_by == EMPTY) {
         throw std::invalid_argument("Position not owned by anyone.");
     } else if (owned_by == player) {
         throw std::invalid_argument("Position is owned by self.");
     }
 
-    board[position] = EMPTY;
+    clear_spot(position, owned_by);
 }
 
 bool Board::can_delete(int pos, int player) {
@@ -65,18 +62,8 @@ bool Board::can_delete(int pos, int player) {
         // Cannot delete own or empty
         return false;
     }
-    // Check if it's in a mill
-    int other_player = player ^ 1;
-    if (check_mill(pos, other_player)) {
-        // Check if all of the players pieces are in a mill
-        for (int i = 0; i < FIELDS; i++) {
-            if (i != pos && get_owner(i) == other_player && !check_mill(i, other_player)) {
-                // We found a valid deletion which isn't this spot, but this spot is in a mill
-                return false;
-            }
-        }
-    }
-    return true;
+    // Pieces in a mill can only be taken if all of the players pieces are in a mill
+    return deletable_pieces(m_pieces[owned_by]) & spot_mask(pos);
 }
 
 void Board::move_piece(int from, int to, int player) {
@@ -85,9 +72,9 @@ void Board::move_piece(int from, int to, int player) {
         throw std::out_of_range("Invalid position!");
     }
 #endif
-    if (board[from] == player && board[to] == EMPTY && is_connected(from, to)) {
-        board[from] = EMPTY;
-        board[to] = player;
+    if (get_owner(from) == player && is_available(to) && is_connected(from, to)) {
+        clear_spot(from, player);
+        set_spot(to, player);
     } else {
         throw std::invalid_argument("Invalid move!");
     }
@@ -95,13 +82,12 @@ void Board::move_piece(int from, int to, int player) {
 
 void Board::move_piece_flying(int from, int to, int player) {
 #ifdef DEBUG_MODE
-    if (board.at(from) == player && board.at(to) == EMPTY)
-#else
-    if (board[from] == player && board[to] == EMPTY)
+    check_position(from);
+    check_position(to);
 #endif
-    {
-        board[from] = EMPTY;
-        board[to] = player;
+    if (get_owner(from) == player && is_available(to)) {
+        clear_spot(from, player);
+        set_spot(to, player);
     } else {
         std::stringstream ss;
         ss << "Invalid move from " << from << " to " << to;
@@ -110,37 +96,26 @@ void Board::move_piece_flying(int from, int to, int player) {
 }
 
 bool Board::is_connected(int pos1, int pos2) {
-    if (pos1 > pos2) {
-        std::swap(pos1, pos2);
-    }
-    for (auto &c : ALL_CONNECTIONS) {
-        if (c.pos1 == pos1 && c.pos2 == pos2) return true;
-    }
-    return false;
+    if (pos1 < 0 || pos1 >= FIELDS || pos2 < 0 || pos2 >= FIELDS) return false;
+    return NEIGHBOUR_MASKS[pos1] & spot_mask(pos2);
 }
 
 bool Board::is_mill(int a, int b, int c) {
-    // Get the three numbers in order
-    if (a > c) std::swap(a, c);
-    if (a > b) std::swap(a, b);
-    if (b > c) std::swap(b, c);
-
-    for (auto &con : ALL_LINE_CONNECTIONS) {
-        if (a == con.pos1 && b == con.pos2 && c == con.pos3) return true;
+    for (int pos : {a, b, c}) {
+        if (pos < 0 || pos >= FIELDS) return false;
+    }
+    Bitboard mask = spot_mask(a) | spot_mask(b) | spot_mask(c);
+    for (int line = 0; line < N_LINES; line++) {
+        if (mask == line_mask(line)) return true;
     }
     return false;
 }
 
 bool Board::check_mill(int position, int player) {
-    if (player == EMPTY) return false;
-
-    auto &checks = SPOT_TO_LINE_CONNECTION.at(position);
-
-    for (auto &mill : checks) {
-        if (board[mill.pos1] == player && board[mill.pos2] == player && board[mill.pos3] == player)
-            return true;
-    }
-    return false;
+    check_position(position);
+    if (player != 0 && player != 1) return false;
+    if (!(m_pieces[player] & spot_mask(position))) return false;
+    return is_mill_at(m_pieces[player], position);
 }
 
 int Board::get_player_pieces_on_hand(int player) const {
@@ -153,18 +128,62 @@ int Board::get_player_pieces_on_hand(int player) const {
 }
 
 
-std::size_t Board::get_board_hash() const {
-     // Inspired by https://stackoverflow.com/a/39269304
-
-    std::size_t seed = 0;
-    hash_combine(seed, turn_index);
-    hash_combine(seed, playerOnePieces);
-    hash_combine(seed, playerTwoPieces);
-
-    for (const int val : board){
-        hash_combine(seed, val);
+void Board::set_state(Bitboard pieces_0, Bitboard pieces_1, int hand_0, int hand_1, int turn) {
+    if ((pieces_0 | pieces_1) & ~ALL_SPOTS_MASK || pieces_0 & pieces_1) {
+        throw std::invalid_argument("Invalid pieces!");
+    }
+    for (int hand : {hand_0, hand_1}) {
+        if (hand < 0 || hand > MAX_HAND_PIECES) throw std::invalid_argument("Invalid hand!");
+    }
+    if (turn != 0 && turn != 1) throw std::invalid_argument("Invalid turn!");
+    m_pieces[0] = pieces_0;
+    m_pieces[1] = pieces_1;
+    playerOnePieces = hand_0;
+    playerTwoPieces = hand_1;
+    turn_index = turn;
+    m_key = compute_key();
+    if (m_track_features) m_features.compute(m_pieces);
+    m_history.clear();
+    push_history();
+}
+
+void Board::push_history() {
+    uint64_t key = get_position_key();
+    int reversible_plies = 0;
+    if (!m_history.empty()) {
+        // Captures and placements change the pieces on the board or on hand for good
+        uint64_t last = m_history.back().key;
+        Bitboard mask = ALL_SPOTS_MASK;
+        bool same_material = popcount(last & mask) == popcount(key & mask) &&
+                             popcount((last >> 24) & mask) == popcount((key >> 24) & mask) &&
+                             ((last ^ key) & (0xffull << 48)) == 0;
+        if (same_material) reversible_plies = m_history.back().reversible_plies + 1;
+    }
+    m_history.push_back({key, reversible_plies});
+}
+
+bool Board::is_repetition(int n) const {
+    const HistoryEntry &current = m_history.back();
+    int count = 1;
+    // The key includes the player to move, so only every other position can match
+    int first = (int)m_history.size() - 1 - current.reversible_plies;
+    for (int i = (int)m_history.size() - 3; i >= first && count < n; i -= 2) {
+        if (m_history[i].key == current.key) count++;
+    }
+    return count >= n;
+}
+
+uint64_t Board::compute_key() const {
+    uint64_t key = 0;
+    if (turn_index == 1) key ^= ZOBRIST.turn;
+    key ^= zobrist_hand(0, playerOnePieces);
+    key ^= zobrist_hand(1, playerTwoPieces);
+    for (int player = 0; player < 2; player++) {
+        for (Bitboard bb = m_pieces[player]; bb; bb = pop_lowest(bb)) {
+            key ^= ZOBRIST.pieces[player][lowest_spot(bb)];
+        }
     }
-    return seed;
+    return key;
 }
 
 void Board::execute_move(CandidateMove move) {
@@ -174,6 +193,7 @@ void Board::execute_move(CandidateMove move) {
         remove_piece(move.delete_pos, -1);
     }
     toggle_turn();
+    push_history();
 }
 
 void Board::execute_move(CandidatePlacement move) {
@@ -182,9 +202,11 @@ void Board::execute_move(CandidatePlacement move) {
         remove_piece(move.delete_pos, -1);
     }
     toggle_turn();
+    push_history();
 }
 
 void Board::undo_move(CandidatePlacement move) {
+    pop_history();
     reverse_turn();
     remove_piece(move.pos, -1);
     give_piece();
@@ -194,9 +216,28 @@ void Board::undo_move(CandidatePlacement move) {
 }
 
 void Board::undo_move(CandidateMove move) {
+    pop_history();
     reverse_turn();
     move_piece_flying(move.to_pos, move.from_pos);
     if (move.delete_pos != EMPTY) {
         temp_place_piece(move.delete_pos, this->turn_index ^ 1);
     }
 }
+
+void Board::execute_packed(PackedMove move) {
+    int from_pos = unpack_pos(move, 0);
+    if (from_pos == EMPTY) {
+        execute_move(CandidatePlacement(unpack_pos(move, 5), unpack_pos(move, 10)));
+    } else {
+        execute_move(CandidateMove(from_pos, unpack_pos(move, 5), unpack_pos(move, 10)));
+    }
+}
+
+void Board::undo_packed(PackedMove move) {
+    int from_pos = unpack_pos(move, 0);
+    if (from_pos == EMPTY) {
+        undo_move(CandidatePlacement(unpack_pos(move, 5), unpack_pos(move, 10)));
+    } else {
+        undo_move(CandidateMove(from_pos, unpack_pos(move, 5), unpack_pos(move, 10)));
+    }
+}
@@ -1,6 +1,26 @@
 #include "evaluator.hpp"
 
+#include <algorithm>
+#include <thread>
+
 float Evaluator::evaluate() {
+    uint64_t key = EvalCache::make_key(m_board_ptr->get_pieces(0), m_board_ptr->get_pieces(1));
+    float score;
+    if (m_cache.probe(key, score)) return score;
+    score = compute_score();
+    m_cache.store(key, score);
+    return score;
+}
+
+float Evaluator::compute_score() const {
+    if (m_incremental) {
+        // Every feature is a running total or a popcount, so this is just a dot product.
+        const BoardFeatures &features = m_board_ptr->get_features();
+        return get_piece_diff() * m_coeffs[0] - features.blocked[me] * m_coeffs[1] +
+               features.blocked[other] * m_coeffs[2] + get_central_pieces() * m_coeffs[3] +
+               features.two_piece_config[me] * m_coeffs[4] -
+               features.two_piece_config[other] * m_coeffs[5];
+    }
 
     float score = 0.0;
 
@@ -17,48 +37,89 @@ float Evaluator::evaluate() {
     return score;
 }
 
+void Evaluator::evaluate_batch(const int8_t *owners, const int32_t *hands, const int32_t *turns,
+                               size_t n, float *scores, int n_threads) const {
+    struct State {
+        Bitboard pieces[2];
+    };
+    // Validated up front, so the threads can't fail
+    std::vector<State> states(n);
+    Board check;
+    for (size_t i = 0; i < n; i++) {
+        Bitboard pieces[2] = {0, 0};
+        for (int pos = 0; pos < N_SPOTS; pos++) {
+            int owner = owners[i * N_SPOTS + pos];
+            if (owner == EMPTY) continue;
+            if (owner != 0 && owner != 1) throw std::invalid_argument("Invalid owner!");
+            pieces[owner] |= spot_mask(pos);
+        }
+        // Checks the hands and turn as well
+        check.set_state(pieces[0], pieces[1], hands[2 * i], hands[2 * i + 1], turns[i]);
+        states[i] = {{pieces[0], pieces[1]}};
+    }
+
+    auto evaluate_range = [&](size_t begin, size_t end) {
+        Board board;
+        Evaluator evaluator(&board, me, false);
+        evaluator.set_cache_size(0);
+        evaluator.m_coeffs = m_coeffs;
+        for (size_t i = begin; i < end; i++) {
+            board.set_state(states[i].pieces[0], states[i].pieces[1], hands[2 * i],
+                            hands[2 * i + 1], turns[i]);
+            scores[i] = evaluator.compute_score();
+        }
+    };
+
+    n_threads = std::max(1, std::min<int>(n_threads, n / 1024 + 1));
+    if (n_threads == 1) {
+        evaluate_range(0, n);
+        return;
+    }
+    std::vector<std::thread> threads;
+    size_t chunk = (n + n_threads - 1) / n_threads;
+    for (size_t begin = 0; begin < n; begin += chunk) {
+        threads.emplace_back(evaluate_range, begin, std::min(n, begin + chunk));
+    }
+    for (auto &thread : threads) {
+        thread.join();
+    }
+}
+
+std::vector<float> Evaluator::get_features() const {
+    return {get_piece_diff(),
+            (float)get_blocked_pieces(me),
+            (float)get_blocked_pieces(other),
+            (float)get_central_pieces(),
+            (float)get_two_piece_config(me),
+            (float)get_two_piece_config(other)};
+}
+
 int Evaluator::get_blocked_pieces(int player) const {
     int n_blocked = 0;
-    int other_player = player ^ 1;
-    for (int i = 0; i < FIELDS; i++) {
-        if (m_board_ptr->get_owner(i) != player) continue;
-        bool is_surrounded = true;
-        for (auto j : INDEX_CONNECTIONS[i]) {
-            if (m_board_ptr->get_owner(j) != other_player) {
-                is_surrounded = false;
-                break;
-            }
-        }
-        if (is_surrounded) ++n_blocked;
+    Bitboard other_pieces = m_board_ptr->get_pieces(player ^ 1);
+    for (Bitboard own = m_board_ptr->get_pieces(player); own; own = pop_lowest(own)) {
+        Bitboard neighbours = NEIGHBOUR_MASKS[lowest_spot(own)];
+        if ((neighbours & other_pieces) == neighbours) ++n_blocked;
     }
     return n_blocked;
 }
 
 int Evaluator::get_central_pieces() const {
-    int n_central = 0;
-    for (int i = 0; i < FIELDS; i++) {
-        if (m_board_ptr->get_owner(i) == this->me && INDEX_CONNECTIONS.at(i).size() == 4)
-            n_central++;
-    }
-    return n_central;
+    return popcount(m_board_ptr->get_pieces(me) & CENTRAL_MASK);
 }
 
 int Evaluator::get_two_piece_config(int player) const {
     int n_config = 0;
 
-    for (const auto &con : ALL_CONNECTIONS) {
-        if (m_board_ptr->get_owner(con.pos1) != player ||
-            m_board_ptr->get_owner(con.pos2) != player)
-            continue;
-        // Get the third spot
-        for (const auto &line : ALL_LINE_CONNECTIONS) {
-            if (line.contains(con)) {
-                int n_empty =
-                    (m_board_ptr->get_owner(line.pos1) + m_board_ptr->get_owner(line.pos2) +
-                     m_board_ptr->get_owner(line.pos3));
-                if (n_empty == 1) n_config++;
-            }
-        }
+    for (const auto &line : LINE_SPOTS) {
+        // Two connected pieces in a line, i.e. the middle and one of the ends.
+        if (m_board_ptr->get_owner(line[1]) != player) continue;
+        int n_ends = (m_board_ptr->get_owner(line[0]) == player) +
+                     (m_board_ptr->get_owner(line[2]) == player);
+        if (n_ends != 1) continue;
+        int n_empty = (m_board_ptr->get_owner(line[0]) + m_board_ptr->get_owner(line[1]) +
+                       m_board_ptr->get_owner(line[2]));
+        if (n_empty == 1) n_config++;
     }
 
     return n_config;
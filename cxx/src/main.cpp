@@ -1,17 +1,124 @@
+#include <pybind11/numpy.h>
 #include <pybind11/pybind11.h>
 #include <pybind11/stl.h>
 
+#include <algorithm>
+#include <string>
+#include <thread>
+
 #include "board.hpp"
 #include "evaluator.hpp"
+#include "ordering.hpp"
+#include "perft.hpp"
+#include "search.hpp"
+#include "selfplay.hpp"
+#include "symmetry.hpp"
+#include "tablebase.hpp"
+#include "transposition.hpp"
 
 namespace py = pybind11;
 
+/* Convert a packed move into the candidate type of its phase */
+py::object unpack_move(PackedMove move) {
+    int from_pos = unpack_pos(move, 0);
+    int to_pos = unpack_pos(move, 5);
+    int delete_pos = unpack_pos(move, 10);
+    if (to_pos == EMPTY) return py::none();
+    if (from_pos == EMPTY) return py::cast(CandidatePlacement(to_pos, delete_pos));
+    return py::cast(CandidateMove(from_pos, to_pos, delete_pos));
+}
+
+void check_transform(int t) {
+    if (t < 0 || t >= N_SYMMETRIES) throw py::value_error("Invalid symmetry transform");
+}
+
+std::string describe_move(PackedMove move) {
+    return "from " + std::to_string(unpack_pos(move, 0)) + " to " +
+           std::to_string(unpack_pos(move, 5)) + " deleting " + std::to_string(unpack_pos(move, 10));
+}
+
+/* Packed moves from Python are checked against the legal moves, the search executes them
+ * unchecked. */
+void execute_packed_checked(Board &board, PackedMove move) {
+    MoveFinder finder(&board);
+    std::vector<PackedMove> moves;
+    if (finder.get_phase() != -1) finder.get_packed_moves(board.get_turn_index(), moves);
+    if (std::find(moves.begin(), moves.end(), move) == moves.end()) {
+        throw py::value_error("Illegal move " + describe_move(move));
+    }
+    board.execute_packed(move);
+}
+
+/* Only the last move executed can be undone. The spots are checked first, so the undo itself
+ * can't fail, and the move is executed again if it doesn't lead back to the previous position. */
+void undo_packed_checked(Board &board, PackedMove move) {
+    int from_pos = unpack_pos(move, 0);
+    int to_pos = unpack_pos(move, 5);
+    int delete_pos = unpack_pos(move, 10);
+    auto is_spot = [](int pos) { return pos >= 0 && pos < N_SPOTS; };
+    bool is_valid = board.get_history_size() > 1 && is_spot(to_pos) &&
+                    board.get_owner(to_pos) == (board.get_turn_index() ^ 1);
+    if (from_pos != EMPTY) {
+        is_valid &= is_spot(from_pos) && from_pos != to_pos && board.is_available(from_pos);
+    }
+    if (delete_pos != EMPTY) {
+        is_valid &= is_spot(delete_pos) && delete_pos != from_pos && board.is_available(delete_pos);
+    }
+    if (is_valid) {
+        board.undo_packed(move);
+        if (board.is_last_in_history()) return;
+        board.execute_packed(move);
+    }
+    throw py::value_error("Cannot undo the move " + describe_move(move));
+}
+
+/* The packed moves of the player as a uint16 array. The array owns the move buffer, so no copy is
+ * made and no Python object is created per move. */
+py::array_t<PackedMove> get_moves_array(const MoveFinder &finder, int player) {
+    auto *moves = new std::vector<PackedMove>();
+    finder.get_packed_moves(player, *moves);
+    py::capsule owner(moves, [](void *ptr) { delete static_cast<std::vector<PackedMove> *>(ptr); });
+    return py::array_t<PackedMove>(moves->size(), moves->data(), owner);
+}
+
+/* Scores of the positions given as arrays, see Evaluator::evaluate_batch */
+py::array_t<float> evaluate_batch(
+    const Evaluator &evaluator,
+    py::array_t<int8_t, py::array::c_style | py::array::forcecast> owners,
+    py::array_t<int32_t, py::array::c_style | py::array::forcecast> hands,
+    py::array_t<int32_t, py::array::c_style | py::array::forcecast> turns, int threads) {
+    size_t n = owners.ndim() == 2 ? owners.shape(0) : 0;
+    if (owners.ndim() != 2 || owners.shape(1) != N_SPOTS) {
+        throw std::invalid_argument("owners must have the shape (N, 24)");
+    }
+    if (hands.ndim() != 2 || (size_t)hands.shape(0) != n || hands.shape(1) != 2) {
+        throw std::invalid_argument("hands must have the shape (N, 2)");
+    }
+    if (turns.ndim() != 1 || (size_t)turns.shape(0) != n) {
+        throw std::invalid_argument("turns must have the shape (N,)");
+    }
+    if (threads <= 0) threads = std::max(1u, std::thread::hardware_concurrency());
+
+    py::array_t<float> scores(n);
+    const int8_t *owners_ptr = owners.data();
+    const int32_t *hands_ptr = hands.data();
+    const int32_t *turns_ptr = turns.data();
+    float *scores_ptr = scores.mutable_data();
+    {
+        py::gil_scoped_release release;
+        evaluator.evaluate_batch(owners_ptr, hands_ptr, turns_ptr, n, scores_ptr, threads);
+    }
+    return scores;
+}
+
 PYBIND11_MODULE(nnm_board, m) {
     py::class_<Board>(m, "Board")
         .def(py::init<>())
         // Attributes
         .def_property_readonly("turn_index", &Board::get_turn_index)
         .def_property_readonly("ply", &Board::get_ply)
+        .def_property_readonly("key", &Board::get_key)
+        .def_property_readonly("position_key", &Board::get_position_key)
         // Methods
         .def("toggle_turn", &Board::toggle_turn)
         .def("reverse_turn", &Board::reverse_turn)
@@ -35,6 +142,10 @@ PYBIND11_MODULE(nnm_board, m) {
         .def("undo_move", py::overload_cast<CandidatePlacement>(&Board::undo_move))
         .def("undo_move", py::overload_cast<CandidateMove>(&Board::undo_move))
 
+        // Packed moves, see pack_move
+        .def("execute_move", &execute_packed_checked)
+        .def("undo_move", &undo_packed_checked)
+
 
         // Helper stuff
         .def("can_delete", &Board::can_delete)
@@ -46,28 +157,246 @@ PYBIND11_MODULE(nnm_board, m) {
         .def("is_mill", &Board::is_mill)
         .def("check_mill", &Board::check_mill)
         .def("get_board_hash", &Board::get_board_hash)
-        .def("get_board", &Board::getBoard);
+        .def("compute_key", &Board::compute_key)
+        .def("set_state", &Board::set_state, py::arg("pieces_0"), py::arg("pieces_1"),
+             py::arg("hand_0"), py::arg("hand_1"), py::arg("turn"))
+        .def("get_board", &Board::getBoard)
+        // Game history
+        .def("is_repetition", &Board::is_repetition, py::arg("n") = 3)
+        .def("commit_position", &Board::commit_position)
+        .def_property_readonly("history_size", &Board::get_history_size);
 
     py::class_<MoveFinder>(m, "MoveFinder")
         .def(py::init<Board *>())
         .def("get_phase", &MoveFinder::get_phase)
         .def("get_movement_phase_moves", &MoveFinder::get_movement_phase_moves)
-        .def("get_phase_one_moves", &MoveFinder::get_phase_one_moves);
+        .def("get_phase_one_moves", &MoveFinder::get_phase_one_moves)
+        .def("get_moves_array", &get_moves_array, py::arg("player"));
 
     py::class_<CandidateMove>(m, "CppCandidateMove")
         .def_readonly("from_pos", &CandidateMove::from_pos)
         .def_readonly("to_pos", &CandidateMove::to_pos)
-        .def_readonly("delete_pos", &CandidateMove::delete_pos);
+        .def_readonly("delete_pos", &CandidateMove::delete_pos)
+        .def_property_readonly("packed", &CandidateMove::pack);
 
     py::class_<CandidatePlacement>(m, "CppCandidatePlacement")
         .def_readonly("pos", &CandidatePlacement::pos)
-        .def_readonly("delete_pos", &CandidatePlacement::delete_pos);
+        .def_readonly("delete_pos", &CandidatePlacement::delete_pos)
+        .def_property_readonly("packed", &CandidatePlacement::pack);
 
     py::class_<Evaluator>(m, "Evaluator")
-        .def(py::init<Board *, int>())
+        .def(py::init<Board *, int, bool>(), py::arg("board"), py::arg("me"),
+             py::arg("incremental") = true, py::keep_alive<1, 2>())
         .def("evaluate", &Evaluator::evaluate)
+        .def_property("incremental", &Evaluator::is_incremental, &Evaluator::set_incremental)
+        .def("get_features", &Evaluator::get_features)
+        .def("evaluate_batch", &evaluate_batch, py::arg("owners"), py::arg("hands"),
+             py::arg("turns"), py::arg("threads") = 1)
         .def("brain_size", &Evaluator::brain_size)
         .def("reset", &Evaluator::reset)
+        .def("set_cache_size", &Evaluator::set_cache_size)
+        .def_property_readonly("cache_size",
+                               [](const Evaluator &self) { return self.get_cache().size(); })
+        .def_property_readonly("cache_hits",
+                               [](const Evaluator &self) { return self.get_cache().hits(); })
+        .def_property_readonly("cache_misses",
+                               [](const Evaluator &self) { return self.get_cache().misses(); })
         .def("get_brain", &Evaluator::get_brain)
         .def("set_brain", &Evaluator::set_brain);
+
+    py::enum_<Bound>(m, "Bound")
+        .value("NONE", Bound::NONE)
+        .value("EXACT", Bound::EXACT)
+        .value("LOWER", Bound::LOWER)
+        .value("UPPER", Bound::UPPER);
+
+    py::class_<TTEntry>(m, "TTEntry")
+        .def_readonly("score", &TTEntry::score)
+        .def_readonly("move", &TTEntry::move)
+        .def_readonly("depth", &TTEntry::depth)
+        .def_readonly("bound", &TTEntry::bound);
+
+    py::class_<TranspositionTable>(m, "TranspositionTable")
+        .def(py::init<size_t>(), py::arg("size_mb"))
+        .def("resize", &TranspositionTable::resize)
+        .def("clear", &TranspositionTable::clear)
+        .def("new_search", &TranspositionTable::new_search)
+        .def("probe",
+             [](const TranspositionTable &tt, uint64_t key) -> std::optional<TTEntry> {
+                 TTEntry entry;
+                 if (tt.probe(key, entry)) return entry;
+                 return std::nullopt;
+             })
+        .def("store", &TranspositionTable::store, py::arg("key"), py::arg("depth"),
+             py::arg("score"), py::arg("bound"), py::arg("move"))
+        .def("__len__", &TranspositionTable::size)
+        .def_property_readonly("size_bytes", &TranspositionTable::size_bytes);
+
+    py::class_<MoveOrderer>(m, "MoveOrderer")
+        .def(py::init<Board *>(), py::keep_alive<1, 2>())
+        .def("clear", &MoveOrderer::clear)
+        .def("age", &MoveOrderer::age)
+        .def("score_move", &MoveOrderer::score_move, py::arg("move"), py::arg("ply"),
+             py::arg("tt_move") = NO_MOVE)
+        .def("order", &MoveOrderer::order_candidates<CandidatePlacement>, py::arg("moves"),
+             py::arg("ply"), py::arg("tt_move") = NO_MOVE)
+        .def("order", &MoveOrderer::order_candidates<CandidateMove>, py::arg("moves"),
+             py::arg("ply"), py::arg("tt_move") = NO_MOVE)
+        .def("update", &MoveOrderer::update, py::arg("move"), py::arg("ply"), py::arg("depth"))
+        .def("get_killers", &MoveOrderer::get_killers, py::arg("ply"));
+
+    m.attr("NO_MOVE") = NO_MOVE;
+
+    py::class_<SearchResult>(m, "SearchResult")
+        .def_readonly("packed_move", &SearchResult::move)
+        .def_property_readonly("move", [](const SearchResult &r) { return unpack_move(r.move); })
+        .def_readonly("score", &SearchResult::score)
+        .def_readonly("depth", &SearchResult::depth)
+        .def_readonly("nodes", &SearchResult::nodes);
+
+    py::enum_<ParallelMode>(m, "ParallelMode")
+        .value("ROOT_SPLIT", ParallelMode::ROOT_SPLIT)
+        .value("LAZY_SMP", ParallelMode::LAZY_SMP);
+
+    PruningParams defaults;
+    py::class_<PruningParams>(m, "PruningParams")
+        .def(py::init([](bool lmr, int lmr_min_depth, int lmr_min_moves, int lmr_reduction,
+                         bool futility, float futility_margin, bool razoring, float razor_margin) {
+                 return PruningParams{lmr,      lmr_min_depth,   lmr_min_moves, lmr_reduction,
+                                      futility, futility_margin, razoring,      razor_margin};
+             }),
+             py::arg("lmr") = defaults.lmr, py::arg("lmr_min_depth") = defaults.lmr_min_depth,
+             py::arg("lmr_min_moves") = defaults.lmr_min_moves,
+             py::arg("lmr_reduction") = defaults.lmr_reduction,
+             py::arg("futility") = defaults.futility,
+             py::arg("futility_margin") = defaults.futility_margin,
+             py::arg("razoring") = defaults.razoring,
+             py::arg("razor_margin") = defaults.razor_margin)
+        .def_readwrite("lmr", &PruningParams::lmr)
+        .def_readwrite("lmr_min_depth", &PruningParams::lmr_min_depth)
+        .def_readwrite("lmr_min_moves", &PruningParams::lmr_min_moves)
+        .def_readwrite("lmr_reduction", &PruningParams::lmr_reduction)
+        .def_readwrite("futility", &PruningParams::futility)
+        .def_readwrite("futility_margin", &PruningParams::futility_margin)
+        .def_readwrite("razoring", &PruningParams::razoring)
+        .def_readwrite("razor_margin", &PruningParams::razor_margin)
+        .def("__repr__", [](const PruningParams &self) {
+            return "PruningParams(lmr=" + std::string(self.lmr ? "True" : "False") +
+                   ", futility=" + (self.futility ? "True" : "False") +
+                   ", razoring=" + (self.razoring ? "True" : "False") + ")";
+        });
+
+    py::class_<Searcher>(m, "Searcher")
+        .def(py::init<Board *, Evaluator *, size_t>(), py::arg("board"), py::arg("evaluator"),
+             py::arg("tt_size_mb") = 16, py::keep_alive<1, 2>(), py::keep_alive<1, 3>())
+        .def("search", &Searcher::search, py::arg("max_depth"), py::arg("time_limit_ms") = 0,
+             py::arg("workers") = 1, py::arg("mode") = ParallelMode::ROOT_SPLIT,
+             py::call_guard<py::gil_scoped_release>())
+        .def("set_seed", &Searcher::set_seed, py::arg("seed"))
+        .def("set_excluded_moves", &Searcher::set_excluded_moves, py::arg("moves"))
+        .def("set_quiescence_plies", &Searcher::set_quiescence_plies, py::arg("plies"))
+        .def("set_pvs", &Searcher::set_pvs, py::arg("enable"))
+        .def("set_aspiration_window", &Searcher::set_aspiration_window, py::arg("window"))
+        .def_property("pruning", &Searcher::get_pruning, &Searcher::set_pruning)
+        .def("set_tablebase", &Searcher::set_tablebase, py::arg("tablebase"),
+             py::keep_alive<1, 2>())
+        .def_property_readonly("table", &Searcher::get_table,
+                               py::return_value_policy::reference_internal)
+        .def("reset", &Searcher::reset);
+
+    py::class_<GameResult>(m, "GameResult")
+        .def_readonly("winner", &GameResult::winner)
+        .def_readonly("is_draw", &GameResult::is_draw)
+        .def_readonly("plies", &GameResult::plies)
+        .def_readonly("pieces", &GameResult::pieces)
+        .def_readonly("moves", &GameResult::moves)
+        .def("__repr__", [](const GameResult &self) {
+            return "GameResult(winner=" + std::to_string(self.winner) +
+                   ", is_draw=" + (self.is_draw ? "True" : "False") +
+                   ", plies=" + std::to_string(self.plies) + ", pieces=(" +
+                   std::to_string(self.pieces[0]) + ", " + std::to_string(self.pieces[1]) + "))";
+        });
+
+    py::enum_<TBResult>(m, "TBResult")
+        .value("DRAW", TBResult::DRAW)
+        .value("WIN", TBResult::WIN)
+        .value("LOSS", TBResult::LOSS);
+
+    py::class_<TBEntry>(m, "TBEntry")
+        .def_readonly("result", &TBEntry::result)
+        .def_readonly("distance", &TBEntry::distance);
+
+    py::class_<Tablebase>(m, "Tablebase")
+        .def(py::init<const std::string &>(), py::arg("directory"))
+        .def("has_partition", &Tablebase::has_partition)
+        .def("partitions", &Tablebase::partitions)
+        .def(
+            "probe",
+            [](const Tablebase &self, const Board &board) -> std::optional<TBEntry> {
+                TBEntry entry;
+                if (!self.probe(board, entry)) return std::nullopt;
+                return entry;
+            },
+            py::arg("board"))
+        .def(
+            "score",
+            [](const Tablebase &self, const Board &board, int player) -> std::optional<float> {
+                float score;
+                if (!self.score(board, player, score)) return std::nullopt;
+                return score;
+            },
+            py::arg("board"), py::arg("player"));
+
+    m.attr("DEFAULT_QUIESCENCE_PLIES") = DEFAULT_QUIESCENCE_PLIES;
+    m.attr("DEFAULT_ASPIRATION_WINDOW") = DEFAULT_ASPIRATION_WINDOW;
+    m.attr("TB_WIN_SCORE") = TB_WIN_SCORE;
+    m.def("tb_partition_size", &tb_partition_size);
+    m.def("solve_tablebase", &solve_tablebase, py::arg("n_a"), py::arg("n_b"),
+          py::arg("directory"), py::call_guard<py::gil_scoped_release>());
+
+    m.def("play_game", &play_game, py::arg("brain_a"), py::arg("brain_b"), py::arg("depth_a"),
+          py::arg("depth_b"), py::arg("seed") = 0, py::arg("tt_size_mb") = 16,
+          py::arg("pruning_a") = PruningParams(), py::arg("pruning_b") = PruningParams(),
+          py::call_guard<py::gil_scoped_release>());
+
+    m.def("pack_move", &pack_move, py::arg("from_pos"), py::arg("to_pos"),
+          py::arg("delete_pos") = EMPTY);
+    m.def("unpack_move", &unpack_move);
+
+    m.def("perft", &perft, py::arg("board"), py::arg("depth"), py::arg("bulk") = true,
+          py::call_guard<py::gil_scoped_release>());
+    m.def("divide", &divide, py::arg("board"), py::arg("depth"), py::arg("bulk") = true,
+          py::call_guard<py::gil_scoped_release>());
+
+    m.attr("N_SYMMETRIES") = N_SYMMETRIES;
+    m.def(
+        "canonicalize",
+        [](const Board &board) {
+            CanonicalKey canonical = canonicalize(board);
+            return py::make_tuple(canonical.key, canonical.transform);
+        },
+        py::arg("board"));
+    m.def("canonical_key", &canonical_key, py::arg("board"));
+    m.def(
+        "transform_spot",
+        [](int pos, int t) {
+            check_transform(t);
+            if (pos != EMPTY && (pos < 0 || pos >= N_SPOTS)) throw py::value_error("Invalid spot");
+            return transform_spot(pos, t);
+        },
+        py::arg("pos"), py::arg("transform"));
+    m.def(
+        "transform_move",
+        [](PackedMove move, int t) {
+            check_transform(t);
+            return transform_move(move, t);
+        },
+        py::arg("move"), py::arg("transform"));
+    m.def(
+        "inverse_transform",
+        [](int t) {
+            check_transform(t);
+            return INVERSE_TRANSFORMS[t];
+        },
+        py::arg("transform"));
 }
@@ -0,0 +1,53 @@
+#include "perft.hpp"
+
+#include <stdexcept>
+
+namespace {
+
+/* One move buffer per ply, so counting doesn't allocate */
+uint64_t perft_moves(Board &board, MoveFinder &move_finder, int depth, bool bulk,
+                     std::vector<std::vector<PackedMove>> &move_stack) {
+    if (depth == 0) return 1;
+    if (move_finder.get_phase() == -1) return 0;
+    auto &moves = move_stack[depth];
+    move_finder.get_packed_moves(board.get_turn_index(), moves);
+    if (bulk && depth == 1) return moves.size();
+
+    uint64_t nodes = 0;
+    for (PackedMove move : moves) {
+        board.execute_packed(move);
+        nodes += perft_moves(board, move_finder, depth - 1, bulk, move_stack);
+        board.undo_packed(move);
+    }
+    return nodes;
+}
+
+void check_depth(int depth) {
+    if (depth < 0) throw std::invalid_argument("Depth must not be negative");
+}
+
+}  // namespace
+
+uint64_t perft(Board &board, int depth, bool bulk) {
+    check_depth(depth);
+    MoveFinder move_finder(&board);
+    std::vector<std::vector<PackedMove>> move_stack(depth + 1);
+    return perft_moves(board, move_finder, depth, bulk, move_stack);
+}
+
+std::vector<std::pair<PackedMove, uint64_t>> divide(Board &board, int depth, bool bulk) {
+    check_depth(depth);
+    std::vector<std::pair<PackedMove, uint64_t>> counts;
+    MoveFinder move_finder(&board);
+    if (depth == 0 || move_finder.get_phase() == -1) return counts;
+
+    std::vector<PackedMove> moves;
+    move_finder.get_packed_moves(board.get_turn_index(), moves);
+    std::vector<std::vector<PackedMove>> move_stack(depth);
+    for (PackedMove move : moves) {
+        board.execute_packed(move);
+        counts.emplace_back(move, perft_moves(board, move_finder, depth - 1, bulk, move_stack));
+        board.undo_packed(move);
+    }
+    return counts;
+}
@@ -0,0 +1,472 @@
+#include "search.hpp"
+
+#include <algorithm>
+#include <cmath>
+#include <thread>
+
+SearchWorker::SearchWorker(const Board &board, const Evaluator &evaluator, size_t tt_size_mb)
+    : board(board), evaluator(evaluator, &this->board) {
+    searcher = std::make_unique<Searcher>(&this->board, &this->evaluator, tt_size_mb);
+}
+
+std::vector<PackedMove> &Searcher::generate_moves(int ply, PackedMove first_move) {
+    auto &moves = m_move_stack[ply];
+    m_move_finder.get_packed_moves(m_board_ptr->get_turn_index(), moves);
+    if (ply == 0 && !m_excluded.empty()) {
+        auto excluded = [&](PackedMove move) {
+            return std::find(m_excluded.begin(), m_excluded.end(), move) != m_excluded.end();
+        };
+        moves.erase(std::remove_if(moves.begin(), moves.end(), excluded), moves.end());
+    }
+    if (ply == 0 && m_rng_state != 0) {
+        // Fisher-Yates, the ordering below is stable so ties keep the shuffled order
+        for (size_t i = moves.size(); i > 1; i--) {
+            std::swap(moves[i - 1], moves[splitmix64(m_rng_state) % i]);
+        }
+    }
+    if (ply == 0) m_root_moves = moves;
+
+    // Search the best move from an earlier visit of the position first
+    TTEntry entry;
+    if (first_move == NO_MOVE && m_tt->probe(m_board_ptr->get_key(), entry)) {
+        first_move = entry.move;
+    }
+    m_orderer.order(moves, ply, first_move);
+    return moves;
+}
+
+void Searcher::prepare(int max_depth) {
+    m_nodes = 0;
+    m_stopped = false;
+    // A shared table is aged by the thread owning it
+    if (m_tt == &m_own_tt) m_tt->new_search();
+    m_orderer.age();
+    // Resized up front, as the buffers are used by reference in the recursion
+    if ((int)m_move_stack.size() < max_depth + m_quiescence_plies + 2) {
+        m_move_stack.resize(max_depth + m_quiescence_plies + 2);
+    }
+}
+
+void Searcher::setup_workers(int workers, ParallelMode mode) {
+    if ((int)m_workers.size() != workers || m_worker_mode != mode) m_workers.clear();
+    m_worker_mode = mode;
+    // Root split workers get a share of the table, at least 1 MB unless ours is disabled. Lazy
+    // SMP workers share ours.
+    size_t worker_tt_mb = 0;
+    if (mode == ParallelMode::ROOT_SPLIT && m_tt_size_mb > 0) {
+        worker_tt_mb = std::max<size_t>(m_tt_size_mb / workers, 1);
+    }
+    while ((int)m_workers.size() < workers) {
+        m_workers.push_back(
+            std::make_unique<SearchWorker>(*m_board_ptr, *m_evaluator_ptr, worker_tt_mb));
+        if (mode == ParallelMode::LAZY_SMP) {
+            m_workers.back()->searcher->m_tt = m_tt;
+        }
+    }
+    // Every worker starts from a copy of the current board
+    for (auto &worker : m_workers) {
+        worker->board = *m_board_ptr;
+        worker->evaluator.set_brain(m_evaluator_ptr->get_brain());
+        worker->searcher->m_tablebase = m_tablebase;
+        worker->searcher->m_quiescence_plies = m_quiescence_plies;
+        worker->searcher->m_pvs = m_pvs;
+        worker->searcher->m_pruning = m_pruning;
+        worker->searcher->m_aspiration_window = m_aspiration_window;
+    }
+}
+
+bool Searcher::is_generated_before(PackedMove a, PackedMove b) const {
+    for (PackedMove move : m_root_moves) {
+        if (move == a) return true;
+        if (move == b) return false;
+    }
+    return false;
+}
+
+SearchResult Searcher::search(int max_depth, int time_limit_ms, int workers, ParallelMode mode) {
+    prepare(max_depth);
+    m_parallel_root = false;
+    m_independent_tt = false;
+    if (workers > 1) {
+        setup_workers(workers, mode);
+        if (mode == ParallelMode::LAZY_SMP) {
+            return search_lazy_smp(max_depth, time_limit_ms);
+        }
+        for (auto &worker : m_workers) {
+            worker->searcher->prepare(max_depth);
+            worker->searcher->m_independent_tt = true;
+        }
+        m_parallel_root = true;
+    }
+    return iterate(max_depth, time_limit_ms, false);
+}
+
+SearchResult Searcher::iterate(int max_depth, int time_limit_ms, bool always_iterate) {
+    auto search_depth = [&](int depth, PackedMove first_move, float alpha, float beta) {
+        return m_parallel_root ? search_root_parallel(depth, first_move, alpha, beta)
+                               : search_root(depth, first_move, alpha, beta);
+    };
+
+    m_use_deadline = time_limit_ms > 0;
+    if (!m_use_deadline && !always_iterate) {
+        return search_depth(max_depth, NO_MOVE, MIN_FLOAT, MAX_FLOAT);
+    }
+    m_deadline = std::chrono::steady_clock::now() + std::chrono::milliseconds(time_limit_ms);
+    bool has_deadline = m_use_deadline;
+
+    SearchResult best;
+    for (int depth = 1; depth <= max_depth; depth++) {
+        // The first iteration always completes, so we have a move to return
+        m_use_deadline = has_deadline && depth > 1;
+        // Aspiration window around the score of the previous iteration, opened up on the side
+        // the score falls outside of.
+        float alpha = MIN_FLOAT;
+        float beta = MAX_FLOAT;
+        if (m_aspiration_window > 0 && best.move != NO_MOVE && std::isfinite(best.score)) {
+            alpha = best.score - m_aspiration_window;
+            beta = best.score + m_aspiration_window;
+        }
+        SearchResult result;
+        while (true) {
+            result = search_depth(depth, best.move, alpha, beta);
+            if (m_stopped) break;
+            if (alpha > MIN_FLOAT && result.score <= alpha) {
+                alpha = MIN_FLOAT;
+            } else if (beta < MAX_FLOAT && result.score >= beta) {
+                beta = MAX_FLOAT;
+            } else {
+                break;
+            }
+        }
+        if (m_stopped) break;
+        best = result;
+        if (is_time_up()) break;
+    }
+    best.nodes = m_nodes;
+    return best;
+}
+
+SearchResult Searcher::search_lazy_smp(int max_depth, int time_limit_ms) {
+    std::atomic<bool> abort{false};
+    std::vector<std::thread> threads;
+    for (size_t i = 0; i < m_workers.size(); i++) {
+        Searcher &helper = *m_workers[i]->searcher;
+        helper.prepare(max_depth + 1);
+        helper.m_parallel_root = false;
+        helper.m_independent_tt = false;
+        helper.m_abort = &abort;
+        // Different depths and root move orders, so the helpers fill the table with different
+        // parts of the tree than the main thread is searching.
+        helper.m_root_rotation = i + 1;
+        int helper_depth = max_depth + (i % 2);
+        threads.emplace_back([&helper, helper_depth, time_limit_ms]() {
+            helper.iterate(helper_depth, time_limit_ms, true);
+        });
+    }
+
+    SearchResult result = iterate(max_depth, time_limit_ms, true);
+
+    abort = true;
+    for (auto &thread : threads) {
+        thread.join();
+    }
+    for (auto &worker : m_workers) {
+        result.nodes += worker->searcher->m_nodes;
+        worker->searcher->m_abort = nullptr;
+    }
+    return result;
+}
+
+SearchResult Searcher::search_root(int max_depth, PackedMove first_move, float alpha,
+                                  float beta) {
+    SearchResult result;
+    m_max_depth = max_depth;
+
+    // The best move of the previous iteration goes first
+    auto &moves = generate_moves(0, first_move);
+    if (m_root_rotation > 0 && moves.size() > 2) {
+        std::rotate(moves.begin() + 1, moves.begin() + 1 + m_root_rotation % (moves.size() - 1),
+                    moves.end());
+    }
+    for (PackedMove move : moves) {
+        // Ties go to the move generated first, so the result doesn't depend on the ordering. A
+        // move equal to the best so far fails low, unless it was generated before it.
+        bool wins_ties = result.move != NO_MOVE && is_generated_before(move, result.move);
+        if (result.score >= beta) {
+            // A win is searched on for wins generated before it, anything else fails high
+            if (beta < MAX_FLOAT) break;
+            if (!wins_ties) continue;
+        }
+        float child_alpha = std::max(
+            alpha, wins_ties ? std::nextafter(result.score, MIN_FLOAT) : result.score);
+        m_board_ptr->execute_packed(move);
+        float score = search_child(0, child_alpha, beta, false, result.move == NO_MOVE);
+        m_board_ptr->undo_packed(move);
+        if (m_stopped) return result;
+        if (result.move == NO_MOVE || score > result.score ||
+            (score == result.score && wins_ties)) {
+            result.score = score;
+            result.move = move;
+        }
+    }
+    if (result.move != NO_MOVE) {
+        m_tt->store(m_board_ptr->get_key(), max_depth + 1, result.score,
+                    score_bound(result.score, alpha, beta), result.move);
+    }
+    result.depth = max_depth;
+    result.nodes = m_nodes;
+    return result;
+}
+
+SearchResult Searcher::search_root_parallel(int max_depth, PackedMove first_move, float alpha,
+                                           float beta) {
+    SearchResult result;
+    m_max_depth = max_depth;
+
+    // Ordered once, so the moves are handed out in the same order as a sequential search
+    RootSplit split;
+    split.moves = &generate_moves(0, first_move);
+    split.scores.assign(split.moves->size(), MIN_FLOAT);
+    split.alpha = alpha;
+    split.beta = beta;
+
+    std::vector<std::thread> threads;
+    for (auto &worker : m_workers) {
+        Searcher &searcher = *worker->searcher;
+        searcher.m_max_depth = max_depth;
+        searcher.m_use_deadline = m_use_deadline;
+        searcher.m_deadline = m_deadline;
+        threads.emplace_back([&searcher, &split]() { searcher.search_root_moves(split); });
+    }
+    for (auto &thread : threads) {
+        thread.join();
+    }
+    for (auto &worker : m_workers) {
+        m_nodes += worker->searcher->m_nodes;
+        worker->searcher->m_nodes = 0;
+        m_stopped |= worker->searcher->m_stopped;
+    }
+    if (m_stopped) return result;
+
+    // Same tie breaking as the sequential search, the first generated of the best moves wins
+    const auto &moves = *split.moves;
+    for (size_t i = 0; i < moves.size(); i++) {
+        if (result.move == NO_MOVE || split.scores[i] > result.score ||
+            (split.scores[i] == result.score && is_generated_before(moves[i], result.move))) {
+            result.score = split.scores[i];
+            result.move = moves[i];
+        }
+    }
+    if (result.move != NO_MOVE) {
+        m_tt->store(m_board_ptr->get_key(), max_depth + 1, result.score,
+                    score_bound(result.score, alpha, beta), result.move);
+    }
+    result.depth = max_depth;
+    result.nodes = m_nodes;
+    return result;
+}
+
+void Searcher::search_root_moves(RootSplit &split) {
+    const auto &moves = *split.moves;
+    for (size_t i = split.next_move++; i < moves.size(); i = split.next_move++) {
+        // Moves which can't beat the best score found by any thread so far fail low. The window
+        // starts just below it, so a score equal to alpha is still exact and ties can be broken
+        // by generation order, as in the sequential search.
+        float alpha = split.alpha.load();
+        m_board_ptr->execute_packed(moves[i]);
+        float score =
+            search_child(0, std::nextafter(alpha, MIN_FLOAT), split.beta, false, i == 0);
+        m_board_ptr->undo_packed(moves[i]);
+        if (m_stopped) return;
+        split.scores[i] = score;
+        while (score > alpha && !split.alpha.compare_exchange_weak(alpha, score)) {
+        }
+    }
+}
+
+bool Searcher::is_time_up() {
+    if (m_use_deadline && std::chrono::steady_clock::now() >= m_deadline) {
+        m_stopped = true;
+    }
+    if (m_abort != nullptr && m_abort->load(std::memory_order_relaxed)) {
+        m_stopped = true;
+    }
+    return m_stopped;
+}
+
+float Searcher::search_child(int depth, float alpha, float beta, bool is_maximizing, bool is_first,
+                             int reduction) {
+    if (reduction > 0) {
+        // Reduced null window search, only a move improving on the parent is searched in full
+        float score = is_maximizing
+                          ? minimax(depth + reduction, std::nextafter(beta, MIN_FLOAT), beta, true)
+                          : minimax(depth + reduction, alpha, std::nextafter(alpha, MAX_FLOAT),
+                                    false);
+        if (m_stopped || (is_maximizing ? score >= beta : score <= alpha)) return score;
+    }
+    if (!m_pvs || is_first) return minimax(depth, alpha, beta, is_maximizing);
+    // Null window, only whether the move improves on the bound of the parent. The parent is the
+    // other player, so a maximizing child improves on beta and a minimizing child on alpha.
+    float score;
+    if (is_maximizing) {
+        score = minimax(depth, std::nextafter(beta, MIN_FLOAT), beta, true);
+        if (score < beta && score > alpha && !m_stopped) {
+            score = minimax(depth, alpha, beta, true);
+        }
+    } else {
+        score = minimax(depth, alpha, std::nextafter(alpha, MAX_FLOAT), false);
+        if (score > alpha && score < beta && !m_stopped) {
+            score = minimax(depth, alpha, beta, false);
+        }
+    }
+    return score;
+}
+
+float Searcher::minimax(int depth, float alpha, float beta, bool is_maximizing) {
+    m_nodes++;
+    if ((m_nodes & 1023) == 0 && is_time_up()) return 0.0;
+    int phase = m_move_finder.get_phase();
+    if (phase == -1) {
+        // Game over: the player to move is out of pieces or blocked and has lost, unless the
+        // other player is the one with too few pieces, as in play_game.
+        int player = m_board_ptr->get_turn_index();
+        int winner = m_board_ptr->pieces_on_board(player ^ 1) < 3 ? player : player ^ 1;
+        return winner == m_evaluator_ptr->get_me() ? MAX_FLOAT : MIN_FLOAT;
+    }
+    // A position seen before, in the game or the search, is a draw: whoever gains from the
+    // repetition can repeat it again.
+    if (m_board_ptr->is_repetition(2)) return 0.0;
+    float tb_score;
+    if (m_tablebase != nullptr &&
+        m_tablebase->score(*m_board_ptr, m_evaluator_ptr->get_me(), tb_score)) {
+        return tb_score;
+    }
+    if (depth >= m_max_depth) {
+        return quiesce(depth, alpha, beta, is_maximizing);
+    }
+
+    int remaining = m_max_depth - depth;
+    uint64_t key = m_board_ptr->get_key();
+    // Entries of deeper searches are at least as good. Root split workers only take entries whose
+    // score doesn't depend on which searches filled the table: of the same depth, and of nodes no
+    // earlier position can repeat from, as repetitions make the score depend on the path to the
+    // node. So their result doesn't depend on how the moves were split.
+    bool is_independent = !m_independent_tt || m_board_ptr->is_irreversible();
+    TTEntry entry;
+    if (is_independent && m_tt->probe(key, entry) &&
+        (m_independent_tt ? entry.depth == remaining : entry.depth >= remaining)) {
+        if (entry.bound == Bound::EXACT) return entry.score;
+        if (entry.bound == Bound::LOWER && entry.score >= beta) return entry.score;
+        if (entry.bound == Bound::UPPER && entry.score <= alpha) return entry.score;
+    }
+    float alpha_orig = alpha;
+    float beta_orig = beta;
+
+    // Selective pruning near the horizon, when the static evaluation is far outside the window.
+    // Futility: one ply from the horizon, only captures can make up for the margin.
+    // Razoring: two plies from the horizon, the moves are searched one ply shallower.
+    bool is_futile = false;
+    float futility_bound = 0.0;
+    int razor_plies = 0;
+    if ((m_pruning.futility && remaining == 1) || (m_pruning.razoring && remaining == 2)) {
+        float margin = remaining == 1 ? m_pruning.futility_margin : m_pruning.razor_margin;
+        float bound = m_evaluator_ptr->evaluate() + (is_maximizing ? margin : -margin);
+        bool is_outside = is_maximizing ? bound <= alpha : bound >= beta;
+        if (remaining == 1) {
+            is_futile = is_outside;
+            futility_bound = bound;
+        } else if (is_outside) {
+            razor_plies = 1;
+        }
+    }
+
+    // depth + 1, as the root moves use the first buffer
+    auto &moves = generate_moves(depth + 1);
+    PackedMove best_move = NO_MOVE;
+    float best_eval = is_maximizing ? MIN_FLOAT : MAX_FLOAT;
+    int n_searched = 0;
+    for (PackedMove move : moves) {
+        bool is_quiet = unpack_pos(move, 10) == EMPTY;
+        if (is_futile && is_quiet) continue;
+        // Late move reductions: quiet moves ordered late are searched shallower first
+        int reduction = 0;
+        if (m_pruning.lmr && is_quiet && remaining >= m_pruning.lmr_min_depth &&
+            n_searched >= m_pruning.lmr_min_moves) {
+            reduction = std::min(m_pruning.lmr_reduction, remaining - 1);
+        }
+        n_searched++;
+        m_board_ptr->execute_packed(move);
+        float score = search_child(depth + 1 + razor_plies, alpha, beta, !is_maximizing,
+                                   best_move == NO_MOVE, reduction);
+        m_board_ptr->undo_packed(move);
+        if (m_stopped) return 0.0;
+        if (is_maximizing) {
+            if (best_move == NO_MOVE || score > best_eval) {
+                best_eval = score;
+                best_move = move;
+            }
+            if (best_eval >= beta) {
+                m_orderer.update(move, depth + 1, remaining);
+                break;
+            }
+            alpha = std::max(alpha, best_eval);
+        } else {
+            if (best_move == NO_MOVE || score < best_eval) {
+                best_eval = score;
+                best_move = move;
+            }
+            if (best_eval <= alpha) {
+                m_orderer.update(move, depth + 1, remaining);
+                break;
+            }
+            beta = std::min(beta, best_eval);
+        }
+    }
+
+    if (is_futile) {
+        // The pruned moves are assumed to be no better than the bound
+        return is_maximizing ? std::max(best_eval, futility_bound)
+                             : std::min(best_eval, futility_bound);
+    }
+    // Razored scores are from a shallower search, so they aren't stored. Path dependent scores of
+    // root split workers only keep the move, for ordering.
+    if (best_move != NO_MOVE && razor_plies == 0) {
+        Bound bound =
+            is_independent ? score_bound(best_eval, alpha_orig, beta_orig) : Bound::NONE;
+        m_tt->store(key, remaining, best_eval, bound, best_move);
+    }
+    return best_eval;
+}
+
+float Searcher::quiesce(int depth, float alpha, float beta, bool is_maximizing) {
+    // The side to move may stand pat, as it doesn't have to capture
+    float best_eval = m_evaluator_ptr->evaluate();
+    if (depth - m_max_depth >= m_quiescence_plies) return best_eval;
+    if (is_maximizing) {
+        if (best_eval >= beta) return best_eval;
+        alpha = std::max(alpha, best_eval);
+    } else {
+        if (best_eval <= alpha) return best_eval;
+        beta = std::min(beta, best_eval);
+    }
+
+    // Captures all score the same for ordering, so they are searched in generator order
+    auto &moves = m_move_stack[depth + 1];
+    m_move_finder.get_packed_moves(m_board_ptr->get_turn_index(), moves, true);
+    for (PackedMove move : moves) {
+        m_board_ptr->execute_packed(move);
+        float score = minimax(depth + 1, alpha, beta, !is_maximizing);
+        m_board_ptr->undo_packed(move);
+        if (m_stopped) return 0.0;
+        if (is_maximizing) {
+            best_eval = std::max(best_eval, score);
+            if (best_eval >= beta) break;
+            alpha = std::max(alpha, best_eval);
+        } else {
+            best_eval = std::min(best_eval, score);
+            if (best_eval <= alpha) break;
+            beta = std::min(beta, best_eval);
+        }
+    }
+    return best_eval;
+}
@@ -0,0 +1,47 @@
+#include "selfplay.hpp"
+
+#include <memory>
+
+#include "evaluator.hpp"
+#include "search.hpp"
+
+GameResult play_game(const std::vector<float> &brain_a, const std::vector<float> &brain_b,
+                     int depth_a, int depth_b, uint64_t seed, size_t tt_size_mb,
+                     const PruningParams &pruning_a, const PruningParams &pruning_b) {
+    Board board;
+    Evaluator evaluators[2] = {Evaluator(&board, 0), Evaluator(&board, 1)};
+    evaluators[0].set_brain(brain_a);
+    evaluators[1].set_brain(brain_b);
+    int depths[2] = {depth_a, depth_b};
+    const PruningParams *pruning[2] = {&pruning_a, &pruning_b};
+    std::unique_ptr<Searcher> searchers[2];
+    uint64_t rng_state = seed;
+    for (int player = 0; player < 2; player++) {
+        searchers[player] = std::make_unique<Searcher>(&board, &evaluators[player], tt_size_mb);
+        searchers[player]->set_seed(seed == 0 ? 0 : splitmix64(rng_state));
+        searchers[player]->set_pruning(*pruning[player]);
+    }
+
+    MoveFinder move_finder(&board);
+    GameResult result;
+    while (true) {
+        if (move_finder.get_phase() == -1) {
+            // Out of pieces or moves, the player to move has lost unless the other player is the
+            // one with too few pieces.
+            int player = board.get_turn_index();
+            result.winner = board.pieces_on_board(player ^ 1) < 3 ? player : player ^ 1;
+            break;
+        }
+        int player = board.get_turn_index();
+        SearchResult search = searchers[player]->search(depths[player]);
+        board.execute_packed(search.move);
+        result.moves.push_back(search.move);
+        result.plies++;
+        if (board.is_repetition(3)) {
+            result.is_draw = true;
+            break;
+        }
+    }
+    result.pieces = {board.pieces_on_board(0), board.pieces_on_board(1)};
+    return result;
+}
@@ -0,0 +1,420 @@
+#include "tablebase.hpp"
+
+#include <fcntl.h>
+#include <sys/mman.h>
+#include <sys/stat.h>
+#include <unistd.h>
+
+#include <algorithm>
+#include <cstdio>
+#include <cstring>
+#include <stdexcept>
+
+namespace {
+
+const char TB_MAGIC[8] = {'N', 'N', 'M', 'T', 'B', 0, 0, 1};
+const int MAX_DISTANCE = 254;
+
+struct TBHeader {
+    char magic[8];
+    int32_t n_own;
+    int32_t n_other;
+    uint64_t size;
+};
+
+struct Binomials {
+    uint64_t c[N_SPOTS + 1][N_SPOTS + 1] = {};
+
+    constexpr Binomials() {
+        for (int n = 0; n <= N_SPOTS; n++) {
+            c[n][0] = 1;
+            for (int k = 1; k <= n; k++) {
+                c[n][k] = c[n - 1][k - 1] + (k < n ? c[n - 1][k] : 0);
+            }
+        }
+    }
+};
+
+constexpr Binomials BINOMIALS;
+
+/* All masks of n_bits bits with k bits set, in increasing order, which is the order of tb_index */
+std::vector<Bitboard> combinations(int n_bits, int k) {
+    std::vector<Bitboard> masks;
+    masks.reserve(BINOMIALS.c[n_bits][k]);
+    Bitboard limit = 1u << n_bits;
+    for (Bitboard mask = (1u << k) - 1; mask < limit;) {
+        masks.push_back(mask);
+        // Gosper's hack, the next larger mask with as many bits set
+        Bitboard lowest = mask & -mask;
+        Bitboard ripple = mask + lowest;
+        mask = (((ripple ^ mask) >> 2) / lowest) | ripple;
+    }
+    return masks;
+}
+
+/* Spread the low bits of bits over the set bits of mask */
+Bitboard deposit(Bitboard bits, Bitboard mask) {
+    Bitboard result = 0;
+    for (; mask && bits; mask = pop_lowest(mask), bits >>= 1) {
+        if (bits & 1) result |= spot_mask(lowest_spot(mask));
+    }
+    return result;
+}
+
+void check_pieces(int n_own, int n_other) {
+    if (n_own < TB_MIN_PIECES || n_own > TB_MAX_PIECES || n_other < TB_MIN_PIECES ||
+        n_other > TB_MAX_PIECES) {
+        throw std::invalid_argument("Tablebases have 3 to 9 pieces per player");
+    }
+}
+
+/* Calls visit(new_own, new_other) for every move of the player owning own, new_other is the
+ * same as other unless the move captures. */
+template <typename Visit>
+void for_each_move(Bitboard own, Bitboard other, Visit &&visit) {
+    Bitboard empty = ~(own | other) & ALL_SPOTS_MASK;
+    bool is_flying = popcount(own) == 3;
+    Bitboard deletable = deletable_pieces(other);
+    for (Bitboard from = own; from; from = pop_lowest(from)) {
+        int from_pos = lowest_spot(from);
+        Bitboard targets = is_flying ? empty : empty & NEIGHBOUR_MASKS[from_pos];
+        for (Bitboard to = targets; to; to = pop_lowest(to)) {
+            int to_pos = lowest_spot(to);
+            Bitboard moved = own ^ spot_mask(from_pos) ^ spot_mask(to_pos);
+            if (is_mill_at(moved, to_pos)) {
+                for (Bitboard del = deletable; del; del = pop_lowest(del)) {
+                    visit(moved, other ^ spot_mask(lowest_spot(del)));
+                }
+            } else {
+                visit(moved, other);
+            }
+        }
+    }
+}
+
+/* Solving state of a partition */
+struct Solving {
+    enum Flags : uint8_t {
+        ESCAPE = 1,       // Has a move into a drawn position, so can't be lost
+        WIN_PENDING = 2,  // A winning move is known, distance holds the shortest win found
+    };
+
+    int n_own;
+    int n_other;
+    uint64_t n_others;  // Placements of the other pieces per placement of our own
+    std::vector<Bitboard> own_masks;
+    std::vector<Bitboard> other_masks;  // Compressed to the spots not taken by own
+    std::vector<uint8_t> results;
+    std::vector<uint8_t> distances;
+    std::vector<uint8_t> remaining;  // Moves without a capture whose result is still unknown
+    std::vector<uint8_t> max_win;    // Longest win of the other player found among our moves
+    std::vector<uint8_t> flags;
+
+    Solving(int n_own, int n_other) : n_own(n_own), n_other(n_other) {
+        n_others = BINOMIALS.c[N_SPOTS - n_own][n_other];
+        own_masks = combinations(N_SPOTS, n_own);
+        other_masks = combinations(N_SPOTS - n_own, n_other);
+        uint64_t size = tb_partition_size(n_own, n_other);
+        results.assign(size, (uint8_t)TBResult::DRAW);
+        distances.assign(size, 0);
+        remaining.assign(size, 0);
+        max_win.assign(size, 0);
+        flags.assign(size, 0);
+    }
+
+    void position(uint64_t index, Bitboard &own, Bitboard &other) const {
+        own = own_masks[index / n_others];
+        other = deposit(other_masks[index % n_others], ~own & ALL_SPOTS_MASK);
+    }
+};
+
+void write_partition(const Solving &part, const std::string &directory) {
+    uint64_t size = part.results.size();
+    std::vector<uint8_t> packed((size + 3) / 4, 0);
+    for (uint64_t i = 0; i < size; i++) {
+        packed[i / 4] |= part.results[i] << (2 * (i % 4));
+    }
+    TBHeader header;
+    std::memcpy(header.magic, TB_MAGIC, sizeof(TB_MAGIC));
+    header.n_own = part.n_own;
+    header.n_other = part.n_other;
+    header.size = size;
+
+    // Written under a temporary name, so a partition file is always complete
+    std::string file_name = tb_file_name(directory, part.n_own, part.n_other);
+    std::string tmp_name = file_name + ".tmp";
+    FILE *file = std::fopen(tmp_name.c_str(), "wb");
+    if (file == nullptr) throw std::runtime_error("Cannot write " + tmp_name);
+    bool ok = std::fwrite(&header, sizeof(header), 1, file) == 1 &&
+              std::fwrite(packed.data(), 1, packed.size(), file) == packed.size() &&
+              std::fwrite(part.distances.data(), 1, size, file) == size;
+    ok = std::fclose(file) == 0 && ok;
+    if (!ok || std::rename(tmp_name.c_str(), file_name.c_str()) != 0) {
+        throw std::runtime_error("Cannot write " + file_name);
+    }
+}
+
+}  // namespace
+
+uint64_t tb_partition_size(int n_own, int n_other) {
+    check_pieces(n_own, n_other);
+    return BINOMIALS.c[N_SPOTS][n_own] * BINOMIALS.c[N_SPOTS - n_own][n_other];
+}
+
+uint64_t tb_index(Bitboard own, Bitboard other) {
+    // Combinatorial number system: the k-th lowest spot p of a mask adds C(p, k)
+    uint64_t own_rank = 0;
+    int k = 1;
+    for (Bitboard bb = own; bb; bb = pop_lowest(bb), k++) {
+        own_rank += BINOMIALS.c[lowest_spot(bb)][k];
+    }
+    // The other pieces are ranked among the spots not taken by our own
+    uint64_t other_rank = 0;
+    k = 1;
+    for (Bitboard bb = other; bb; bb = pop_lowest(bb), k++) {
+        int pos = lowest_spot(bb);
+        other_rank += BINOMIALS.c[pos - popcount(own & (spot_mask(pos) - 1))][k];
+    }
+    return own_rank * BINOMIALS.c[N_SPOTS - popcount(own)][popcount(other)] + other_rank;
+}
+
+std::string tb_file_name(const std::string &directory, int n_own, int n_other) {
+    return directory + "/tb_" + std::to_string(n_own) + "_" + std::to_string(n_other) + ".nnmtb";
+}
+
+Tablebase::Tablebase(const std::string &directory) {
+    try {
+        for (int n_own = TB_MIN_PIECES; n_own <= TB_MAX_PIECES; n_own++) {
+            for (int n_other = TB_MIN_PIECES; n_other <= TB_MAX_PIECES; n_other++) {
+                map_partition(tb_file_name(directory, n_own, n_other), n_own, n_other);
+            }
+        }
+    } catch (...) {
+        unmap();
+        throw;
+    }
+}
+
+Tablebase::~Tablebase() {
+    unmap();
+}
+
+void Tablebase::map_partition(const std::string &file_name, int n_own, int n_other) {
+    int fd = open(file_name.c_str(), O_RDONLY);
+    if (fd < 0) return;
+    struct stat st;
+    void *data = MAP_FAILED;
+    if (fstat(fd, &st) == 0 && st.st_size >= (off_t)sizeof(TBHeader)) {
+        data = mmap(nullptr, st.st_size, PROT_READ, MAP_SHARED, fd, 0);
+    }
+    close(fd);
+    if (data == MAP_FAILED) throw std::runtime_error("Cannot map " + file_name);
+
+    Partition &part = m_partitions[n_own][n_other];
+    part.data = data;
+    part.n_bytes = st.st_size;
+    const TBHeader *header = static_cast<const TBHeader *>(data);
+    uint64_t size = tb_partition_size(n_own, n_other);
+    if (std::memcmp(header->magic, TB_MAGIC, sizeof(TB_MAGIC)) != 0 || header->n_own != n_own ||
+        header->n_other != n_other || header->size != size ||
+        part.n_bytes != sizeof(TBHeader) + (size + 3) / 4 + size) {
+        throw std::runtime_error("Invalid tablebase file " + file_name);
+    }
+    part.size = size;
+    part.results = static_cast<const uint8_t *>(data) + sizeof(TBHeader);
+    part.distances = part.results + (size + 3) / 4;
+}
+
+void Tablebase::unmap() {
+    for (auto &row : m_partitions) {
+        for (Partition &part : row) {
+            if (part.data != nullptr) munmap(part.data, part.n_bytes);
+            part = Partition();
+        }
+    }
+}
+
+bool Tablebase::has_partition(int n_own, int n_other) const {
+    if (n_own < TB_MIN_PIECES || n_own > TB_MAX_PIECES || n_other < TB_MIN_PIECES ||
+        n_other > TB_MAX_PIECES) {
+        return false;
+    }
+    return m_partitions[n_own][n_other].data != nullptr;
+}
+
+std::vector<std::pair<int, int>> Tablebase::partitions() const {
+    std::vector<std::pair<int, int>> found;
+    for (int n_own = TB_MIN_PIECES; n_own <= TB_MAX_PIECES; n_own++) {
+        for (int n_other = TB_MIN_PIECES; n_other <= TB_MAX_PIECES; n_other++) {
+            if (has_partition(n_own, n_other)) found.emplace_back(n_own, n_other);
+        }
+    }
+    return found;
+}
+
+bool Tablebase::probe(Bitboard own, Bitboard other, TBEntry &entry) const {
+    int n_own = popcount(own);
+    int n_other = popcount(other);
+    if (!has_partition(n_own, n_other)) return false;
+    const Partition &part = m_partitions[n_own][n_other];
+    uint64_t index = tb_index(own, other);
+    entry.result = (TBResult)((part.results[index / 4] >> (2 * (index % 4))) & 3);
+    entry.distance = part.distances[index];
+    return true;
+}
+
+bool Tablebase::probe(const Board &board, TBEntry &entry) const {
+    if (board.get_player_pieces_on_hand(0) > 0 || board.get_player_pieces_on_hand(1) > 0) {
+        return false;
+    }
+    int player = board.get_turn_index();
+    return probe(board.get_pieces(player), board.get_pieces(player ^ 1), entry);
+}
+
+bool Tablebase::score(const Board &board, int player, float &score) const {
+    TBEntry entry;
+    if (!probe(board, entry)) return false;
+    score = 0.0;
+    if (entry.result == TBResult::WIN) score = TB_WIN_SCORE - entry.distance;
+    if (entry.result == TBResult::LOSS) score = -TB_WIN_SCORE + entry.distance;
+    if (player != board.get_turn_index()) score = -score;
+    return true;
+}
+
+void solve_tablebase(int n_a, int n_b, const std::string &directory) {
+    check_pieces(n_a, n_b);
+    Tablebase lower(directory);
+    std::vector<Solving> parts;
+    parts.emplace_back(n_a, n_b);
+    if (n_a != n_b) parts.emplace_back(n_b, n_a);
+    // The partition with n_own pieces for the player to move
+    auto part_of = [&](int n_own) -> size_t { return n_own == n_a ? 0 : 1; };
+
+    // Positions whose result is known, by distance. The highest bit marks a loss, the bits above
+    // 40 the partition.
+    const uint64_t LOSS_BIT = 1ull << 63;
+    std::vector<std::vector<uint64_t>> queue;
+    auto push = [&](int distance, uint64_t part, uint64_t index, bool is_loss) {
+        if (distance > MAX_DISTANCE) throw std::runtime_error("Distance out of range");
+        if ((int)queue.size() <= distance) queue.resize(distance + 1);
+        queue[distance].push_back((is_loss ? LOSS_BIT : 0) | (part << 40) | index);
+    };
+
+    // Moves with a capture leave the partition, their results are already known
+    for (size_t p = 0; p < parts.size(); p++) {
+        Solving &part = parts[p];
+        uint64_t size = part.results.size();
+        for (uint64_t index = 0; index < size; index++) {
+            Bitboard own, other;
+            part.position(index, own, other);
+            int n_moves = 0;
+            int n_quiet = 0;
+            int best_win = -1;
+            int max_win = 0;
+            bool escape = false;
+            for_each_move(own, other, [&](Bitboard new_own, Bitboard new_other) {
+                n_moves++;
+                if (new_other == other) {
+                    n_quiet++;
+                    return;
+                }
+                TBEntry entry;
+                if (popcount(new_other) < TB_MIN_PIECES) {
+                    entry.result = TBResult::LOSS;
+                } else if (!lower.probe(new_other, new_own, entry)) {
+                    throw std::runtime_error("Missing tablebase partition " +
+                                             tb_file_name(directory, popcount(new_other),
+                                                          popcount(new_own)));
+                }
+                if (entry.result == TBResult::LOSS) {
+                    if (best_win < 0 || entry.distance + 1 < best_win) best_win = entry.distance + 1;
+                } else if (entry.result == TBResult::WIN) {
+                    max_win = std::max(max_win, entry.distance);
+                } else {
+                    escape = true;
+                }
+            });
+            part.remaining[index] = n_quiet;
+            part.max_win[index] = max_win;
+            part.flags[index] = escape ? Solving::ESCAPE : 0;
+            if (n_moves == 0) {
+                // Blocked
+                push(0, p, index, true);
+            } else if (best_win >= 0) {
+                part.flags[index] |= Solving::WIN_PENDING;
+                part.distances[index] = best_win;
+                push(best_win, p, index, false);
+            } else if (n_quiet == 0 && !escape) {
+                push(max_win + 1, p, index, true);
+            }
+        }
+    }
+
+    // Retrograde analysis, positions are resolved in order of distance, so the first result found
+    // for a position is the shortest win or the longest loss.
+    std::vector<uint8_t> resolved[2];
+    for (size_t p = 0; p < parts.size(); p++) {
+        resolved[p].assign(parts[p].results.size(), 0);
+    }
+    for (int distance = 0; distance < (int)queue.size(); distance++) {
+        for (size_t i = 0; i < queue[distance].size(); i++) {
+            uint64_t item = queue[distance][i];
+            bool is_loss = item & LOSS_BIT;
+            size_t p = (item >> 40) & 1;
+            uint64_t index = item & ((1ull << 40) - 1);
+            if (resolved[p][index]) continue;
+            resolved[p][index] = 1;
+            Solving &part = parts[p];
+            part.results[index] = (uint8_t)(is_loss ? TBResult::LOSS : TBResult::WIN);
+            part.distances[index] = distance;
+
+            // Undo the moves without a capture of the player who moved last
+            Bitboard own, other;
+            part.position(index, own, other);
+            size_t q = part_of(part.n_other);
+            Solving &previous = parts[q];
+            Bitboard empty = ~(own | other) & ALL_SPOTS_MASK;
+            bool is_flying = popcount(other) == 3;
+            for (Bitboard to = other; to; to = pop_lowest(to)) {
+                int to_pos = lowest_spot(to);
+                // A move closing a mill always captures
+                if (is_mill_at(other, to_pos)) continue;
+                Bitboard sources = is_flying ? empty : empty & NEIGHBOUR_MASKS[to_pos];
+                for (Bitboard from = sources; from; from = pop_lowest(from)) {
+                    Bitboard prev_own = other ^ spot_mask(to_pos) ^ spot_mask(lowest_spot(from));
+                    uint64_t prev = tb_index(prev_own, own);
+                    if (resolved[q][prev]) continue;
+                    uint8_t &flags = previous.flags[prev];
+                    if (is_loss) {
+                        // Moving here wins
+                        if (!(flags & Solving::WIN_PENDING) ||
+                            distance + 1 < previous.distances[prev]) {
+                            flags |= Solving::WIN_PENDING;
+                            previous.distances[prev] = distance + 1;
+                            push(distance + 1, q, prev, false);
+                        }
+                    } else {
+                        previous.max_win[prev] = std::max<int>(previous.max_win[prev], distance);
+                        if (--previous.remaining[prev] == 0 &&
+                            !(flags & (Solving::ESCAPE | Solving::WIN_PENDING))) {
+                            push(previous.max_win[prev] + 1, q, prev, true);
+                        }
+                    }
+                }
+            }
+        }
+        std::vector<uint64_t>().swap(queue[distance]);
+    }
+
+    // Everything left is a draw
+    for (size_t p = 0; p < parts.size(); p++) {
+        Solving &part = parts[p];
+        for (uint64_t index = 0; index < part.results.size(); index++) {
+            if (!resolved[p][index]) {
+                part.results[index] = (uint8_t)TBResult::DRAW;
+                part.distances[index] = 0;
+            }
+        }
+        write_partition(part, directory);
+    }
+}
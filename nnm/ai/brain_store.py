@@ -0,0 +1,190 @@
+from dataclasses import dataclass
+from pathlib import Path
+import json
+import os
+
+import numpy as np
+
+# Fixed size records, appended next to the weights of every brain
+RECORD_DTYPE = np.dtype(
+    [("score", "<f8"), ("result", "i1"), ("turns", "<i4"), ("generation", "<i4")]
+)
+RESULTS = {"loss": -1, "draw": 0, "win": 1}
+RESULT_NAMES = {value: name for name, value in RESULTS.items()}
+
+
+@dataclass(slots=True)
+class BrainRecord:
+    id: int
+    score: float
+    result: str
+    turns: int
+    generation: int
+
+
+class BrainStore:
+    """Append-only store of brains and their results, in a directory.
+
+    weights.f32 holds the float32 weights of every brain back to back and records.bin the fixed
+    size records, both only ever appended to. index.bin holds the record ids sorted by score, best
+    first, and is rewritten by checkpoint(); records appended since are merged in when the store is
+    opened. Nothing is parsed on startup, the files are memory mapped.
+    """
+
+    def __init__(self, path: str | Path, brain_size: int | None = None) -> None:
+        self.path = Path(path)
+        self.path.mkdir(parents=True, exist_ok=True)
+        meta_file = self.path / "meta.json"
+        if meta_file.is_file():
+            with meta_file.open() as fd:
+                stored_size = json.load(fd)["brain_size"]
+            if brain_size is not None and brain_size != stored_size:
+                raise ValueError(f"Store has brains of size {stored_size}, not {brain_size}")
+            brain_size = stored_size
+        elif brain_size is not None:
+            _write_atomic(meta_file, json.dumps({"brain_size": brain_size}).encode())
+        self.brain_size = brain_size
+        self._weights_file = self.path / "weights.f32"
+        self._records_file = self.path / "records.bin"
+        self._index_file = self.path / "index.bin"
+        self._weights_file.touch()
+        self._records_file.touch()
+        # Drop a record cut short by a crash, the next one is appended after the last whole one
+        n_bytes = self._records_file.stat().st_size
+        if n_bytes % RECORD_DTYPE.itemsize:
+            os.truncate(self._records_file, n_bytes - n_bytes % RECORD_DTYPE.itemsize)
+
+        records = self.load_records()
+        self._n_records = len(records)
+        index = np.fromfile(self._index_file, dtype="<i8") if self._index_file.is_file() else []
+        self._index = np.asarray(index, dtype=np.int64)
+        if len(self._index) > self._n_records:
+            # Ids of records lost since the checkpoint, sorted again from scratch
+            self._index = self._index[:0]
+        self._n_indexed = len(self._index)
+        if self._n_indexed != self._n_records:
+            # Killed between appending and checkpointing, the index on disk is rewritten once
+            self.checkpoint()
+        self._best = int(self._index[0]) if self._n_records else None
+        self._best_score = float(records["score"][self._best]) if self._n_records else None
+
+    def __len__(self) -> int:
+        return self._n_records
+
+    def append(
+        self,
+        brain,
+        score: float,
+        result: str = "draw",
+        turns: int = 0,
+        generation: int = 0,
+    ) -> int:
+        """Store a brain, returns its id."""
+        weights = np.asarray(brain, dtype="<f4").ravel()
+        if self.brain_size is None:
+            self.brain_size = len(weights)
+            meta = json.dumps({"brain_size": self.brain_size}).encode()
+            _write_atomic(self.path / "meta.json", meta)
+        if len(weights) != self.brain_size:
+            raise ValueError(f"Expected a brain of size {self.brain_size}, got {len(weights)}")
+        record = np.array([(score, RESULTS[result], turns, generation)], dtype=RECORD_DTYPE)
+        # The record is written last, a brain only exists once its record does
+        with self._weights_file.open("r+b") as fd:
+            fd.seek(self._n_records * self.brain_size * 4)
+            fd.write(weights.tobytes())
+        with self._records_file.open("ab") as fd:
+            fd.write(record.tobytes())
+
+        brain_id = self._n_records
+        self._n_records += 1
+        if self._best is None or score > self._best_score:
+            self._best = brain_id
+            self._best_score = float(score)
+        return brain_id
+
+    def extend(self, brains, scores, results=None, turns=None, generations=None) -> None:
+        """Append many brains at once."""
+        for i, brain in enumerate(brains):
+            self.append(
+                brain,
+                scores[i],
+                "draw" if results is None else results[i],
+                0 if turns is None else turns[i],
+                0 if generations is None else generations[i],
+            )
+
+    def checkpoint(self) -> None:
+        """Merge the brains appended since the last checkpoint into the index on disk."""
+        if self._n_indexed == self._n_records and self._index_file.is_file():
+            return
+        scores = self.load_records()["score"]
+        new_ids = np.arange(self._n_indexed, self._n_records)
+        new_ids = new_ids[_sorted_ids(scores[new_ids])]
+        # Both are sorted, so a merge by position keeps the index sorted
+        positions = np.searchsorted(-scores[self._index], -scores[new_ids], side="right")
+        self._index = np.insert(self._index, positions, new_ids)
+        _write_atomic(self._index_file, self._index.astype("<i8").tobytes())
+        self._n_indexed = self._n_records
+
+    def best(self) -> tuple[np.ndarray, BrainRecord] | None:
+        """The brain with the highest score, and its record."""
+        if self._best is None:
+            return None
+        return self.get_brain(self._best), self.get_record(self._best)
+
+    def top(self, n: int) -> list[int]:
+        """Ids of the n best brains."""
+        self.checkpoint()
+        return self._index[:n].tolist()
+
+    def get_brain(self, brain_id: int) -> np.ndarray:
+        return self.load_weights()[brain_id].copy()
+
+    def get_record(self, brain_id: int) -> BrainRecord:
+        score, result, turns, generation = self.load_records()[brain_id]
+        return BrainRecord(
+            brain_id, float(score), RESULT_NAMES[int(result)], int(turns), int(generation)
+        )
+
+    def load_weights(self) -> np.ndarray:
+        """Memory mapped (n_brains, brain_size) matrix of all weights."""
+        if self._n_records == 0:
+            return np.empty((0, self.brain_size or 0), dtype=np.float32)
+        return np.memmap(
+            self._weights_file, dtype="<f4", mode="r", shape=(self._n_records, self.brain_size)
+        )
+
+    def load_records(self) -> np.ndarray:
+        """Memory mapped records of all brains, see RECORD_DTYPE."""
+        n_records = self._records_file.stat().st_size // RECORD_DTYPE.itemsize
+        if n_records == 0:
+            return np.empty(0, dtype=RECORD_DTYPE)
+        return np.memmap(self._records_file, dtype=RECORD_DTYPE, mode="r", shape=(n_records,))
+
+    def import_json(self, fname: str | Path = "brain.json") -> int:
+        """Append the brains of a brain.json file as written by ai_play, returns the number of
+        brains imported."""
+        with open(fname) as fd:
+            brains = json.load(fd)
+        n_brains = len(brains["brains"])
+        self.extend(
+            brains["brains"],
+            brains["score"],
+            brains["result"],
+            brains["turns"],
+            brains.get("generation", [0] * n_brains),
+        )
+        self.checkpoint()
+        return n_brains
+
+
+def _sorted_ids(scores: np.ndarray) -> np.ndarray:
+    # Best first, the oldest brain first among equal scores
+    return np.argsort(-np.asarray(scores), kind="stable").astype(np.int64)
+
+
+def _write_atomic(path: Path, data: bytes) -> None:
+    tmp = path.with_suffix(path.suffix + ".tmp")
+    with tmp.open("wb") as fd:
+        fd.write(data)
+    os.replace(tmp, path)
@@ -1,11 +1,12 @@
 from nnm.board import Board, Player
 from nnm.consts import ALL_CONNECTED_LINES, DOTS_PARSED
 from nnm.rules.rules import Rules, Phase
+from nnm.ai.brain_store import BrainStore
 from nnm_board import Evaluator as CppEvaluator
 import random
 import json
+import numpy as np
 from pathlib import Path
-import functools
 
 
 class Evaluator:
@@ -37,12 +38,34 @@ class Evaluator:
     def set_brain(self, val: list[float]) -> None:
         self._eva.set_brain(val)
 
-    @functools.lru_cache(maxsize=2*2048)
     def evaluate(self) -> float:
+        # Cached in C++, keyed on the pieces on the board
         return self._eva.evaluate()
 
+    def evaluate_batch(
+        self, owners: np.ndarray, hands: np.ndarray, turns: np.ndarray, threads: int = 1
+    ) -> np.ndarray:
+        """Score many positions at once, from the point of view of "me".
+
+        owners is an (N, 24) array with the owner of every spot (-1 for empty), hands an (N, 2)
+        array with the pieces on hand and turns the player to move. threads=0 uses all cores.
+        """
+        return self._eva.evaluate_batch(owners, hands, turns, threads)
+
+    def cache_info(self) -> tuple[int, int]:
+        """Hits and misses of the evaluation cache."""
+        return self._eva.cache_hits, self._eva.cache_misses
+
     def load_brain(self, fname="brain.json") -> None:
+        """Load a brain from a brain.json file, or the best brain of a BrainStore directory."""
         p = Path(fname)
+        if p.is_dir():
+            best = BrainStore(p).best()
+            if best is None:
+                print("Using default brain")
+            else:
+                self.set_brain(best[0])
+            return
         if not p.is_file():
             print("Using default brain")
             # self.randomize_brain()
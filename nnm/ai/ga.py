@@ -1,39 +1,97 @@
-import random
 import numpy as np
 
+CROSSOVERS = ("uniform", "blend", "sbx")
+SELECTIONS = ("tournament", "rank")
+
+
 class GA:
-    def __init__(self, n_pops=10) -> None:
+    def __init__(
+        self,
+        n_pops=10,
+        seed: int | None = None,
+        crossover: str = "blend",
+        selection: str = "tournament",
+        n_elite: int = 1,
+        tournament_size: int = 3,
+        blend_alpha: float = 0.5,
+        sbx_eta: float = 2.0,
+    ) -> None:
+        """The population is an (n_pops, brain_size) float32 array, all randomness comes from one
+        numpy Generator, so a run with a seed can be reproduced exactly."""
+        if crossover not in CROSSOVERS:
+            raise ValueError(f"Unknown crossover {crossover!r}, expected one of {CROSSOVERS}")
+        if selection not in SELECTIONS:
+            raise ValueError(f"Unknown selection {selection!r}, expected one of {SELECTIONS}")
         self.n_pops = n_pops
+        self.rng = np.random.default_rng(seed)
+        self.crossover = crossover
+        self.selection = selection
+        self.n_elite = n_elite
+        self.tournament_size = tournament_size
+        self.blend_alpha = blend_alpha
+        self.sbx_eta = sbx_eta
         self.generation = -1
-        self.gen_pop = None
+        self.gen_pop: np.ndarray | None = None
         self.scores = []
 
-    def generate_pops(self, arr: list[float]):
+    def generate_pops(self, arr) -> np.ndarray:
+        """The next generation. Without scores of the current generation, arr and mutations of it,
+        otherwise the elite, and children of selected parents."""
         self.generation += 1
-        pops = [arr.copy()]
-        if self.scores:
-            pops.append(self.make_child())
-        for _ in range(self.n_pops - len(pops)):
-            new = self.mutate(arr)
-            pops.append(new)
+        arr = np.asarray(arr, dtype=np.float32)
+        if self.gen_pop is None or len(self.scores) != len(self.gen_pop):
+            pops = np.repeat(arr[None, :], self.n_pops, axis=0)
+            pops[1:] = self.mutate(pops[1:])
+        else:
+            pops = self.evolve(self.gen_pop, np.asarray(self.scores, dtype=np.float64))
         self.gen_pop = pops
         return pops
-    
-    def make_child(self) -> list[float]:
-        # combine two best
-        idx = np.argsort(self.scores)
-        child = (np.array(self.gen_pop[idx[-1]]) + np.array(self.gen_pop[idx[-2]])) / 2
-        child = list(child)
-        return child
-
-
-    def mutate(self, arr: list[float]) -> list[float]:
-        cpy = arr.copy()
-        n_mutations = random.randint(1, len(arr))
-        indx = random.sample(range(len(arr)), n_mutations)
-        for i in indx:
-            if random.random() < 0.2:
-                cpy[i] = random.uniform(-10, 10)
-            else:
-                cpy[i] += random.uniform(-1, 1)
-        return cpy
\ No newline at end of file
+
+    def evolve(self, pops: np.ndarray, scores: np.ndarray) -> np.ndarray:
+        n_elite = min(self.n_elite, self.n_pops)
+        elite = pops[np.argsort(scores)[::-1][:n_elite]]
+        n_children = self.n_pops - n_elite
+        parents = self.select(scores, 2 * n_children)
+        children = self.cross(pops[parents[:n_children]], pops[parents[n_children:]])
+        return np.concatenate([elite, self.mutate(children)]).astype(np.float32)
+
+    def select(self, scores: np.ndarray, n: int) -> np.ndarray:
+        """Indices of n parents."""
+        if self.selection == "tournament":
+            entrants = self.rng.integers(0, len(scores), size=(n, self.tournament_size))
+            winners = np.argmax(scores[entrants], axis=1)
+            return entrants[np.arange(n), winners]
+        # Rank selection, the chance of being picked grows linearly with the rank
+        ranks = np.argsort(np.argsort(scores)) + 1
+        return self.rng.choice(len(scores), size=n, p=ranks / ranks.sum())
+
+    def cross(self, a: np.ndarray, b: np.ndarray) -> np.ndarray:
+        """One child of every row pair of a and b."""
+        if self.crossover == "uniform":
+            return np.where(self.rng.random(a.shape) < 0.5, a, b)
+        if self.crossover == "blend":
+            # BLX-alpha, uniform in the range of the parents widened by alpha on both sides
+            low, high = np.minimum(a, b), np.maximum(a, b)
+            spread = self.blend_alpha * (high - low)
+            return self.rng.uniform(low - spread, high + spread)
+        # Simulated binary crossover
+        u = self.rng.random(a.shape)
+        exponent = 1 / (self.sbx_eta + 1)
+        beta = np.where(u <= 0.5, (2 * u) ** exponent, (1 / (2 * (1 - u))) ** exponent)
+        return 0.5 * ((1 + beta) * a + (1 - beta) * b)
+
+    def mutate(self, arr) -> np.ndarray:
+        """Mutate 1 to all genes of every brain, a mutated gene is reset with a probability of 0.2
+        and nudged by up to 1 otherwise."""
+        cpy = np.array(arr, dtype=np.float32)
+        pops = cpy.reshape(-1, cpy.shape[-1])
+        n_pops, size = pops.shape
+        # A random subset of n_mutations genes per brain: the genes with the lowest random keys
+        n_mutations = self.rng.integers(1, size + 1, size=(n_pops, 1))
+        ranks = np.argsort(np.argsort(self.rng.random((n_pops, size)), axis=1), axis=1)
+        mutated = ranks < n_mutations
+        reset = self.rng.random((n_pops, size)) < 0.2
+        new_values = self.rng.uniform(-10, 10, size=(n_pops, size))
+        nudges = self.rng.uniform(-1, 1, size=(n_pops, size))
+        pops[:] = np.where(mutated & reset, new_values, np.where(mutated, pops + nudges, pops))
+        return cpy
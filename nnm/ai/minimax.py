@@ -1,26 +1,147 @@
+from pathlib import Path
 from typing import Sequence
+import math
+import time
 
-from nnm.rules.rules import CandidateMove, CandidatePlacement, Rules, Phase
+import numpy as np
+from nnm_board import (
+    DEFAULT_ASPIRATION_WINDOW,
+    DEFAULT_QUIESCENCE_PLIES,
+    NO_MOVE,
+    Bound,
+    MoveOrderer,
+    ParallelMode,
+    PruningParams,
+    Searcher,
+    Tablebase,
+    TranspositionTable,
+    unpack_move,
+)
+
+from nnm.rules.rules import EMPTY, CandidateMove, CandidatePlacement, Rules, Phase
 from nnm.board import Player, Board
 from nnm.ai.evaluator import Evaluator
+from nnm.ai.opening_book import OpeningBook
 
 MIN_FLOAT = float("-inf")
 MAX_FLOAT = float("inf")
 
 
+def _score_bound(score: float, alpha: float, beta: float) -> Bound:
+    """Bound of a fail-soft score searched with the window alpha, beta."""
+    if score <= alpha:
+        return Bound.UPPER
+    if score >= beta:
+        return Bound.LOWER
+    return Bound.EXACT
+
+
+class _SearchTimeout(Exception):
+    """Raised inside minimax() when the time limit of the search is reached."""
+
+
 class MinimaxAI:
-    def __init__(self, me: Player, rules: Rules, max_depth: int = 3) -> None:
+    def __init__(
+        self,
+        me: Player,
+        rules: Rules,
+        max_depth: int = 3,
+        tt_size_mb: int = 16,
+        native: bool = True,
+        time_limit_ms: int | None = None,
+        workers: int = 1,
+        parallel: str = "root",
+        tablebase: str | Path | Tablebase | None = None,
+        book: str | Path | OpeningBook | None = None,
+        quiescence_plies: int = DEFAULT_QUIESCENCE_PLIES,
+        pvs: bool = True,
+        aspiration_window: float = DEFAULT_ASPIRATION_WINDOW,
+        pruning: PruningParams | None = None,
+    ) -> None:
+        """With native=True the search runs in the nnm_board extension, otherwise in minimax().
+        tt_size_mb=0 disables the transposition table of either search.
+
+        With time_limit_ms, the search deepens iteratively from depth 1 and returns the best move
+        of the last iteration completed within the time limit, max_depth is then the deepest
+        iteration.
+
+        workers > 1 runs the native search on that many threads. With parallel="root" the root
+        moves are split between the threads, with parallel="lazy_smp" every thread searches the
+        whole tree at slightly different depths, sharing one lock-free transposition table.
+        The root split search doesn't depend on the number of threads or their timing, unless
+        pruning is enabled, but its move can differ from that of a single thread, usually with
+        the same value, see nnm_board.Searcher.search.
+
+        tablebase is a directory generated by nnm.ai.tablebase, or a loaded Tablebase. Positions
+        without pieces on hand which are in it are scored by it instead of searched.
+
+        book is an opening book built by nnm.ai.opening_book, positions in it are answered
+        without a search.
+
+        Leaves at max_depth are extended by up to quiescence_plies plies of captures, so a mill
+        closed just past the horizon isn't missed. 0 evaluates the leaves directly.
+
+        With pvs, every move but the first is searched with a null window first. With a time
+        limit, each iteration searches a window of aspiration_window around the score of the
+        previous one first, 0 turns that off.
+
+        pruning enables late move reductions, futility pruning and razoring, with their
+        thresholds, see nnm.ai.pruning to measure what they cost. All are off by default.
+        """
+        if workers > 1 and not native:
+            raise ValueError("Only the native search supports workers")
+        modes = {"root": ParallelMode.ROOT_SPLIT, "lazy_smp": ParallelMode.LAZY_SMP}
+        if parallel not in modes:
+            raise ValueError(f"Unknown parallel mode {parallel!r}, expected one of {list(modes)}")
         self.rules = rules
         self.max_depth = max_depth
         self.me = me
-        self._cache = dict()
+        self.native = native
+        self.time_limit_ms = time_limit_ms
+        self.workers = workers
+        self.parallel_mode = modes[parallel]
+        self.quiescence_plies = max(quiescence_plies, 0)
+        self.pvs = pvs
+        self.aspiration_window = max(aspiration_window, 0.0)
+        self.pruning = pruning if pruning is not None else PruningParams()
+        self.last_result = None
+        self.nodes = 0  # Searched by the last get_best_move
+        self._depth_limit = max_depth
+        self._deadline = None
         self.evaluator = Evaluator(self.board, me, rules)
+        if tablebase is not None and not isinstance(tablebase, Tablebase):
+            tablebase = Tablebase(str(tablebase))
+        self.tablebase = tablebase
+        if book is not None and not isinstance(book, OpeningBook):
+            book = OpeningBook(book)
+        self.book = book
+        # Scores are always from the point of view of "me", so the table is private to this AI.
+        self._tt = None
+        self._searcher = None
+        self._orderer = None
+        if native:
+            self._searcher = Searcher(self.board._board, self.evaluator._eva, max(tt_size_mb, 0))
+            self._searcher.set_quiescence_plies(self.quiescence_plies)
+            self._searcher.set_pvs(pvs)
+            self._searcher.set_aspiration_window(self.aspiration_window)
+            self._searcher.pruning = self.pruning
+            if tablebase is not None:
+                self._searcher.set_tablebase(tablebase)
+        else:
+            self._orderer = MoveOrderer(self.board._board)
+            if tt_size_mb > 0:
+                self._tt = TranspositionTable(tt_size_mb)
 
     def __hash__(self):
         return self.board.get_board_hash()
 
     def reset(self) -> None:
-        self._cache.clear()
+        if self._tt is not None:
+            self._tt.clear()
+        if self._searcher is not None:
+            self._searcher.reset()
+        if self._orderer is not None:
+            self._orderer.clear()
         self.evaluator.reset()
 
     @property
@@ -28,64 +149,306 @@ class MinimaxAI:
         return self.rules.board
 
     def get_best_move(self):
+        if self.book is not None:
+            book_move = self.book.probe(self.board._board)
+            if book_move is not None:
+                self.last_result = None
+                self.nodes = 0
+                return unpack_move(book_move)
+
+        if self._searcher is not None:
+            self.last_result = self._searcher.search(
+                self.max_depth, self.time_limit_ms or 0, self.workers, self.parallel_mode
+            )
+            self.nodes = self.last_result.nodes
+            return self.last_result.move
+
+        self.nodes = 0
+        if self._tt is not None:
+            self._tt.new_search()
+        self._orderer.age()
+        hits, misses = self.evaluator.cache_info()
+        if self.time_limit_ms is None:
+            best_move, _ = self._search_root(self.max_depth)
+        else:
+            best_move, best_score = None, MIN_FLOAT
+            deadline = time.perf_counter() + self.time_limit_ms / 1000
+            for depth in range(1, self.max_depth + 1):
+                # The first iteration always completes, so we have a move to return
+                self._deadline = deadline if depth > 1 else None
+                try:
+                    best_move, best_score = self._search_aspiration(depth, best_move, best_score)
+                except _SearchTimeout:
+                    break
+                if time.perf_counter() >= deadline:
+                    break
+            self._deadline = None
+
+        hits = self.evaluator.cache_info()[0] - hits
+        misses = self.evaluator.cache_info()[1] - misses
+        ratio = hits / max(hits + misses, 1)
+        print(f"cache ratio: {ratio*100:.2f}", )
+        return best_move
+
+    def _search_aspiration(self, depth: int, first_move, previous_score: float):
+        """Search a window around the score of the previous iteration, opened up on the side the
+        score falls outside of."""
+        alpha, beta = MIN_FLOAT, MAX_FLOAT
+        if self.aspiration_window > 0 and first_move is not None and math.isfinite(previous_score):
+            # In single precision, as in the native search
+            score, window = np.float32(previous_score), np.float32(self.aspiration_window)
+            alpha, beta = float(score - window), float(score + window)
+        while True:
+            best_move, best_score = self._search_root(depth, first_move, alpha, beta)
+            if alpha > MIN_FLOAT and best_score <= alpha:
+                alpha = MIN_FLOAT
+            elif beta < MAX_FLOAT and best_score >= beta:
+                beta = MAX_FLOAT
+            else:
+                return best_move, best_score
+
+    def _search_root(self, depth: int, first_move=None, alpha=MIN_FLOAT, beta=MAX_FLOAT):
+        """The best move and its score. The score is fail-soft: <= alpha is an upper bound and
+        >= beta a lower bound."""
+        self._depth_limit = depth
         best_score = MIN_FLOAT
         best_move = None
         moves = self.rules.get_current_player_moves()
+        generated = {move.packed: i for i, move in enumerate(moves)}
+        # The best move of the previous iteration goes first
+        moves = self._order_moves(moves, 0, first_move)
         for move in moves:
+            # Ties go to the move generated first, so the result doesn't depend on the ordering.
+            # A move equal to the best so far fails low, unless it was generated before it.
+            wins_ties = (
+                best_move is not None and generated[move.packed] < generated[best_move.packed]
+            )
+            if best_score >= beta:
+                # A win is searched on for wins generated before it, anything else fails high
+                if beta < MAX_FLOAT:
+                    break
+                if not wins_ties:
+                    continue
+            tie_alpha = math.nextafter(best_score, MIN_FLOAT) if wins_ties else best_score
+            child_alpha = max(alpha, tie_alpha)
             self.rules.execute_move(move)
-            score = self.minimax(0, MIN_FLOAT, MAX_FLOAT, False)
-            self.rules.undo_move(move)
-            if best_move is None or score > best_score:
+            try:
+                score = self._search_child(0, child_alpha, beta, False, best_move is None)
+            finally:
+                self.rules.undo_move(move)
+            if best_move is None or score > best_score or (score == best_score and wins_ties):
                 best_score = score
                 best_move = move
-        c = self.evaluator.evaluate.cache_info()
-        ratio = c.hits / (c.hits + c.misses)
-        print(f"cache ratio: {ratio*100:.2f}", )
-        self.evaluator.evaluate.cache_clear()
-        return best_move
+        if self._tt is not None and best_move is not None:
+            bound = _score_bound(best_score, alpha, beta)
+            self._tt.store(self.board.key, depth + 1, best_score, bound, best_move.packed)
+        return best_move, best_score
 
     def get_hand_pieces(self):
         return self.board.get_piece_counts()
 
+    def _order_moves(self, moves, ply: int, first_move=None):
+        """Order the moves with the best move from an earlier visit of the position first."""
+        tt_move = NO_MOVE
+        if first_move is not None:
+            tt_move = first_move.packed
+        elif self._tt is not None:
+            entry = self._tt.probe(self.board.key)
+            if entry is not None:
+                tt_move = entry.move
+        return self._orderer.order(moves, ply, tt_move)
+
+    def _quiesce(self, depth: int, alpha: float, beta: float, is_maximizing: bool) -> float:
+        """The static evaluation, unless a capture of the side to move improves on it."""
+        # The side to move may stand pat, as it doesn't have to capture
+        best_eval = self.evaluator.evaluate()
+        if depth - self._depth_limit >= self.quiescence_plies:
+            return best_eval
+        if is_maximizing:
+            if best_eval >= beta:
+                return best_eval
+            alpha = max(alpha, best_eval)
+        else:
+            if best_eval <= alpha:
+                return best_eval
+            beta = min(beta, best_eval)
+
+        captures = [m for m in self.rules.get_current_player_moves() if m.delete_pos != EMPTY]
+        for move in captures:
+            self.rules.execute_move(move)
+            try:
+                score = self.minimax(depth + 1, alpha, beta, not is_maximizing)
+            finally:
+                self.rules.undo_move(move)
+            if is_maximizing:
+                best_eval = max(best_eval, score)
+                if best_eval >= beta:
+                    break
+                alpha = max(alpha, best_eval)
+            else:
+                best_eval = min(best_eval, score)
+                if best_eval <= alpha:
+                    break
+                beta = min(beta, best_eval)
+        return best_eval
+
+    def _reduction(self, move, remaining: int, n_searched: int) -> int:
+        """Late move reduction of a move, quiet moves ordered late are searched shallower first."""
+        pruning = self.pruning
+        if (
+            pruning.lmr
+            and move.delete_pos == EMPTY
+            and remaining >= pruning.lmr_min_depth
+            and n_searched >= pruning.lmr_min_moves
+        ):
+            return min(pruning.lmr_reduction, remaining - 1)
+        return 0
+
+    def _search_child(
+        self,
+        depth: int,
+        alpha: float,
+        beta: float,
+        is_maximizing: bool,
+        is_first: bool,
+        reduction: int = 0,
+    ) -> float:
+        """Search a child of the current node, with a null window first unless it's the first.
+        With a reduction, a shallower null window search goes first."""
+        if reduction > 0:
+            # Only a move improving on the parent is searched in full
+            if is_maximizing:
+                alpha_null = math.nextafter(beta, MIN_FLOAT)
+                score = self.minimax(depth + reduction, alpha_null, beta, True)
+                if score >= beta:
+                    return score
+            else:
+                beta_null = math.nextafter(alpha, MAX_FLOAT)
+                score = self.minimax(depth + reduction, alpha, beta_null, False)
+                if score <= alpha:
+                    return score
+        if not self.pvs or is_first:
+            return self.minimax(depth, alpha, beta, is_maximizing)
+        # Only whether the move improves on the bound of the parent, which is the other player
+        if is_maximizing:
+            score = self.minimax(depth, math.nextafter(beta, MIN_FLOAT), beta, True)
+            if alpha < score < beta:
+                score = self.minimax(depth, alpha, beta, True)
+        else:
+            score = self.minimax(depth, alpha, math.nextafter(alpha, MAX_FLOAT), False)
+            if alpha < score < beta:
+                score = self.minimax(depth, alpha, beta, False)
+        return score
+
     def minimax(self, depth: int, alpha: float, beta: float, is_maximizing: bool):
+        self.nodes += 1
         retval = None
         phase = self.rules.get_phase()
         if phase is Phase.DRAW:
             retval = 0.0
         elif phase is Phase.DONE:
-            if self.board.get_player_pieces_on_board(self.me) > 2:
-                # Win
-                retval = MAX_FLOAT
-            else:
-                # Loss
-                retval = MIN_FLOAT
-        elif depth == self.max_depth:
-            retval = self.evaluator.evaluate()
+            # The player to move is out of pieces or blocked and has lost, unless the other
+            # player is the one with too few pieces
+            winner = self.board.other_player
+            if self.board.get_player_pieces_on_board(winner) < 3:
+                winner = self.board.current_player
+            retval = MAX_FLOAT if winner.number == self.me.number else MIN_FLOAT
+        elif self.board.is_repetition(2):
+            # Seen before in the game or the search, whoever gains from it can repeat it again
+            retval = 0.0
+        elif self.tablebase is not None:
+            retval = self.tablebase.score(self.board._board, self.me.number)
+
+        if retval is None and depth >= self._depth_limit:
+            retval = self._quiesce(depth, alpha, beta, is_maximizing)
 
         if retval is not None:
-            # We cache any static evaluations, but not results of a branch
+            # Static evaluations are cached by the evaluator
             return retval
 
+        if self._deadline is not None and time.perf_counter() >= self._deadline:
+            raise _SearchTimeout()
+
+        remaining = self._depth_limit - depth
+        if self._tt is not None:
+            entry = self._tt.probe(self.board.key)
+            # Entries of deeper searches are at least as good
+            if entry is not None and entry.depth >= remaining:
+                # Compared by value, pybind11 enums read from an entry are new objects
+                if entry.bound == Bound.EXACT:
+                    return entry.score
+                if entry.bound == Bound.LOWER and entry.score >= beta:
+                    return entry.score
+                if entry.bound == Bound.UPPER and entry.score <= alpha:
+                    return entry.score
+        alpha_orig, beta_orig = alpha, beta
+
+        # Selective pruning near the horizon, when the static evaluation is far outside the
+        # window. Futility: one ply from the horizon, only captures can make up for the margin.
+        # Razoring: two plies from the horizon, the moves are searched one ply shallower.
+        pruning = self.pruning
+        is_futile, futility_bound, razor_plies = False, 0.0, 0
+        if (pruning.futility and remaining == 1) or (pruning.razoring and remaining == 2):
+            margin = pruning.futility_margin if remaining == 1 else pruning.razor_margin
+            # In single precision, as in the native search
+            margin = np.float32(margin if is_maximizing else -margin)
+            bound = float(np.float32(self.evaluator.evaluate()) + margin)
+            is_outside = bound <= alpha if is_maximizing else bound >= beta
+            if remaining == 1:
+                is_futile, futility_bound = is_outside, bound
+            elif is_outside:
+                razor_plies = 1
+
         # Figure out the optimization rules
-        moves = self.rules.get_current_player_moves()
+        moves = self._order_moves(self.rules.get_current_player_moves(), depth + 1)
+        if is_futile:
+            moves = [move for move in moves if move.delete_pos != EMPTY]
+        child_depth = depth + 1 + razor_plies
+        best_move = None
         if is_maximizing:
             best_eval = MIN_FLOAT
-            for move in moves:
+            for i, move in enumerate(moves):
+                reduction = self._reduction(move, remaining, i)
                 self.rules.execute_move(move)
-                score = self.minimax(depth + 1, alpha, beta, False)
-                self.rules.undo_move(move)
-                best_eval = max(score, best_eval)
-                if best_eval > beta:
+                try:
+                    score = self._search_child(
+                        child_depth, alpha, beta, False, best_move is None, reduction
+                    )
+                finally:
+                    self.rules.undo_move(move)
+                if best_move is None or score > best_eval:
+                    best_eval = score
+                    best_move = move
+                if best_eval >= beta:
+                    self._orderer.update(move.packed, depth + 1, remaining)
                     break
                 alpha = max(alpha, best_eval)
         else:
             best_eval = MAX_FLOAT
-            for move in moves:
+            for i, move in enumerate(moves):
+                reduction = self._reduction(move, remaining, i)
                 self.rules.execute_move(move)
-                score = self.minimax(depth + 1, alpha, beta, True)
-                self.rules.undo_move(move)
-                best_eval = min(score, best_eval)
-                if best_eval < alpha:
+                try:
+                    score = self._search_child(
+                        child_depth, alpha, beta, True, best_move is None, reduction
+                    )
+                finally:
+                    self.rules.undo_move(move)
+                if best_move is None or score < best_eval:
+                    best_eval = score
+                    best_move = move
+                if best_eval <= alpha:
+                    self._orderer.update(move.packed, depth + 1, remaining)
                     break
                 beta = min(beta, best_eval)
+
+        if is_futile:
+            # The pruned moves are assumed to be no better than the bound
+            if is_maximizing:
+                return max(best_eval, futility_bound)
+            return min(best_eval, futility_bound)
+        # Razored scores are from a shallower search, so they aren't stored
+        if self._tt is not None and best_move is not None and razor_plies == 0:
+            bound = _score_bound(best_eval, alpha_orig, beta_orig)
+            self._tt.store(self.board.key, remaining, best_eval, bound, best_move.packed)
         return best_eval
@@ -0,0 +1,157 @@
+"""Opening book of the placement phase, built offline by deep searches.
+
+    python -m nnm.ai.opening_book book.bin --plies 6 --width 2 --depth 6
+"""
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+import argparse
+import os
+import time
+
+import numpy as np
+import nnm_board
+
+MAGIC = b"NNMBOOK2"
+HEADER_SIZE = 16
+# Sorted by key, the canonical key of the position. Moves are stored in the canonical frame, so
+# one entry covers all 16 symmetric positions.
+ENTRY_DTYPE = np.dtype([("key", "<u8"), ("move", "<u2"), ("score", "<f4")])
+
+
+class OpeningBook:
+    """A book file, memory mapped and probed with a binary search."""
+
+    def __init__(self, path: str | Path) -> None:
+        self.path = Path(path)
+        with self.path.open("rb") as fd:
+            header = fd.read(HEADER_SIZE)
+        if len(header) != HEADER_SIZE or header[:8] != MAGIC:
+            raise ValueError(f"{self.path} is not an opening book")
+        n_entries = int.from_bytes(header[8:], "little")
+        self._entries = np.empty(0, dtype=ENTRY_DTYPE)
+        if n_entries > 0:
+            self._entries = np.memmap(
+                self.path, dtype=ENTRY_DTYPE, mode="r", offset=HEADER_SIZE, shape=(n_entries,)
+            )
+        self._keys = self._entries["key"]
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def probe(self, board: nnm_board.Board) -> int | None:
+        """The packed book move of the position, if it is in the book."""
+        key, transform = nnm_board.canonicalize(board)
+        entry = self._find(key)
+        if entry is None:
+            return None
+        return nnm_board.transform_move(int(entry["move"]), nnm_board.inverse_transform(transform))
+
+    def probe_entry(self, board: nnm_board.Board):
+        """The book entry of the position, its move is in the canonical frame."""
+        return self._find(nnm_board.canonical_key(board))
+
+    def _find(self, key: int):
+        i = np.searchsorted(self._keys, key)
+        if i < len(self._keys) and self._keys[i] == key:
+            return self._entries[i]
+        return None
+
+
+def write_book(path: str | Path, keys, moves, scores) -> None:
+    entries = np.empty(len(keys), dtype=ENTRY_DTYPE)
+    entries["key"] = keys
+    entries["move"] = moves
+    entries["score"] = scores
+    entries.sort(order="key")
+    if len(entries) > 1 and np.any(entries["key"][1:] == entries["key"][:-1]):
+        raise ValueError("Duplicate positions in the book")
+    path = Path(path)
+    tmp = path.with_suffix(path.suffix + ".tmp")
+    with tmp.open("wb") as fd:
+        fd.write(MAGIC + len(entries).to_bytes(8, "little"))
+        fd.write(entries.tobytes())
+    os.replace(tmp, path)
+
+
+def _canonical_key(moves: tuple[int, ...]) -> int:
+    board = nnm_board.Board()
+    for move in moves:
+        board.execute_move(move)
+    return nnm_board.canonical_key(board)
+
+
+def _analyse(job: tuple) -> tuple:
+    """The canonical key and best moves of the position after the moves, best first, as (move,
+    score) pairs."""
+    moves, width, depth, brain = job
+    board = nnm_board.Board()
+    for move in moves:
+        board.execute_move(move)
+    evaluator = nnm_board.Evaluator(board, board.turn_index)
+    if brain is not None:
+        evaluator.set_brain(brain)
+    searcher = nnm_board.Searcher(board, evaluator)
+    best = []
+    for _ in range(width):
+        searcher.set_excluded_moves([move for move, _ in best])
+        result = searcher.search(depth)
+        if result.packed_move == nnm_board.NO_MOVE:
+            break
+        best.append((result.packed_move, result.score))
+    key, transform = nnm_board.canonicalize(board)
+    return key, transform, best
+
+
+def build_book(
+    path: str | Path,
+    plies: int = 6,
+    width: int = 2,
+    depth: int = 6,
+    brain: list[float] | None = None,
+    processes: int | None = None,
+    verbose: bool = True,
+) -> int:
+    """Build a book of every position within the first plies placements, when both players play
+    one of their width best moves according to a search of depth plies. Returns the number of
+    positions in the book."""
+    keys, book_moves, scores = [], [], []
+    layer = [()]
+    seen = {nnm_board.canonical_key(nnm_board.Board())}
+    with ProcessPoolExecutor(max_workers=processes) as pool:
+        for ply in range(plies):
+            t0 = time.perf_counter()
+            jobs = [(moves, width, depth, brain) for moves in layer]
+            next_layer = []
+            for moves, (key, transform, best) in zip(layer, pool.map(_analyse, jobs)):
+                if not best:
+                    continue
+                keys.append(key)
+                book_moves.append(nnm_board.transform_move(best[0][0], transform))
+                scores.append(best[0][1])
+                for move, _ in best:
+                    # Transpositions and symmetric positions are analysed once
+                    next_key = _canonical_key(moves + (move,))
+                    if next_key not in seen:
+                        seen.add(next_key)
+                        next_layer.append(moves + (move,))
+            if verbose:
+                print(f"Ply {ply}: {len(layer)} positions in {time.perf_counter() - t0:.1f} s")
+            layer = next_layer
+    write_book(path, keys, book_moves, scores)
+    return len(keys)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("path", type=Path)
+    parser.add_argument("--plies", type=int, default=6, help="Placements covered by the book")
+    parser.add_argument("--width", type=int, default=2, help="Best moves followed per position")
+    parser.add_argument("--depth", type=int, default=6, help="Search depth")
+    parser.add_argument("--processes", type=int, default=None)
+    args = parser.parse_args()
+    n_positions = build_book(args.path, args.plies, args.width, args.depth, None, args.processes)
+    print(f"Wrote {n_positions} positions to {args.path}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,205 @@
+"""Measure what selective pruning costs in strength against what it saves in nodes.
+
+    python -m nnm.ai.pruning --depth 5 --positions 40 --games 20 --lmr --futility --razoring
+
+Two measurements, both against the same search without pruning:
+  - compare_search searches sample positions with and without pruning. It counts the nodes and
+    scores the move chosen with pruning by a full search, so the loss is in evaluation units.
+  - play_match plays self-play games of the pruned search against the full search at the same
+    depth, each side playing first in half of the games.
+"""
+from dataclasses import dataclass
+import argparse
+import math
+import random
+import time
+
+import nnm_board
+from nnm_board import PruningParams
+
+__all__ = ["MatchResult", "PruningParams", "SearchComparison", "compare_search", "play_match"]
+
+
+@dataclass(slots=True)
+class SearchComparison:
+    positions: int
+    nodes_full: int
+    nodes_pruned: int
+    time_full: float
+    time_pruned: float
+    same_move: int  # Positions where both searches chose the same move
+    score_loss: float  # Summed over the positions with a finite loss
+    blunders: int  # Positions where the pruned move loses a won or drawn game
+
+    @property
+    def node_ratio(self) -> float:
+        return self.nodes_pruned / self.nodes_full if self.nodes_full > 0 else 1.0
+
+    @property
+    def mean_score_loss(self) -> float:
+        n_finite = self.positions - self.blunders
+        return self.score_loss / n_finite if n_finite > 0 else 0.0
+
+
+@dataclass(slots=True)
+class MatchResult:
+    games: int
+    wins: int  # For the pruned search
+    draws: int
+    losses: int
+
+    @property
+    def score(self) -> float:
+        """Points of the pruned search per game, a draw is half a point"""
+        return (self.wins + 0.5 * self.draws) / self.games if self.games > 0 else 0.0
+
+
+def sample_positions(
+    n_positions: int, seed: int = 1, min_plies: int = 6, max_plies: int = 40
+) -> list[list[int]]:
+    """Packed moves of random games, each leading to a position which isn't over yet."""
+    rng = random.Random(seed)
+    positions = []
+    while len(positions) < n_positions:
+        board = nnm_board.Board()
+        move_finder = nnm_board.MoveFinder(board)
+        moves = []
+        for _ in range(rng.randint(min_plies, max_plies)):
+            if move_finder.get_phase() == -1:
+                break
+            move = int(rng.choice(move_finder.get_moves_array(board.turn_index)))
+            board.execute_move(move)
+            moves.append(move)
+        if move_finder.get_phase() != -1:
+            positions.append(moves)
+    return positions
+
+
+def _search(moves: list[int], depth: int, pruning: PruningParams, brain, excluded=()):
+    board = nnm_board.Board()
+    for move in moves:
+        board.execute_move(move)
+    evaluator = nnm_board.Evaluator(board, board.turn_index)
+    if brain is not None:
+        evaluator.set_brain(brain)
+    searcher = nnm_board.Searcher(board, evaluator)
+    searcher.pruning = pruning
+    searcher.set_excluded_moves(list(excluded))
+    t0 = time.perf_counter()
+    result = searcher.search(depth)
+    return result, time.perf_counter() - t0
+
+
+def compare_search(
+    pruning: PruningParams,
+    depth: int = 5,
+    positions: list[list[int]] | None = None,
+    brain: list[float] | None = None,
+) -> SearchComparison:
+    """Search the positions, see sample_positions, with and without pruning."""
+    if positions is None:
+        positions = sample_positions(40)
+    full_params = PruningParams()
+    stats = SearchComparison(len(positions), 0, 0, 0.0, 0.0, 0, 0.0, 0)
+    for moves in positions:
+        full, dt_full = _search(moves, depth, full_params, brain)
+        pruned, dt_pruned = _search(moves, depth, pruning, brain)
+        stats.nodes_full += full.nodes
+        stats.nodes_pruned += pruned.nodes
+        stats.time_full += dt_full
+        stats.time_pruned += dt_pruned
+        if pruned.packed_move == full.packed_move:
+            stats.same_move += 1
+            continue
+        # Full search score of the pruned move, with every other move excluded
+        board = nnm_board.Board()
+        for move in moves:
+            board.execute_move(move)
+        others = nnm_board.MoveFinder(board).get_moves_array(board.turn_index)
+        excluded = [int(move) for move in others if move != pruned.packed_move]
+        chosen, _ = _search(moves, depth, full_params, brain, excluded)
+        loss = full.score - chosen.score
+        if math.isfinite(loss):
+            stats.score_loss += loss
+        elif loss > 0:
+            stats.blunders += 1
+    return stats
+
+
+def play_match(
+    pruning: PruningParams,
+    depth: int = 4,
+    games: int = 20,
+    seed: int = 1,
+    brain: list[float] | None = None,
+) -> MatchResult:
+    """Self-play games of the pruned search against the full search, alternating who starts.
+    Seeds randomize the choice between equally good moves, so the games differ."""
+    if brain is None:
+        brain = nnm_board.Evaluator(nnm_board.Board(), 0).get_brain()
+    full_params = PruningParams()
+    result = MatchResult(games, 0, 0, 0)
+    for game in range(games):
+        pruned_player = game % 2
+        params = (pruning, full_params) if pruned_player == 0 else (full_params, pruning)
+        game_result = nnm_board.play_game(
+            brain, brain, depth, depth, seed * 1_000_003 + game, 16, *params
+        )
+        if game_result.is_draw:
+            result.draws += 1
+        elif game_result.winner == pruned_player:
+            result.wins += 1
+        else:
+            result.losses += 1
+    return result
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--depth", type=int, default=5, help="Depth of the position searches")
+    parser.add_argument("--positions", type=int, default=40)
+    parser.add_argument("--games", type=int, default=20, help="0 skips the match")
+    parser.add_argument("--game-depth", type=int, default=4)
+    parser.add_argument("--seed", type=int, default=1)
+    defaults = PruningParams()
+    parser.add_argument("--lmr", action="store_true")
+    parser.add_argument("--lmr-min-depth", type=int, default=defaults.lmr_min_depth)
+    parser.add_argument("--lmr-min-moves", type=int, default=defaults.lmr_min_moves)
+    parser.add_argument("--lmr-reduction", type=int, default=defaults.lmr_reduction)
+    parser.add_argument("--futility", action="store_true")
+    parser.add_argument("--futility-margin", type=float, default=defaults.futility_margin)
+    parser.add_argument("--razoring", action="store_true")
+    parser.add_argument("--razor-margin", type=float, default=defaults.razor_margin)
+    args = parser.parse_args()
+    pruning = PruningParams(
+        lmr=args.lmr,
+        lmr_min_depth=args.lmr_min_depth,
+        lmr_min_moves=args.lmr_min_moves,
+        lmr_reduction=args.lmr_reduction,
+        futility=args.futility,
+        futility_margin=args.futility_margin,
+        razoring=args.razoring,
+        razor_margin=args.razor_margin,
+    )
+
+    positions = sample_positions(args.positions, args.seed)
+    stats = compare_search(pruning, args.depth, positions)
+    print(f"{pruning} at depth {args.depth}, {stats.positions} positions")
+    print(
+        f"  nodes {stats.nodes_pruned} / {stats.nodes_full} ({stats.node_ratio:.1%}), "
+        f"time {stats.time_pruned:.2f} / {stats.time_full:.2f} s"
+    )
+    print(
+        f"  same move {stats.same_move}/{stats.positions}, "
+        f"mean score loss {stats.mean_score_loss:.2f}, blunders {stats.blunders}"
+    )
+    if args.games > 0:
+        match = play_match(pruning, args.game_depth, args.games, args.seed)
+        print(
+            f"  match at depth {args.game_depth}: +{match.wins} ={match.draws} -{match.losses}, "
+            f"score {match.score:.1%}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -1,11 +1,16 @@
 
-from typing import Iterable
+from typing import Sequence
 import random
 
+import numpy as np
+
 from nnm.rules.rules import CandidateMove, CandidatePlacement
 
 class RandomAI:
 
-    def select_move(self, moves: Iterable[CandidatePlacement] | Iterable[CandidateMove]):
-        return random.choice(list(moves))
+    def select_move(
+        self, moves: Sequence[CandidatePlacement] | Sequence[CandidateMove] | np.ndarray
+    ):
+        """Works on packed move arrays as well, without creating an object per move."""
+        return moves[random.randrange(len(moves))]
     
\ No newline at end of file
@@ -0,0 +1,63 @@
+"""Generate the endgame tablebases, see cxx/include/tablebase.hpp.
+
+    python -m nnm.ai.tablebase tablebases --max-pieces 4
+"""
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+import argparse
+import time
+
+import nnm_board
+from nnm_board import Tablebase, TBResult
+
+__all__ = ["Tablebase", "TBResult", "generate", "partition_pairs"]
+
+MIN_PIECES = 3
+
+
+def partition_pairs(max_pieces: int) -> list[list[tuple[int, int]]]:
+    """The partition pairs up to max_pieces per player, grouped by the total number of pieces.
+
+    Captures lead into the previous group, the pairs of a group are independent of each other.
+    """
+    groups = []
+    for total in range(2 * MIN_PIECES, 2 * max_pieces + 1):
+        pairs = [(a, total - a) for a in range(MIN_PIECES, max_pieces + 1) if a <= total - a]
+        groups.append([(a, b) for a, b in pairs if b <= max_pieces])
+    return groups
+
+
+def _solve(args: tuple[int, int, str]) -> tuple[int, int, float]:
+    n_a, n_b, directory = args
+    t0 = time.perf_counter()
+    nnm_board.solve_tablebase(n_a, n_b, directory)
+    return n_a, n_b, time.perf_counter() - t0
+
+
+def generate(
+    directory: str | Path, max_pieces: int = 3, processes: int | None = None, verbose: bool = True
+) -> None:
+    """Solve every partition up to max_pieces per player into directory, one partition pair per
+    process. Partitions already in directory are kept."""
+    directory = Path(directory)
+    directory.mkdir(parents=True, exist_ok=True)
+    existing = set(Tablebase(str(directory)).partitions())
+    with ProcessPoolExecutor(max_workers=processes) as pool:
+        for pairs in partition_pairs(max_pieces):
+            todo = [(a, b, str(directory)) for a, b in pairs if not {(a, b), (b, a)} <= existing]
+            for n_a, n_b, dt in pool.map(_solve, todo):
+                if verbose:
+                    print(f"Solved {n_a} vs {n_b} pieces in {dt:.1f} s")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("directory", type=Path)
+    parser.add_argument("--max-pieces", type=int, default=3, help="Most pieces of a player")
+    parser.add_argument("--processes", type=int, default=None)
+    args = parser.parse_args()
+    generate(args.directory, args.max_pieces, args.processes)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,93 @@
+"""Headless GA tournaments, the games of a generation are played in parallel processes."""
+from concurrent.futures import Executor, ProcessPoolExecutor
+from dataclasses import dataclass
+from itertools import permutations
+import time
+
+import numpy as np
+import nnm_board
+
+from nnm.ai.ga import GA
+
+# The brain used by the evaluator when nothing else is set
+DEFAULT_BRAIN = nnm_board.Evaluator(nnm_board.Board(), 0).get_brain()
+
+
+@dataclass(slots=True)
+class GenerationStats:
+    generation: int
+    games: int
+    wall_time: float
+
+    @property
+    def games_per_sec(self) -> float:
+        return self.games / self.wall_time if self.wall_time > 0 else 0.0
+
+
+def get_score(result: nnm_board.GameResult) -> float:
+    """Score of the first player, the piece difference signed by the result, as in ai_play."""
+    if result.is_draw:
+        return 0.0
+    score = abs(result.pieces[0] - result.pieces[1])
+    return score if result.winner == 0 else -score
+
+
+def _play(game: tuple) -> float:
+    brain_a, brain_b, depth_a, depth_b, seed = game
+    return get_score(nnm_board.play_game(brain_a, brain_b, depth_a, depth_b, seed))
+
+
+def play_generation(
+    ga: GA,
+    pops: np.ndarray | list[list[float]],
+    opponent: list[float] | None = None,
+    depth: int = 4,
+    opponent_depth: int | None = None,
+    round_robin: bool = False,
+    seed: int = 1,
+    executor: Executor | None = None,
+    max_workers: int | None = None,
+) -> GenerationStats:
+    """Play every individual of pops against the opponent brain and store the scores in ga.scores.
+
+    Individuals play first, a win scores the piece difference and a loss minus that. With
+    round_robin, every ordered pair of individuals also plays a game, which counts for both.
+    The games run in executor, or in a new process pool of max_workers processes.
+    Seeds are derived from seed, so a generation can be replayed exactly. Seed 0 turns the random
+    tie breaks off.
+    """
+    if opponent is None:
+        opponent = DEFAULT_BRAIN
+    if opponent_depth is None:
+        opponent_depth = depth
+    pops = [list(map(float, brain)) for brain in pops]
+
+    games = []
+    players = []
+    for i, brain in enumerate(pops):
+        games.append((brain, opponent, depth, opponent_depth, _game_seed(seed, len(games))))
+        players.append((i, None))
+    if round_robin:
+        for i, j in permutations(range(len(pops)), 2):
+            games.append((pops[i], pops[j], depth, depth, _game_seed(seed, len(games))))
+            players.append((i, j))
+
+    t0 = time.perf_counter()
+    if executor is None:
+        with ProcessPoolExecutor(max_workers=max_workers) as pool:
+            results = list(pool.map(_play, games))
+    else:
+        results = list(executor.map(_play, games))
+    wall_time = time.perf_counter() - t0
+
+    scores = [0.0] * len(pops)
+    for (first, second), score in zip(players, results):
+        scores[first] += score
+        if second is not None:
+            scores[second] -= score
+    ga.scores = scores
+    return GenerationStats(ga.generation, len(games), wall_time)
+
+
+def _game_seed(seed: int, game: int) -> int:
+    return 0 if seed == 0 else seed * 1_000_003 + game
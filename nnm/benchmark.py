@@ -0,0 +1,307 @@
+"""Headless micro-benchmarks of the board, move generators, evaluator and search.
+
+    python -m nnm.benchmark --output before.json
+    python -m nnm.benchmark --output after.json --baseline before.json
+
+Every benchmark runs on fixed positions from seeded random games, so the results of two builds
+can be compared. The results are written as JSON, with the operations per second and the
+percentiles of the time per operation. With --baseline, benchmarks more than --tolerance slower
+than the baseline are reported and the exit status is 1.
+"""
+from dataclasses import asdict, dataclass
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Callable
+import argparse
+import json
+import os
+import platform
+import random
+import sys
+import time
+
+import numpy as np
+import nnm_board
+
+from nnm.board import Board
+from nnm.rules.rules import Rules
+from nnm.ai.minimax import MinimaxAI
+
+__all__ = ["BenchmarkResult", "compare", "run_benchmarks", "sample_positions"]
+
+SEARCH_DEPTHS = (2, 3, 4, 5)
+
+
+@dataclass(slots=True)
+class BenchmarkResult:
+    name: str
+    ops: int
+    seconds: float
+    ops_per_sec: float
+    p50_us: float  # Percentiles of the time per operation, in microseconds
+    p90_us: float
+    p99_us: float
+    nodes_per_sec: float | None = None  # Searches only
+
+
+def sample_positions(n_positions: int, seed: int = 1) -> dict[int, list[list[int]]]:
+    """Packed moves of random games leading to n_positions positions of each phase, 1 is the
+    placement phase, 2 the movement phase and 3 flying. None of them is over."""
+    rng = random.Random(seed)
+    positions = {1: [], 2: [], 3: []}
+    while any(len(phase_moves) < n_positions for phase_moves in positions.values()):
+        board = nnm_board.Board()
+        move_finder = nnm_board.MoveFinder(board)
+        moves = []
+        while len(moves) < 200 and not board.is_repetition(3):
+            phase = move_finder.get_phase()
+            if phase == -1:
+                break
+            # A few positions of each game, so they come from many games
+            if len(positions[phase]) < n_positions and rng.random() < 0.1:
+                positions[phase].append(list(moves))
+            move = int(rng.choice(move_finder.get_moves_array(board.turn_index)))
+            board.execute_move(move)
+            board.commit_position()
+            moves.append(move)
+    return positions
+
+
+def _make_board(moves: list[int]) -> nnm_board.Board:
+    board = nnm_board.Board()
+    for move in moves:
+        board.execute_move(move)
+    return board
+
+
+def _measure(name: str, run: Callable[[], int], min_time: float, min_runs: int) -> BenchmarkResult:
+    """Times run, which returns the number of operations it did, at least min_runs times and for
+    at least min_time seconds. The percentiles are of the mean time per operation of each run."""
+    run()  # Warm up
+    times, total_ops, total_time = [], 0, 0.0
+    while len(times) < min_runs or total_time < min_time:
+        t0 = time.perf_counter()
+        n_ops = run()
+        dt = time.perf_counter() - t0
+        times.append(dt / n_ops)
+        total_ops += n_ops
+        total_time += dt
+    p50, p90, p99 = np.percentile(times, (50, 90, 99)) * 1e6
+    return BenchmarkResult(
+        name, total_ops, total_time, total_ops / total_time, float(p50), float(p90), float(p99)
+    )
+
+
+def _hot_path_benchmarks(positions: dict[int, list[list[int]]]) -> dict[str, Callable[[], int]]:
+    # Move finders and evaluators point to their board, which must outlive them
+    boards = {
+        phase: [_make_board(moves) for moves in phase_moves]
+        for phase, phase_moves in positions.items()
+    }
+    all_boards = [board for phase_boards in boards.values() for board in phase_boards]
+    finders = {
+        phase: [(nnm_board.MoveFinder(board), board.turn_index) for board in phase_boards]
+        for phase, phase_boards in boards.items()
+    }
+    all_finders = [finder for phase_finders in finders.values() for finder in phase_finders]
+    evaluators = [nnm_board.Evaluator(board, board.turn_index) for board in all_boards]
+    for evaluator in evaluators:
+        evaluator.set_cache_size(0)
+    cached_evaluators = [nnm_board.Evaluator(board, board.turn_index) for board in all_boards]
+
+    def check_mill() -> int:
+        for board in all_boards:
+            player = board.turn_index
+            for pos in range(24):
+                board.check_mill(pos, player)
+        return 24 * len(all_boards)
+
+    def can_delete() -> int:
+        for board in all_boards:
+            player = board.turn_index
+            for pos in range(24):
+                board.can_delete(pos, player)
+        return 24 * len(all_boards)
+
+    def get_phase() -> int:
+        for finder, _ in all_finders:
+            finder.get_phase()
+        return len(all_finders)
+
+    def get_phase_one_moves() -> int:
+        for finder, player in finders[1]:
+            finder.get_phase_one_moves(player)
+        return len(finders[1])
+
+    def get_movement_phase_moves() -> int:
+        for finder, player in finders[2]:
+            finder.get_movement_phase_moves(player, False)
+        for finder, player in finders[3]:
+            finder.get_movement_phase_moves(player, True)
+        return len(finders[2]) + len(finders[3])
+
+    def get_moves_array() -> int:
+        for finder, player in all_finders:
+            finder.get_moves_array(player)
+        return len(all_finders)
+
+    def evaluate() -> int:
+        for evaluator in evaluators:
+            evaluator.evaluate()
+        return len(evaluators)
+
+    def evaluate_cached() -> int:
+        for evaluator in cached_evaluators:
+            evaluator.evaluate()
+        return len(cached_evaluators)
+
+    benchmarks = [
+        check_mill,
+        can_delete,
+        get_phase,
+        get_phase_one_moves,
+        get_movement_phase_moves,
+        get_moves_array,
+        evaluate,
+        evaluate_cached,
+    ]
+    return {benchmark.__name__: benchmark for benchmark in benchmarks}
+
+
+def _search_benchmark(positions: list[list[int]], depth: int) -> BenchmarkResult:
+    """MinimaxAI.get_best_move on each position, with an empty transposition table. Each search
+    is a run of its own, so the percentiles are over the positions."""
+    times, nodes = [], 0
+    for moves in positions:
+        board = Board()
+        for move in moves:
+            board.execute_move(move)
+        rules = Rules(board)
+        ai = MinimaxAI(board.current_player, rules, max_depth=depth)
+        t0 = time.perf_counter()
+        ai.get_best_move()
+        times.append(time.perf_counter() - t0)
+        nodes += ai.last_result.nodes
+    total_time = sum(times)
+    p50, p90, p99 = np.percentile(times, (50, 90, 99)) * 1e6
+    return BenchmarkResult(
+        f"get_best_move_d{depth}",
+        len(times),
+        total_time,
+        len(times) / total_time,
+        float(p50),
+        float(p90),
+        float(p99),
+        nodes / total_time,
+    )
+
+
+def run_benchmarks(
+    n_positions: int = 50,
+    n_search_positions: int = 10,
+    depths: tuple[int, ...] = SEARCH_DEPTHS,
+    seed: int = 1,
+    min_time: float = 0.5,
+    min_runs: int = 20,
+    only: list[str] | None = None,
+    verbose: bool = True,
+) -> list[BenchmarkResult]:
+    """Run the benchmarks, on n_positions positions of each phase, see sample_positions. The
+    searches run on n_search_positions of each phase. only limits the benchmarks to those whose
+    name starts with one of its prefixes."""
+    positions = sample_positions(max(n_positions, n_search_positions), seed)
+    hot_paths = _hot_path_benchmarks(
+        {phase: phase_moves[:n_positions] for phase, phase_moves in positions.items()}
+    )
+    search_positions = [
+        moves for phase_moves in positions.values() for moves in phase_moves[:n_search_positions]
+    ]
+
+    def selected(name: str) -> bool:
+        return only is None or any(name.startswith(prefix) for prefix in only)
+
+    results = []
+    for name, run in hot_paths.items():
+        if selected(name):
+            results.append(_measure(name, run, min_time, min_runs))
+            if verbose:
+                _print_result(results[-1])
+    for depth in depths:
+        if selected(f"get_best_move_d{depth}"):
+            results.append(_search_benchmark(search_positions, depth))
+            if verbose:
+                _print_result(results[-1])
+    return results
+
+
+def _print_result(result: BenchmarkResult) -> None:
+    nps = f" {result.nodes_per_sec / 1e6:6.2f} Mnodes/s" if result.nodes_per_sec else ""
+    print(
+        f"{result.name:<26} {result.ops_per_sec:>12.1f} ops/s  p50 {result.p50_us:>10.2f} us  "
+        f"p90 {result.p90_us:>10.2f} us  p99 {result.p99_us:>10.2f} us{nps}",
+        file=sys.stderr,
+    )
+
+
+def compare(results: list[BenchmarkResult], baseline: dict, tolerance: float = 0.1) -> list[str]:
+    """Names of the benchmarks with fewer operations per second than (1 - tolerance) times the
+    baseline, a report loaded from the JSON written by main()."""
+    baseline_ops = {entry["name"]: entry["ops_per_sec"] for entry in baseline["benchmarks"]}
+    regressions = []
+    for result in results:
+        if result.name in baseline_ops:
+            ratio = result.ops_per_sec / baseline_ops[result.name]
+            if ratio < 1 - tolerance:
+                regressions.append(result.name)
+            print(f"{result.name:<26} {ratio:6.2f}x the baseline", file=sys.stderr)
+    return regressions
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--output", type=Path, default=None, help="JSON file, default stdout")
+    parser.add_argument("--positions", type=int, default=50, help="Positions of each phase")
+    parser.add_argument("--search-positions", type=int, default=10, help="Per phase")
+    parser.add_argument("--depths", type=int, nargs="*", default=list(SEARCH_DEPTHS))
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--min-time", type=float, default=0.5, help="Seconds per benchmark")
+    parser.add_argument("--only", nargs="*", default=None, help="Prefixes of benchmark names")
+    parser.add_argument("--baseline", type=Path, default=None, help="JSON of an earlier run")
+    parser.add_argument("--tolerance", type=float, default=0.1, help="Slowdown allowed")
+    args = parser.parse_args()
+
+    results = run_benchmarks(
+        args.positions,
+        args.search_positions,
+        tuple(args.depths),
+        args.seed,
+        args.min_time,
+        only=args.only,
+    )
+    report = {
+        "created": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpus": os.cpu_count(),
+        "extension": nnm_board.__file__,
+        "seed": args.seed,
+        "positions": args.positions,
+        "search_positions": args.search_positions,
+        "benchmarks": [asdict(result) for result in results],
+    }
+    text = json.dumps(report, indent=2)
+    if args.output is None:
+        print(text)
+    else:
+        args.output.write_text(text + "\n")
+
+    if args.baseline is not None:
+        regressions = compare(results, json.loads(args.baseline.read_text()), args.tolerance)
+        if regressions:
+            print(f"Slower than the baseline: {', '.join(regressions)}", file=sys.stderr)
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -117,10 +117,23 @@ class Board:
 
     def get_board_hash(self) -> int:
         return self._board.get_board_hash()
+
+    @property
+    def key(self) -> int:
+        """64-bit Zobrist key of the position"""
+        return self._board.key
    
     def reset(self) -> None:
         self._board.reset()
 
+    def commit_position(self) -> None:
+        """Record the position in the game history, see nnm_board.Board.commit_position"""
+        self._board.commit_position()
+
+    def is_repetition(self, n: int = 3) -> bool:
+        """Whether the position has occurred n times in the game"""
+        return self._board.is_repetition(n)
+
     def get_board_key(self) -> str:
         t = self._turn_index
         p1, p2 = self.get_piece_counts()
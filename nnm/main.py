@@ -29,7 +29,7 @@ class NineMenMorris:
 
         ai = RandomAI()
         ai = MinimaxAI(
-            self.board.players[1], self.rules, max_depth=4
+            self.board.players[1], self.rules, max_depth=12, time_limit_ms=1000
         )
         self.board.players[1].ai = ai
         # ai.evaluator.load_brain()
@@ -0,0 +1,95 @@
+"""Count the leaf positions of the move generator, to check it and to time it.
+
+    python -m nnm.perft --depth 6
+    python -m nnm.perft --depth 3 --divide --moves 31775 31807
+
+Every change to the move generator should leave the counts from the start position equal to
+REFERENCE_COUNTS, and to REGRESSION_COUNTS deeper, and can be timed by the nodes per second.
+"""
+import argparse
+import sys
+import time
+
+import nnm_board
+
+# Leaf positions after depth plies from the start position. With the rules of nnm_board: a mill
+# closed in the placement phase may take any piece of the other player. Checked against an
+# independent generator written in Python.
+REFERENCE_COUNTS = {
+    1: 24,
+    2: 552,
+    3: 12_144,
+    4: 255_024,
+    5: 5_140_800,
+}
+# Counted by this generator only, too deep for the Python one. They catch changes of the counts,
+# but aren't known to be right.
+REGRESSION_COUNTS = {
+    6: 99_274_176,
+    7: 1_873_562_112,
+}
+
+
+def make_board(moves: list[int] | None = None) -> nnm_board.Board:
+    """The start position, followed by the packed moves"""
+    board = nnm_board.Board()
+    for move in moves or []:
+        board.execute_move(move)
+    return board
+
+
+def perft(depth: int, moves: list[int] | None = None, bulk: bool = True) -> tuple[int, float]:
+    """The number of leaf positions depth plies from the position and the time it took"""
+    board = make_board(moves)
+    t0 = time.perf_counter()
+    nodes = nnm_board.perft(board, depth, bulk)
+    return nodes, time.perf_counter() - t0
+
+
+def divide(depth: int, moves: list[int] | None = None, bulk: bool = True) -> dict[int, int]:
+    """The number of leaf positions after each packed move of the position"""
+    return dict(nnm_board.divide(make_board(moves), depth, bulk))
+
+
+def format_move(move: int) -> str:
+    candidate = nnm_board.unpack_move(move)
+    delete = f" x{candidate.delete_pos}" if candidate.delete_pos != -1 else ""
+    if hasattr(candidate, "pos"):
+        return f"{candidate.pos}{delete}"
+    return f"{candidate.from_pos}-{candidate.to_pos}{delete}"
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--depth", type=int, default=5)
+    parser.add_argument(
+        "--moves", type=int, nargs="*", default=[], help="Packed moves played from the start first"
+    )
+    parser.add_argument("--divide", action="store_true", help="Counts per move at the last depth")
+    parser.add_argument("--no-bulk", action="store_true", help="Execute the moves of the last ply")
+    args = parser.parse_args()
+    bulk = not args.no_bulk
+
+    failed = False
+    print(f"{'depth':>5} {'nodes':>14} {'time (s)':>9} {'Mnodes/s':>9}  reference")
+    for depth in range(1, args.depth + 1):
+        nodes, dt = perft(depth, args.moves, bulk)
+        check = ""
+        expected = REFERENCE_COUNTS.get(depth, REGRESSION_COUNTS.get(depth))
+        if not args.moves and expected is not None:
+            ok = nodes == expected
+            failed |= not ok
+            check = "ok" if ok else f"MISMATCH, expected {expected}"
+            if depth in REGRESSION_COUNTS:
+                check += " (regression value)"
+        rate = nodes / dt / 1e6 if dt > 0 else float("inf")
+        print(f"{depth:>5} {nodes:>14} {dt:>9.3f} {rate:>9.1f}  {check}")
+
+    if args.divide:
+        for move, nodes in divide(args.depth, args.moves, bulk).items():
+            print(f"{move:>6} {format_move(move):>10} {nodes:>14}")
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,7 +1,8 @@
 from typing import TypeAlias, Iterator
 from enum import IntEnum
 from dataclasses import dataclass
-from collections import Counter
+
+import numpy as np
 
 from nnm_board import (
     MoveFinder,
@@ -43,13 +44,11 @@ class Phase(IntEnum):
 class Rules:
     def __init__(self, board: Board):
         self.board = board
-        self._state_counter = Counter()
         self._move_finder = MoveFinder(board._board)
         self._is_draw = False
         self._move_cache = {}
 
     def reset(self):
-        self._state_counter.clear()
         self._is_draw = False
 
     def get_current_player_moves(
@@ -71,6 +70,15 @@ class Rules:
             moves = self.get_phase_three_moves()
         return moves
 
+    def get_current_player_moves_array(self) -> np.ndarray:
+        """The moves of the current player packed into a uint16 array, see nnm_board.pack_move.
+
+        The packed moves can be passed to execute_move and undo_move like the move objects.
+        """
+        if self.get_phase() is Phase.DONE:
+            return np.empty(0, dtype=np.uint16)
+        return self._move_finder.get_moves_array(self.current_player.number)
+
     def iter_current_moves(self):
         phase = self.get_phase()
         if phase is Phase.DONE:
@@ -152,7 +160,7 @@ class Rules:
     def next_turn(self) -> None:
         if self._is_draw:
             raise RuntimeError("Game is a draw, cannot start next turn")
-        state = self.board.get_board_hash()
-        self._state_counter[state] += 1
-        if self._state_counter[state] >= 3:
+        # Moves made piece by piece don't go through execute_move
+        self.board.commit_position()
+        if self.board.is_repetition(3):
             self._is_draw = True
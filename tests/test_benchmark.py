@@ -0,0 +1,71 @@
+from dataclasses import asdict
+import json
+import sys
+
+from nnm import benchmark
+from nnm.benchmark import BenchmarkResult, compare, run_benchmarks
+
+
+def test_run_benchmarks():
+    results = run_benchmarks(
+        n_positions=2, n_search_positions=1, depths=(2,), min_time=0, min_runs=1, verbose=False
+    )
+    names = [result.name for result in results]
+    assert names[0] == "check_mill" and names[-1] == "get_best_move_d2"
+    assert "evaluate_cached" in names
+    for result in results:
+        assert result.ops > 0 and result.ops_per_sec > 0
+        assert result.p50_us <= result.p90_us <= result.p99_us
+    assert results[-1].nodes_per_sec > 0
+
+
+def test_main_writes_the_report(tmp_path, monkeypatch):
+    output = tmp_path / "after.json"
+    argv = ["benchmark", "--output", str(output), "--positions", "2", "--search-positions", "1"]
+    argv += ["--depths", "2", "--min-time", "0", "--only", "check_mill", "get_best_move"]
+    monkeypatch.setattr(sys, "argv", argv)
+    assert benchmark.main() == 0
+    report = json.loads(output.read_text())
+    assert set(report) == {
+        "created",
+        "python",
+        "platform",
+        "cpus",
+        "extension",
+        "seed",
+        "positions",
+        "search_positions",
+        "benchmarks",
+    }
+    assert [entry["name"] for entry in report["benchmarks"]] == ["check_mill", "get_best_move_d2"]
+    fields = set(asdict(BenchmarkResult("", 0, 0.0, 0.0, 0.0, 0.0, 0.0)))
+    assert all(set(entry) == fields for entry in report["benchmarks"])
+
+
+def _report(ops_per_sec: dict[str, float]) -> dict:
+    return {
+        "benchmarks": [
+            asdict(BenchmarkResult(name, 100, 100 / ops, ops, 1.0, 2.0, 3.0))
+            for name, ops in ops_per_sec.items()
+        ]
+    }
+
+
+def test_compare_reports_regressions(tmp_path):
+    before, after = tmp_path / "before.json", tmp_path / "after.json"
+    before.write_text(json.dumps(_report({"evaluate": 1000.0, "get_phase": 1000.0, "gone": 5.0})))
+    after.write_text(json.dumps(_report({"evaluate": 850.0, "get_phase": 950.0, "new": 1.0})))
+    results = [BenchmarkResult(**entry) for entry in json.loads(after.read_text())["benchmarks"]]
+    baseline = json.loads(before.read_text())
+    assert compare(results, baseline) == ["evaluate"]
+    assert compare(results, baseline, tolerance=0.2) == []
+    assert compare(results, baseline, tolerance=0.01) == ["evaluate", "get_phase"]
+
+
+def test_main_fails_on_a_slower_run(tmp_path, monkeypatch):
+    baseline = tmp_path / "before.json"
+    baseline.write_text(json.dumps(_report({"check_mill": 1e12})))
+    argv = ["benchmark", "--output", str(tmp_path / "after.json"), "--positions", "2"]
+    argv += ["--depths", "--min-time", "0", "--only", "check_mill", "--baseline", str(baseline)]
+    monkeypatch.setattr(sys, "argv", argv)
+    assert benchmark.main() == 1
@@ -0,0 +1,19 @@
+import numpy as np
+
+from nnm.ai.brain_store import BrainStore
+
+
+def test_index_is_rewritten_after_a_crash(tmp_path):
+    store = BrainStore(tmp_path, brain_size=3)
+    for score in (1.0, 5.0, 3.0, 2.0, 4.0):
+        store.append(np.full(3, score), score)
+    store.checkpoint()
+    # Appended, but killed before the next checkpoint
+    store.append(np.full(3, 6.0), 6.0)
+    del store
+
+    store = BrainStore(tmp_path)
+    index = np.fromfile(tmp_path / "index.bin", dtype="<i8")
+    assert index.tolist() == [5, 1, 4, 2, 3, 0]
+    assert store.top(3) == [5, 1, 4]
+    assert store.best()[1].score == 6.0
@@ -0,0 +1,41 @@
+import random
+
+import numpy as np
+import pytest
+
+from nnm.board import Board
+from nnm.rules.rules import Rules, Phase
+from nnm.ai.evaluator import Evaluator
+
+
+def random_positions(n: int, seed: int = 0):
+    """Positions of random games, with their per position evaluation"""
+    rng = random.Random(seed)
+    board = Board()
+    rules = Rules(board)
+    evaluator = Evaluator(board, board.players[0], rules)
+    evaluator.set_brain([rng.uniform(-10, 10) for _ in range(len(evaluator.get_brain()))])
+    owners, hands, turns, scores = [], [], [], []
+    while len(scores) < n:
+        if rules.get_phase() in (Phase.DONE, Phase.DRAW):
+            board.reset()
+            rules = Rules(board)
+        rules.execute_move(rng.choice(rules.get_current_player_moves()))
+        owners.append(board._board.get_board())
+        hands.append((board._board.get_player_one_pieces(), board._board.get_player_two_pieces()))
+        turns.append(board._board.turn_index)
+        scores.append(evaluator.evaluate())
+    arrays = (np.array(owners, dtype=np.int8), np.array(hands), np.array(turns))
+    return evaluator, arrays, np.array(scores, dtype=np.float32)
+
+
+@pytest.mark.parametrize("threads", [1, 4, 0])
+def test_batch_matches_evaluate(threads):
+    evaluator, (owners, hands, turns), expected = random_positions(300)
+    # Repeated, so the batch is large enough to be split between the threads
+    reps = 16
+    owners, hands = np.tile(owners, (reps, 1)), np.tile(hands, (reps, 1))
+    turns = np.tile(turns, reps)
+    scores = evaluator.evaluate_batch(owners, hands, turns, threads=threads)
+    assert scores.dtype == np.float32
+    np.testing.assert_allclose(scores, np.tile(expected, reps), rtol=1e-5, atol=1e-4)
@@ -0,0 +1,38 @@
+import random
+
+from nnm.board import Board
+from nnm.rules.rules import Rules
+from nnm.ai.evaluator import Evaluator
+
+
+def play_random(seed: int, board: Board, rules: Rules, plies: int = 20) -> None:
+    rng = random.Random(seed)
+    for _ in range(plies):
+        rules.execute_move(rng.choice(rules.get_current_player_moves()))
+
+
+def test_cache_hit_on_second_evaluation():
+    board = Board()
+    rules = Rules(board)
+    play_random(0, board, rules)
+    evaluator = Evaluator(board, board.players[0], rules)
+    assert evaluator.cache_info() == (0, 0)
+    score = evaluator.evaluate()
+    assert evaluator.cache_info() == (0, 1)
+    assert evaluator.evaluate() == score
+    assert evaluator.cache_info() == (1, 1)
+
+
+def test_set_brain_drops_cached_scores():
+    board = Board()
+    rules = Rules(board)
+    play_random(1, board, rules)
+    evaluator = Evaluator(board, board.players[0], rules)
+    old_score = evaluator.evaluate()
+    rng = random.Random(1)
+    brain = [rng.uniform(-10, 10) for _ in range(len(evaluator.get_brain()))]
+    evaluator.set_brain(brain)
+
+    fresh = Evaluator(board, board.players[0], rules)
+    fresh.set_brain(brain)
+    assert evaluator.evaluate() == fresh.evaluate() != old_score
@@ -0,0 +1,28 @@
+import itertools
+
+import numpy as np
+import pytest
+
+from nnm.ai.ga import CROSSOVERS, SELECTIONS, GA
+
+
+def run(seed: int, **kwargs) -> list[np.ndarray]:
+    """The populations of a few generations, scored by the sum of the genes"""
+    ga = GA(n_pops=8, seed=seed, **kwargs)
+    brain = np.linspace(-5, 5, 6)
+    generations = []
+    for _ in range(4):
+        pops = ga.generate_pops(brain)
+        ga.scores = list(pops.sum(axis=1))
+        generations.append(pops)
+    return generations
+
+
+@pytest.mark.parametrize("crossover, selection", list(itertools.product(CROSSOVERS, SELECTIONS)))
+def test_same_seed_gives_the_same_populations(crossover, selection):
+    first = run(42, crossover=crossover, selection=selection)
+    second = run(42, crossover=crossover, selection=selection)
+    for a, b in zip(first, second):
+        np.testing.assert_array_equal(a, b)
+    other = run(43, crossover=crossover, selection=selection)
+    assert not np.array_equal(first[-1], other[-1])
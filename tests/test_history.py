@@ -0,0 +1,44 @@
+import nnm_board
+
+from nnm.board import Board
+
+
+def spots(*positions: int) -> int:
+    return sum(1 << pos for pos in positions)
+
+
+def test_shuffling_pieces_repeats_the_position():
+    board = Board()
+    # Moving phase, four pieces each
+    board._board.set_state(spots(0, 3, 6, 15), spots(2, 5, 8, 17), 0, 0, 0)
+    start = board.key
+    # Both players move a piece away and back, which passes the start position again
+    shuffle = [
+        nnm_board.pack_move(0, 9, -1),
+        nnm_board.pack_move(2, 14, -1),
+        nnm_board.pack_move(9, 0, -1),
+        nnm_board.pack_move(14, 2, -1),
+    ]
+    for move in shuffle[:-1]:
+        board.execute_move(move)
+        assert not board.is_repetition(2)
+    board.execute_move(shuffle[-1])
+    assert board.key == start
+    assert board.is_repetition(2)
+    assert not board.is_repetition(3)
+    for move in shuffle:
+        board.execute_move(move)
+    assert board.is_repetition(3)
+    assert board._board.history_size == 9
+
+    # Undo pops the history, the start position was seen twice again
+    board.undo_move(shuffle[-1])
+    assert board._board.history_size == 8
+    for move in reversed(shuffle[:-1]):
+        board.undo_move(move)
+    assert board.is_repetition(2)
+    assert not board.is_repetition(3)
+
+    board.reset()
+    assert board._board.history_size == 1
+    assert not board.is_repetition(2)
@@ -0,0 +1,33 @@
+import random
+
+import pytest
+import nnm_board
+
+
+@pytest.mark.parametrize("seed", range(20))
+def test_incremental_features_match_recount(seed):
+    rng = random.Random(seed)
+    board = nnm_board.Board()
+    move_finder = nnm_board.MoveFinder(board)
+    incremental = nnm_board.Evaluator(board, 0)
+    recount = nnm_board.Evaluator(board, 0, incremental=False)
+    brain = [rng.uniform(-10, 10) for _ in range(incremental.brain_size())]
+    for evaluator in (incremental, recount):
+        evaluator.set_brain(brain)
+        evaluator.set_cache_size(0)
+
+    def check() -> None:
+        assert incremental.get_features() == recount.get_features()
+        assert incremental.evaluate() == pytest.approx(recount.evaluate(), rel=1e-5, abs=1e-4)
+
+    moves = []
+    for _ in range(150):
+        if move_finder.get_phase() == -1:
+            break
+        move = int(rng.choice(move_finder.get_moves_array(board.turn_index)))
+        board.execute_move(move)
+        moves.append(move)
+        check()
+    for move in reversed(moves):
+        board.undo_move(move)
+        check()
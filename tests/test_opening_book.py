@@ -0,0 +1,38 @@
+import nnm_board
+import pytest
+
+from nnm.ai.opening_book import OpeningBook, build_book
+
+
+@pytest.fixture(scope="module")
+def book(tmp_path_factory):
+    path = tmp_path_factory.mktemp("book") / "book.bin"
+    build_book(path, plies=3, width=2, depth=2, processes=1, verbose=False)
+    return OpeningBook(path)
+
+
+def board_after(moves) -> nnm_board.Board:
+    board = nnm_board.Board()
+    for move in moves:
+        board.execute_move(move)
+    return board
+
+
+@pytest.mark.parametrize("t", range(nnm_board.N_SYMMETRIES))
+def test_probe_symmetric_position(book, t):
+    # Follow the book, positions with more pieces have fewer symmetries of their own
+    line = []
+    for _ in range(3):
+        move = book.probe(board_after(line))
+        assert move is not None
+        line.append(move)
+
+    for ply in range(3):
+        # The same position in another frame is answered by the same move in that frame
+        board = board_after(nnm_board.transform_move(move, t) for move in line[:ply])
+        move = book.probe(board)
+        assert move is not None
+        assert move in nnm_board.MoveFinder(board).get_moves_array(board.turn_index)
+        board.execute_move(move)
+        expected = nnm_board.canonical_key(board_after(line[: ply + 1]))
+        assert nnm_board.canonical_key(board) == expected
@@ -0,0 +1,24 @@
+import nnm_board
+
+
+def test_fresh_orderer_has_no_killers():
+    board = nnm_board.Board()
+    orderer = nnm_board.MoveOrderer(board)
+    # MAX_PLY is 128, deeper plies have no killers
+    for ply in (0, 1, 127, 128):
+        assert orderer.get_killers(ply) == [nnm_board.NO_MOVE, nnm_board.NO_MOVE]
+
+
+def test_killers_are_kept_until_aged():
+    board = nnm_board.Board()
+    orderer = nnm_board.MoveOrderer(board)
+    first, second = nnm_board.pack_move(-1, 3), nnm_board.pack_move(-1, 5)
+    orderer.update(first, 2, 3)
+    orderer.update(second, 2, 3)
+    assert orderer.get_killers(2) == [second, first]
+    assert orderer.get_killers(1) == [nnm_board.NO_MOVE, nnm_board.NO_MOVE]
+    orderer.age()
+    assert orderer.get_killers(2) == [nnm_board.NO_MOVE, nnm_board.NO_MOVE]
+    orderer.update(first, 2, 3)
+    orderer.clear()
+    assert orderer.get_killers(2) == [nnm_board.NO_MOVE, nnm_board.NO_MOVE]
@@ -0,0 +1,39 @@
+import pytest
+import nnm_board
+
+
+@pytest.mark.parametrize(
+    "move",
+    [
+        nnm_board.NO_MOVE,
+        nnm_board.pack_move(-1, 25, -1),  # Off the board
+        nnm_board.pack_move(0, 1, -1),  # A movement in the placement phase
+        nnm_board.pack_move(-1, 0, 1),  # Deleting an empty spot
+    ],
+)
+def test_illegal_packed_move_is_rejected(move):
+    board = nnm_board.Board()
+    board.execute_move(nnm_board.pack_move(-1, 1, -1))
+    key, hands = board.key, (board.get_player_one_pieces(), board.get_player_two_pieces())
+    with pytest.raises(ValueError):
+        board.execute_move(move)
+    with pytest.raises(ValueError):
+        board.undo_move(move)
+    assert board.key == board.compute_key() == key
+    assert (board.get_player_one_pieces(), board.get_player_two_pieces()) == hands
+
+
+def test_undo_restores_the_previous_position():
+    board = nnm_board.Board()
+    keys = [board.key]
+    moves = [nnm_board.pack_move(-1, pos, -1) for pos in (0, 9, 1, 10, 4)]
+    moves.append(nnm_board.pack_move(-1, 11, 0))  # Closes the mill 9, 10, 11 and deletes 0
+    for move in moves:
+        board.execute_move(move)
+        keys.append(board.key)
+    for move in reversed(moves):
+        board.undo_move(move)
+        keys.pop()
+        assert board.key == keys[-1]
+    with pytest.raises(ValueError):
+        board.undo_move(moves[0])
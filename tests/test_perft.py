@@ -0,0 +1,24 @@
+import pytest
+import nnm_board
+
+from nnm import perft
+
+
+# Checked against an independent generator, see nnm.perft.REFERENCE_COUNTS
+@pytest.mark.parametrize(
+    "depth, nodes", [(1, 24), (2, 552), (3, 12_144), (4, 255_024), (5, 5_140_800)]
+)
+def test_counts_from_the_start_position(depth, nodes):
+    assert perft.perft(depth)[0] == nodes
+    if depth <= 4:
+        # Executing the moves of the last ply as well
+        assert perft.perft(depth, bulk=False)[0] == nodes
+
+
+def test_divide():
+    counts = perft.divide(2)
+    # Every placement on the empty board, each answered by a placement on the 23 other spots
+    assert sorted(counts) == sorted(nnm_board.pack_move(-1, pos, -1) for pos in range(24))
+    assert set(counts.values()) == {23}
+    # The counts after each move add up to the count of the position
+    assert sum(perft.divide(3).values()) == 12_144
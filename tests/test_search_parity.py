@@ -0,0 +1,129 @@
+import contextlib
+import io
+import random
+import time
+
+import pytest
+from nnm_board import PruningParams
+
+from nnm.board import Board
+from nnm.rules.rules import Rules, Phase
+from nnm.ai.minimax import MinimaxAI
+
+
+def play_random(seed: int, board: Board, rules: Rules) -> None:
+    rng = random.Random(seed)
+    for _ in range(rng.randint(0, 40)):
+        if rules.get_phase() in (Phase.DONE, Phase.DRAW):
+            break
+        rules.execute_move(rng.choice(rules.get_current_player_moves()))
+
+
+def search(seed: int, native: bool, **kwargs) -> tuple[int, int]:
+    board = Board()
+    rules = Rules(board)
+    play_random(seed, board, rules)
+    if rules.get_phase() in (Phase.DONE, Phase.DRAW):
+        pytest.skip("The random game is over")
+    ai = MinimaxAI(board.current_player, rules, native=native, **kwargs)
+    # The Python search prints the evaluation cache ratio
+    with contextlib.redirect_stdout(io.StringIO()):
+        move = ai.get_best_move()
+    return move.packed, ai.nodes
+
+
+@pytest.mark.parametrize("seed", range(8))
+@pytest.mark.parametrize(
+    "kwargs",
+    [
+        {"max_depth": 3},
+        {"max_depth": 3, "quiescence_plies": 0, "pvs": False},
+        {"max_depth": 3, "tt_size_mb": 0},
+        {"max_depth": 3, "pruning": PruningParams(razoring=True)},
+        {"max_depth": 4, "pruning": PruningParams(lmr=True, futility=True, razoring=True)},
+        {"max_depth": 3, "time_limit_ms": 100_000},
+    ],
+)
+def test_python_search_mirrors_native(seed, kwargs):
+    """Same best move and the same number of nodes, so the searches visit the same tree"""
+    assert search(seed, False, **kwargs) == search(seed, True, **kwargs)
+
+
+@pytest.mark.parametrize("seed", range(6))
+def test_root_split_does_not_depend_on_the_workers(seed):
+    """The searchers are kept for the whole game, so their tables carry over between moves"""
+    board = Board()
+    rules = Rules(board)
+    play_random(seed, board, rules)
+    ais = {
+        player.number: [
+            MinimaxAI(player, rules, max_depth=4, workers=workers) for workers in (2, 4)
+        ]
+        for player in board.players
+    }
+    for _ in range(20):
+        if rules.get_phase() in (Phase.DONE, Phase.DRAW):
+            break
+        few, many = ais[board.current_player.number]
+        move = few.get_best_move()
+        assert many.get_best_move().packed == move.packed
+        assert many.last_result.score == few.last_result.score
+        rules.execute_move(move)
+        rules.next_turn()
+
+
+@pytest.mark.parametrize("seed", range(4))
+def test_lazy_smp(seed):
+    """A legal move within the time limit, and the shared table only holds whole entries"""
+    board = Board()
+    rules = Rules(board)
+    play_random(seed, board, rules)
+    if rules.get_phase() in (Phase.DONE, Phase.DRAW):
+        pytest.skip("The random game is over")
+    moves = {move.packed: move for move in rules.get_current_player_moves()}
+    ai = MinimaxAI(
+        board.current_player, rules, max_depth=30, time_limit_ms=200, workers=4, parallel="lazy_smp"
+    )
+    start = time.perf_counter()
+    move = ai.get_best_move()
+    assert time.perf_counter() - start < 1.0
+    assert move.packed in moves
+
+    # An entry mixing the halves of two stores would fail the key check or hold a wrong move
+    table = ai._searcher.table
+    max_depth = ai.max_depth + 2  # The helpers search one ply deeper, the root is one more
+    hits = 0
+    for child in [None, *moves.values()]:
+        if child is not None:
+            rules.execute_move(child)
+        entry = table.probe(board.key)
+        if entry is not None:
+            hits += 1
+            assert 1 <= entry.depth <= max_depth
+            assert entry.move in {reply.packed for reply in rules.get_current_player_moves()}
+        if child is not None:
+            rules.undo_move(child)
+    assert hits > 1
+
+
+@pytest.mark.parametrize("native", [True, False])
+def test_being_blocked_is_a_loss(native):
+    """A player with no legal move has lost, however many pieces it has left"""
+    board = Board()
+    board._board.set_state(
+        sum(1 << pos for pos in (7, 12, 6, 11)),
+        sum(1 << pos for pos in (17, 4, 16, 15, 9, 10, 13, 21)),
+        0,
+        0,
+        0,
+    )
+    rules = Rules(board)
+    ai = MinimaxAI(board.current_player, rules, max_depth=2, native=native)
+    with contextlib.redirect_stdout(io.StringIO()):
+        move = ai.get_best_move()
+    # Some captures let the other player block every piece at once, others don't
+    rules.execute_move(move)
+    for reply in rules.get_current_player_moves():
+        rules.execute_move(reply)
+        assert rules.get_phase() is not Phase.DONE
+        rules.undo_move(reply)
@@ -0,0 +1,32 @@
+import nnm_board
+import pytest
+
+BRAIN = nnm_board.Evaluator(nnm_board.Board(), 0).get_brain()
+
+
+@pytest.mark.parametrize("seed", [1, 2, 3])
+def test_seeded_game_is_valid_and_reproducible(seed):
+    result = nnm_board.play_game(BRAIN, BRAIN, 2, 2, seed)
+    assert result.plies == len(result.moves) > 0
+    assert nnm_board.play_game(BRAIN, BRAIN, 2, 2, seed).moves == result.moves
+
+    # Replaying the moves, every move is legal and the game ends as reported
+    board = nnm_board.Board()
+    move_finder = nnm_board.MoveFinder(board)
+    for move in result.moves:
+        assert move_finder.get_phase() != -1
+        assert move in move_finder.get_moves_array(board.turn_index)
+        board.execute_move(move)
+    assert (board.pieces_on_board(0), board.pieces_on_board(1)) == tuple(result.pieces)
+    if result.is_draw:
+        assert result.winner == -1
+        assert board.is_repetition(3)
+    else:
+        assert move_finder.get_phase() == -1
+        loser = result.winner ^ 1
+        assert board.turn_index == loser or board.pieces_on_board(loser) < 3
+
+
+def test_seeds_give_different_games():
+    games = {tuple(nnm_board.play_game(BRAIN, BRAIN, 2, 2, seed).moves) for seed in range(1, 5)}
+    assert len(games) > 1
@@ -0,0 +1,48 @@
+import itertools
+import random
+
+import pytest
+import nnm_board
+
+BOARD = nnm_board.Board()
+LINES = {frozenset(line) for line in itertools.combinations(range(24), 3) if BOARD.is_mill(*line)}
+EDGES = {
+    frozenset(edge) for edge in itertools.combinations(range(24), 2) if BOARD.is_connected(*edge)
+}
+
+
+@pytest.mark.parametrize("t", range(nnm_board.N_SYMMETRIES))
+def test_symmetry_preserves_lines_and_adjacency(t):
+    def transform(spots):
+        return frozenset(nnm_board.transform_spot(pos, t) for pos in spots)
+
+    assert sorted(nnm_board.transform_spot(pos, t) for pos in range(24)) == list(range(24))
+    assert {transform(line) for line in LINES} == LINES
+    assert {transform(edge) for edge in EDGES} == EDGES
+
+
+@pytest.mark.parametrize("t", range(nnm_board.N_SYMMETRIES))
+def test_inverse_round_trips(t):
+    inverse = nnm_board.inverse_transform(t)
+    for pos in range(24):
+        assert nnm_board.transform_spot(nnm_board.transform_spot(pos, t), inverse) == pos
+    move = nnm_board.pack_move(3, 4, 20)
+    assert nnm_board.transform_move(nnm_board.transform_move(move, t), inverse) == move
+
+
+def test_symmetric_positions_have_the_same_canonical_key():
+    rng = random.Random(1)
+    for _ in range(50):
+        spots = rng.sample(range(24), 8)
+        hands = rng.randint(0, 5), rng.randint(0, 5)
+        turn = rng.randint(0, 1)
+        keys = set()
+        for t in range(nnm_board.N_SYMMETRIES):
+            pieces = [
+                sum(1 << nnm_board.transform_spot(pos, t) for pos in player_spots)
+                for player_spots in (spots[:4], spots[4:])
+            ]
+            board = nnm_board.Board()
+            board.set_state(*pieces, *hands, turn)
+            keys.add(nnm_board.canonical_key(board))
+        assert len(keys) == 1
@@ -0,0 +1,53 @@
+import random
+
+import pytest
+import nnm_board
+from nnm_board import TBResult
+
+GAME_OVER = "game over"
+
+
+@pytest.fixture(scope="module")
+def tablebase(tmp_path_factory):
+    directory = tmp_path_factory.mktemp("tablebase")
+    nnm_board.solve_tablebase(3, 3, str(directory))
+    return nnm_board.Tablebase(str(directory))
+
+
+def successors(tablebase, board: nnm_board.Board) -> list:
+    """Result and distance of every move, for the other player"""
+    move_finder = nnm_board.MoveFinder(board)
+    results = []
+    for move in move_finder.get_moves_array(board.turn_index):
+        board.execute_move(int(move))
+        if move_finder.get_phase() == -1:
+            results.append((GAME_OVER, 0))
+        else:
+            entry = tablebase.probe(board)
+            results.append((entry.result, entry.distance))
+        board.undo_move(int(move))
+    return results
+
+
+@pytest.mark.parametrize("seed", range(4))
+def test_results_agree_with_successors(tablebase, seed):
+    rng = random.Random(seed)
+    for _ in range(50):
+        spots = rng.sample(range(24), 6)
+        board = nnm_board.Board()
+        board.set_state(
+            sum(1 << pos for pos in spots[:3]), sum(1 << pos for pos in spots[3:]), 0, 0, seed % 2
+        )
+        entry = tablebase.probe(board)
+        results = successors(tablebase, board)
+        if entry.result == TBResult.WIN:
+            # The fastest win: the game ends, or the other player is lost
+            wins = [d for result, d in results if result in (GAME_OVER, TBResult.LOSS)]
+            assert wins and entry.distance == 1 + min(wins)
+        elif entry.result == TBResult.LOSS:
+            # The slowest loss, every move wins for the other player
+            assert all(result == TBResult.WIN for result, _ in results)
+            assert entry.distance == 1 + max(d for _, d in results)
+        else:
+            assert all(result in (TBResult.WIN, TBResult.DRAW) for result, _ in results)
+            assert any(result == TBResult.DRAW for result, _ in results)
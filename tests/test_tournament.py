@@ -0,0 +1,33 @@
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+import nnm_board
+import pytest
+
+from nnm.ai.ga import GA
+from nnm.ai.tournament import DEFAULT_BRAIN, get_score, play_generation
+
+
+@pytest.mark.parametrize("executor_type", [ThreadPoolExecutor, ProcessPoolExecutor])
+def test_play_generation(executor_type):
+    ga = GA(n_pops=3, seed=7)
+    pops = ga.generate_pops(DEFAULT_BRAIN)
+    with executor_type(max_workers=2) as executor:
+        stats = play_generation(ga, pops, depth=1, round_robin=True, seed=5, executor=executor)
+    # Every individual against the opponent, then every ordered pair
+    assert stats.generation == ga.generation == 0
+    assert stats.games == 3 + 3 * 2
+    assert stats.wall_time > 0
+
+    # The same games, played one by one
+    brains = [list(map(float, brain)) for brain in pops]
+    seeds = iter(range(5 * 1_000_003, 5 * 1_000_003 + stats.games))
+    expected = [
+        get_score(nnm_board.play_game(brain, DEFAULT_BRAIN, 1, 1, next(seeds))) for brain in brains
+    ]
+    for i, a in enumerate(brains):
+        for j, b in enumerate(brains):
+            if i != j:
+                score = get_score(nnm_board.play_game(a, b, 1, 1, next(seeds)))
+                expected[i] += score
+                expected[j] -= score
+    assert ga.scores == expected
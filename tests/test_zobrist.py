@@ -0,0 +1,26 @@
+import random
+
+import pytest
+import nnm_board
+
+
+@pytest.mark.parametrize("seed", range(20))
+def test_incremental_key_after_random_game(seed):
+    rng = random.Random(seed)
+    board = nnm_board.Board()
+    move_finder = nnm_board.MoveFinder(board)
+    keys, moves = [board.key], []
+    for _ in range(150):
+        if move_finder.get_phase() == -1:
+            break
+        move = int(rng.choice(move_finder.get_moves_array(board.turn_index)))
+        board.execute_move(move)
+        assert board.key == board.compute_key()
+        keys.append(board.key)
+        moves.append(move)
+
+    # Undoing the game passes the same keys in reverse
+    for move in reversed(moves):
+        board.undo_move(move)
+        keys.pop()
+        assert board.key == board.compute_key() == keys[-1]